@@ -0,0 +1,232 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, serializers
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from . import views
+from .authentication import CachedJWTAuthentication
+from .conditional import add_validator_headers, check_validators
+from .events import KEEPALIVE_FRAME, RETRY_FRAME, get_hub, trip_channel
+from .models import Route, Trip
+from .pagination import TripPagination
+from .permissions import IsTripMember, ahas_trip_access
+from .replicas import ause_replica
+from .serializers import CollaboratorSerializer, RouteSerializer, TripSerializer, TripSummarySerializer
+
+# Async versions of the read-heavy endpoints, served instead of the sync views under ASGI
+# (see api/urls.py). A request waiting on the database or a slow client holds no worker thread.
+# DRF has no async views, so these are plain Django async views that authenticate, check access
+# and render the same responses as their sync counterpart. Every other method is handed to
+# the sync DRF view in sync_view.
+
+class AsyncAPIView(View):
+    sync_view = None  # The DRF view handling every method except GET and HEAD
+    sync_handler = None
+    allow = None  # The Allow header of the sync view
+    # The browsable API needs a DRF view, so these offer the other renderers, JSON first.
+    renderer_classes = [cls for cls in api_settings.DEFAULT_RENDERER_CLASSES if not issubclass(cls, BrowsableAPIRenderer)]
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        sync_handler = sync_to_async(cls.sync_view.as_view())
+        sync_view = cls.sync_view()
+        sync_view.setup(None)  # Adds head() like a dispatched view has, so Allow lists HEAD
+        allow = ", ".join(sync_view.allowed_methods)
+        return csrf_exempt(super().as_view(sync_handler=sync_handler, allow=allow, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await self.sync_handler(request, *args, **kwargs)
+
+        request = Request(request, authenticators=())
+        try:
+            self.negotiate(request)
+            await self.authenticate(request)
+            await ause_replica(request)
+            response = await self.get(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(request, exc, args, kwargs)
+        return self.render(request, response)
+
+    # Picks the renderer from the Accept header like DRF does, answering 406 if none fits.
+    def negotiate(self, request):
+        negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+        renderers = [renderer() for renderer in self.renderer_classes]
+        request.accepted_renderer, request.accepted_media_type = negotiator.select_renderer(request, renderers)
+
+    # JWT first, then the session, like DEFAULT_AUTHENTICATION_CLASSES. Only authenticated users get in.
+    async def authenticate(self, request):
+        authenticator = CachedJWTAuthentication()
+        try:
+            user_auth = await authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            exc.auth_header = authenticator.authenticate_header(request)
+            raise
+        if user_auth is not None:
+            request.user, request.auth = user_auth
+        else:
+            request.user, request.auth = await request._request.auser(), None
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, request, exc, args, kwargs):
+        if isinstance(exc, exceptions.NotAuthenticated):
+            exc.auth_header = CachedJWTAuthentication().authenticate_header(request)
+        context = {"view": self, "args": args, "kwargs": kwargs, "request": request}
+        response = exception_handler(exc, context)
+        if response is None:
+            raise exc
+        return response
+
+    def render(self, request, response):
+        if isinstance(response, Response):
+            if getattr(request, "accepted_renderer", None) is None:  # Negotiation failed with a 406
+                request.accepted_renderer = self.renderer_classes[0]()
+                request.accepted_media_type = request.accepted_renderer.media_type
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = {"view": self, "request": request, "response": response}
+            response.render()
+            patch_vary_headers(response, ["Accept"])
+        response.headers.setdefault("Allow", self.allow)
+        return response
+
+# Trips the user owns or collaborates on, filtered and paginated like TripListCreate.
+class TripListView(AsyncAPIView):
+    sync_view = views.TripListCreate
+
+    async def get(self, request):
+        trips = views.filtered_trips(request)
+        if views.wants_summary(request):
+            trips, serializer_class = trips.only(*TripSummarySerializer.Meta.fields), TripSummarySerializer
+        else:
+            trips, serializer_class = trips.with_listing_data(), TripSerializer
+
+        paginator = TripPagination()
+        page = await paginator.apaginate_queryset(trips, request)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+# A single trip, with the same validators as TripDetailView.
+class TripDetailView(AsyncAPIView):
+    sync_view = views.TripDetailView
+
+    async def get(self, request, pk):
+        row = await aget_object_or_404(Trip.objects.values(*views.TRIP_VALIDATOR_FIELDS), pk=pk)
+        if not await ahas_trip_access(request, pk, row["author_id"]):
+            raise exceptions.PermissionDenied(IsTripMember.message)
+
+        collaborators = [collaborator async for collaborator in views.trip_collaborator_rows(pk)]
+        etag, timestamp, response = check_validators(request, *views.trip_validators(pk, row, collaborators))
+        if response is None:
+            trip = await aget_object_or_404(Trip.objects.with_listing_data(), pk=pk)
+            response = Response(TripSerializer(trip).data)
+        return add_validator_headers(response, etag, timestamp)
+
+# The route of a trip, with the same validators as RouteByTripIdView.
+class RouteByTripIdView(AsyncAPIView):
+    sync_view = views.RouteByTripIdView
+
+    async def get(self, request, trip_id):
+        row = await Route.objects.filter(pk=trip_id).values(*views.ROUTE_VALIDATOR_FIELDS).afirst()
+        if row is None:
+            raise serializers.ValidationError("Route not found")
+        if not await ahas_trip_access(request, trip_id, row["trip__author_id"]):
+            raise exceptions.PermissionDenied(IsTripMember.message)
+
+        etag, timestamp, response = check_validators(request, *views.route_row_validators(trip_id, row))
+        if response is None:
+            route = await Route.objects.select_related("geometry").filter(pk=trip_id).afirst()
+            if route is None:
+                raise serializers.ValidationError("Route not found")
+            response = Response(RouteSerializer(route).data)
+        return add_validator_headers(response, etag, timestamp)
+
+# The owner and collaborators of a trip, like TripCollaboratorsView.get.
+class TripCollaboratorsView(AsyncAPIView):
+    sync_view = views.TripCollaboratorsView
+
+    async def get(self, request, trip_id):
+        trip = await aget_object_or_404(Trip.objects.select_related("author"), id=trip_id)
+        if not await ahas_trip_access(request, trip.pk, trip.author_id):
+            raise exceptions.PermissionDenied(IsTripMember.message)
+
+        collaborators = [user async for user in trip.collaborators.all()]
+        return Response({
+            'status': 'success',
+            'data': {
+                'owner': {
+                    'id': trip.author.id,
+                    'email': trip.author.email,
+                    'first_name': trip.author.first_name,
+                    'last_name': trip.author.last_name
+                },
+                'collaborators': CollaboratorSerializer(collaborators, many=True).data,
+                'current_user_is_owner': request.user.id == trip.author.id
+            }
+        })
+
+# The user's own profile. The user comes from the authentication cache, so this needs no query.
+class UserProfileView(AsyncAPIView):
+    sync_view = views.UserProfileView
+
+    async def get(self, request):
+        user = request.user
+        return Response({
+            "id": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+        })
+
+# Server-sent events for one trip: pitstops, route and collaborator changes as they commit,
+# so open pages stay current without polling (see api/events.py). Only members may subscribe.
+# A comment every KEEPALIVE_SECONDS keeps idle connections open through proxies. The stream
+# ends when the trip is deleted or the user is removed from it.
+class TripEventsView(AsyncAPIView):
+    sync_view = views.TripEventsView
+    KEEPALIVE_SECONDS = 15
+
+    # The stream is not rendered, so any Accept header will do. Errors are sent as JSON.
+    def negotiate(self, request):
+        pass
+
+    async def get(self, request, pk):
+        trip = await aget_object_or_404(Trip.objects.values("author_id"), pk=pk)
+        if not await ahas_trip_access(request, pk, trip["author_id"]):
+            raise exceptions.PermissionDenied(IsTripMember.message)
+
+        subscription = get_hub().subscribe(trip_channel(pk))
+        response = StreamingHttpResponse(self.stream(request, pk, trip["author_id"], subscription), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Stops nginx from buffering the stream
+        return response
+
+    async def stream(self, request, pk, author_id, subscription):
+        try:
+            yield RETRY_FRAME
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscription.get(), self.KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+                    continue
+                yield frame
+                if frame.startswith(b"event: deleted\n"):
+                    return
+                if frame.startswith(b"event: collaborators\n"):
+                    request._trip_access.pop(pk, None)  # Check again, the user may have been removed
+                    if not await ahas_trip_access(request, pk, author_id):
+                        return
+        finally:
+            subscription.close()
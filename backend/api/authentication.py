@@ -0,0 +1,58 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+# Resolves the user of a JWT-authenticated request from the cache instead of querying
+# RoadtripUser on every API call. Entries live for USER_CACHE_TIMEOUT seconds and are keyed by
+# user id plus a per-user version, which forget_user() bumps whenever the user is saved or deleted
+# (see api/signals.py). A request that read the user before the bump can only write a stale entry
+# under the old version, which no later request reads.
+# With the default per-process local memory cache other processes notice within the timeout;
+# configure a shared cache in CACHES to make invalidation immediate across processes.
+
+USER_CACHE_TIMEOUT = 60
+
+def _version_key(user_id):
+    return f"api:auth-user-version:{user_id}"
+
+def _user_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # A fresh, unique starting version, so entries written before the version was
+        # evicted from the cache can never be read again.
+        cache.add(_version_key(user_id), time.time_ns(), None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+# Makes every cached copy of the user stale, now and again once the current transaction commits.
+def forget_user(user_id):
+    def bump():
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            pass  # No version yet, so nothing is cached for this user
+    bump()
+    transaction.on_commit(bump)
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = f"api:auth-user:{user_id}:{_user_version(user_id)}"
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)  # Rejects unknown and inactive users
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
+
+    # For the async views: the whole lookup in one thread hop. Returns (user, token), or None without a JWT header.
+    async def aauthenticate(self, request):
+        return await sync_to_async(self.authenticate)(request)
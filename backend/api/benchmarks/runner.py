@@ -0,0 +1,128 @@
+import json
+import math
+import time
+
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .scenarios import scenario_path
+
+# Runs benchmark scenarios in-process through the Django test client, so no server or network
+# is involved. Each scenario is requested once to warm up and once to record its status, query
+# count and response size, then timed over a number of iterations. Write requests run in a
+# transaction that is rolled back, so every request sees the seeded data unchanged.
+
+# Timings vary between runs on shared machines, so latency gets a generous tolerance;
+# query counts and response sizes are exact.
+LATENCY_TOLERANCE = 1.0  # A median this much slower than the baseline is a regression
+BYTES_TOLERANCE = 0.1  # As is a response this much larger
+LATENCY_FLOOR_MS = 1.0  # Differences below this are timer noise, whatever the ratio
+
+class RollbackRequest(Exception):
+    pass
+
+# Nearest-rank percentile of sorted values.
+def percentile(values, percent):
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+def _request(client, scenario):
+    method = scenario.get("method", "get")
+    path = scenario_path(scenario)
+    if "body" in scenario:
+        return getattr(client, method)(path, scenario["body"], content_type=scenario["content_type"])
+    if method == "get":
+        return client.get(path, scenario.get("query"))
+    return getattr(client, method)(path, scenario.get("data"), format="json")
+
+# Makes the request, rolling back whatever it wrote. Streaming responses are read to the end,
+# as their queries run while the body is produced.
+def _send(client, scenario):
+    if scenario.get("method", "get") == "get":
+        response = _request(client, scenario)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    try:
+        with transaction.atomic():
+            response = _request(client, scenario)
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+            raise RollbackRequest
+    except RollbackRequest:
+        pass
+    return response, body
+
+def run_scenario(scenario, token, iterations):
+    client = APIClient()
+    if not scenario.get("anonymous"):
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {scenario.get('token', token)}")
+
+    _send(client, scenario)  # Warms the authentication cache, which an earlier write may have cleared
+    reset_queries()  # The query log is a bounded deque, and a full one records nothing new
+    with CaptureQueriesContext(connection) as queries:
+        response, body = _send(client, scenario)
+    query_count = len(queries)  # Read now, as the next request clears the query log it points into
+    expected = scenario.get("status", 200)
+    if response.status_code != expected:
+        raise AssertionError(f"{scenario['name']}: expected {expected}, got {response.status_code}: {body[:300]!r}")
+
+    timings = []
+    for _ in range(scenario.get("repeat", iterations)):
+        start = time.perf_counter()
+        _send(client, scenario)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "status": response.status_code,
+        "queries": query_count,
+        "bytes": len(body),
+        "iterations": len(timings),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+    }
+
+def run_benchmarks(scenarios, user, iterations):
+    token = str(AccessToken.for_user(user))
+    return {scenario["name"]: run_scenario(scenario, token, iterations) for scenario in scenarios}
+
+# Named URLs of the project that no scenario requests.
+def uncovered_urls(scenarios):
+    covered = {scenario["url"] for scenario in scenarios}
+    names = {name for name in get_resolver().reverse_dict if isinstance(name, str)}
+    return sorted(names - covered)
+
+# Regressions of results against a baseline: a changed status, any extra query, a response
+# more than bytes_tolerance larger, or a median more than latency_tolerance slower. The median
+# is compared rather than p95, which swings with whatever else the machine is doing.
+# Scenarios missing from either side are reported too.
+def compare(results, baseline, latency_tolerance=LATENCY_TOLERANCE, bytes_tolerance=BYTES_TOLERANCE):
+    regressions = []
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is None:
+            regressions.append(f"{name}: no longer benchmarked")
+            continue
+        if new["status"] != old["status"]:
+            regressions.append(f"{name}: status {old['status']} -> {new['status']}")
+        if new["queries"] > old["queries"]:
+            regressions.append(f"{name}: queries {old['queries']} -> {new['queries']}")
+        if new["bytes"] > old["bytes"] * (1 + bytes_tolerance):
+            regressions.append(f"{name}: bytes {old['bytes']} -> {new['bytes']}")
+        limit = max(old["p50_ms"] * (1 + latency_tolerance), old["p50_ms"] + LATENCY_FLOOR_MS)
+        if new["p50_ms"] > limit:
+            regressions.append(f"{name}: p50 {old['p50_ms']:.2f} ms -> {new['p50_ms']:.2f} ms")
+    regressions.extend(f"{name}: not in the baseline" for name in results if name not in baseline)
+    return regressions
+
+def save_baseline(path, options, results):
+    with open(path, "w") as f:
+        json.dump({"options": options, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
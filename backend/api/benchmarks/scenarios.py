@@ -0,0 +1,109 @@
+import json
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..models import RoadtripUser
+from ..sync import SYNC_OVERLAP, encode_cursor
+from .seed import BENCH_PASSWORD
+
+# One request per scenario, named after the URL it exercises with a suffix for variants.
+# Requests are made as the seeded benchmark user; writes are rolled back after every request,
+# so each one sees the same data. "repeat" lowers the iteration count of endpoints that hash
+# passwords, which are slow by design. "token" replaces the user's bearer token.
+
+def build_scenarios(dataset):
+    user, other = dataset["user"], dataset["other_user"]
+    trip, shared = dataset["trip"].pk, dataset["shared_trip"].pk
+    route = dataset["trip"].route
+    lat, lng = dataset["point"]
+    origin, destination = dataset["journey"]
+    collaborator = dataset["trip"].collaborators.order_by("pk").first()
+    outsider = RoadtripUser.objects.exclude(pk=user.pk).exclude(collaborated_trips=trip).order_by("pk").first()
+    export_line = json.dumps({
+        "title": "Imported trip", "start_location": origin, "destination": destination, "trip_date": "2025-06-01",
+        "collaborators": [other.email], "route": {
+            "start_location": origin, "destination": destination, "distance": route.distance,
+            "duration": route.duration, "route_path": route.route_path, "pitstops": route.pitstops,
+        },
+    })
+
+    # A cursor past the seeded rows and the overlap window, as an up-to-date client reconnects with.
+    cursor = encode_cursor(timezone.now() + SYNC_OVERLAP)
+
+    return [
+        # Trips
+        {"name": "trip-list", "url": "trip-list"},
+        {"name": "trip-list:summary", "url": "trip-list", "query": {"fields": "summary"}},
+        {"name": "trip-list:longest", "url": "trip-list", "query": {"fields": "summary", "ordering": "-distance", "min_distance_m": 100000}},
+        {"name": "trip-list:create", "url": "trip-list", "method": "post", "status": 201,
+         "data": {"title": "Bench trip", "start_location": origin, "destination": destination, "trip_date": "2025-06-01"}},
+        {"name": "trip-detail", "url": "trip-detail", "kwargs": {"pk": trip}},
+        {"name": "trip-detail:shared", "url": "trip-detail", "kwargs": {"pk": shared}},
+        {"name": "trip-detail:update", "url": "trip-detail", "kwargs": {"pk": trip}, "method": "patch", "data": {"title": "Renamed"}},
+        {"name": "trip-bundle", "url": "trip-bundle", "kwargs": {"pk": trip}},
+        {"name": "trip-bundle:trip,route", "url": "trip-bundle", "kwargs": {"pk": trip}, "query": {"fields": "trip,route"}},
+        {"name": "sync", "url": "sync"},
+        {"name": "sync:since", "url": "sync", "query": {"since": cursor}},
+        # The test client is not an ASGI server, so this covers the WSGI answer only (see bench_events).
+        {"name": "trip-events", "url": "trip-events", "kwargs": {"pk": trip}, "status": 501},
+        {"name": "trip-search", "url": "trip-search", "query": {"q": destination}},
+        {"name": "trip-search:typo", "url": "trip-search", "query": {"q": destination[:-1] + "x"}},
+        {"name": "trips-near", "url": "trips-near", "query": {"lat": lat, "lng": lng, "radius_km": 10}},
+        {"name": "trip-export", "url": "trip-export"},
+        {"name": "trip-import", "url": "trip-import", "method": "post", "body": "\n".join([export_line] * 20), "content_type": "application/x-ndjson"},
+        {"name": "delete-trip", "url": "delete-trip", "kwargs": {"pk": trip}, "method": "delete", "status": 204},
+        {"name": "delete-trip:collaborator", "url": "delete-trip", "kwargs": {"pk": shared}, "method": "delete"},
+        {"name": "trip-collaborators", "url": "trip-collaborators", "kwargs": {"trip_id": trip}},
+        {"name": "trip-collaborators:add", "url": "trip-collaborators", "kwargs": {"trip_id": trip}, "method": "post",
+         "data": {"email": outsider.email}},
+        {"name": "trip-collaborators:remove", "url": "trip-collaborators", "kwargs": {"trip_id": trip}, "method": "delete",
+         "data": {"email": collaborator.email}},
+
+        # Routes
+        {"name": "route-list", "url": "route-list"},
+        {"name": "route-list:summary", "url": "route-list", "query": {"fields": "summary"}},
+        {"name": "route-list:save", "url": "route-list", "method": "post", "status": 201,
+         "data": {"trip": dataset["unrouted_trip"].pk, "start_location": origin, "destination": destination, "distance": route.distance,
+                  "duration": route.duration, "route_path": route.route_path}},
+        {"name": "route-detail", "url": "route-detail", "kwargs": {"pk": trip}},
+        {"name": "route-by-trip", "url": "route-by-trip", "kwargs": {"trip_id": trip}},
+        {"name": "add-pitstop", "url": "add-pitstop", "kwargs": {"trip_id": trip}, "method": "post", "data": {"pitstop": "Bench services"}},
+        {"name": "pitstop-operations", "url": "pitstop-operations", "kwargs": {"trip_id": trip}, "method": "post",
+         "data": {"operations": [{"op": "add", "pitstop": "Bench services", "index": 0}, {"op": "move", "pitstop": route.pitstops[0], "index": 2}]
+                  if route.pitstops else [{"op": "add", "pitstop": "Bench services"}]}},
+        {"name": "update-route", "url": "update-route", "kwargs": {"trip_id": trip}, "method": "patch",
+         "data": {"route_path": route.route_path, "pitstops": route.pitstops}},
+        {"name": "route-places", "url": "route-places", "kwargs": {"trip_id": trip}, "query": {"buffer_km": 5, "limit": 10}},
+        {"name": "directions", "url": "directions", "query": {"origin": origin, "destination": destination}},
+        {"name": "directions:offer", "url": "directions", "method": "post", "status": 201,
+         "data": {"origin": origin, "destination": "Somewhere else", "route_path": route.route_path, "distance": route.distance, "duration": route.duration}},
+
+        # Vehicles and petrol
+        {"name": "vehicle-search", "url": "vehicle-search", "query": {"manufacturer": "make 1"}},
+        {"name": "vehicle-manufacturers", "url": "vehicle-manufacturers"},
+        {"name": "petrol-estimate", "url": "petrol-estimate", "method": "post",
+         "data": {"trip_ids": [trip, shared], "vehicle_ids": dataset["vehicle_ids"], "fuel_price": "1.45"}},
+
+        # Users and authentication
+        {"name": "user-profile", "url": "user-profile"},
+        {"name": "user-profile:update", "url": "user-profile", "method": "patch", "data": {"first_name": "Renamed"}},
+        {"name": "get-user-by-id", "url": "get-user-by-id", "kwargs": {"pk": other.pk}},
+        {"name": "change-password", "url": "change-password", "method": "patch", "repeat": 3,
+         "data": {"current_password": BENCH_PASSWORD, "new_password": "another-password-123"}},
+        {"name": "delete-account", "url": "delete-account", "method": "delete", "status": 204},
+        {"name": "register", "url": "register", "method": "post", "status": 201, "repeat": 3, "anonymous": True,
+         "data": {"email": "new-bench@example.com", "password": BENCH_PASSWORD, "first_name": "New", "last_name": "User"}},
+        {"name": "get_token", "url": "get_token", "method": "post", "repeat": 3, "anonymous": True,
+         "data": {"email": user.email, "password": BENCH_PASSWORD}},
+        {"name": "refresh", "url": "refresh", "method": "post", "anonymous": True, "data": {"refresh": str(RefreshToken.for_user(user))}},
+
+        # Monitoring
+        {"name": "metrics", "url": "metrics", "token": settings.METRICS_TOKEN},
+    ]
+
+# The path of a scenario's request.
+def scenario_path(scenario):
+    return reverse(scenario["url"], kwargs=scenario.get("kwargs"))
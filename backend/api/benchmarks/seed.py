@@ -0,0 +1,120 @@
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+
+from ..directions import cache_directions
+from ..models import Place, RoadtripUser, Trip, Vehicle
+from ..polyline import PRECISION, format_route_path, pack_points
+from ..spatial import point_cell
+from ..transfer import import_trips
+
+# Synthetic dataset for the API benchmarks. Every value comes from one seeded random generator,
+# so the same options always create the same rows.
+
+BENCH_PASSWORD = "bench-password-123"
+PLACE_CATEGORIES = ["gas_station", "restaurant", "cafe", "restroom", "charging_station", "lodging", "tourist_attraction"]
+FUEL_TYPES = ["Petrol", "Diesel", "Hybrid", "Electric"]
+TOWNS = ["London", "Leeds", "York", "Bath", "Bristol", "Leicester", "Carlisle", "Edinburgh", "Glasgow", "Inverness", "Oxford", "Cardiff"]
+
+DEFAULT_OPTIONS = {
+    "users": 20,
+    "trips_per_user": 25,
+    "collaborators": 3,  # Per trip, picked from the other users
+    "route_points": 1000,
+    "pitstops": 5,
+    "places": 2000,
+    "vehicles": 300,
+    "seed": 1,
+}
+
+# A road-like path across the UK in integer 1e-5 degree points: small steps with occasional turns.
+def random_walk(rng, count):
+    lat, lng = rng.randint(5050000, 5600000), rng.randint(-400000, 0)
+    points = []
+    for _ in range(count):
+        lat += rng.randint(-300, 600)
+        lng += rng.randint(-600, 600)
+        points.append((lat, lng))
+    return points
+
+# Creates the dataset and returns what the scenarios need: the benchmarked user (who owns
+# trips and collaborates on others), one of their trips with a route and one without, a trip shared with them,
+# a point on that route, some vehicle ids and a cached journey.
+def seed_dataset(options=None):
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    rng = random.Random(options["seed"])
+
+    password = make_password(BENCH_PASSWORD)  # Hashed once and shared, as hashing is slow on purpose
+    users = RoadtripUser.objects.bulk_create([
+        RoadtripUser(email=f"bench-{i}@example.com", first_name="Bench", last_name=f"User {i}", password=password)
+        for i in range(options["users"])
+    ])
+
+    first_day = date(2025, 1, 1)
+    for user in users:
+        others = [other.email for other in users if other.pk != user.pk]
+        lines = []
+        for i in range(options["trips_per_user"]):
+            start, destination = rng.sample(TOWNS, 2)
+            trip = {
+                "title": f"{start} to {destination} {i}",
+                "start_location": start,
+                "destination": destination,
+                "trip_date": (first_day + timedelta(days=rng.randint(0, 365))).isoformat(),
+                "collaborators": rng.sample(others, min(options["collaborators"], len(others))),
+                "route": None,
+            }
+            if i % 5 != 4:  # Most trips have a route, some are still being planned
+                trip["route"] = {
+                    "start_location": start,
+                    "destination": destination,
+                    "distance": f"{rng.randint(20, 500)} mi",
+                    "duration": f"{rng.randint(1, 9)} hours {rng.randint(0, 59)} mins",
+                    "route_path": format_route_path(pack_points(random_walk(rng, options["route_points"]))),
+                    "pitstops": [f"{rng.choice(TOWNS)} services {n}" for n in range(options["pitstops"])],
+                    "petrol_cost": str(Decimal(rng.randint(1000, 9000)) / 100),
+                }
+            lines.append(json.dumps(trip))
+        import_trips(user, lines)
+
+    user = users[0]
+    trip = Trip.objects.filter(author=user, route__isnull=False).order_by("pk").first()
+    unrouted_trip = Trip.objects.filter(author=user, route__isnull=True).order_by("pk").first()
+    shared_trip = Trip.objects.filter(collaborators=user).order_by("pk").first()
+    points = trip.route.path_points
+
+    # Places scattered along the benchmarked trip's route and elsewhere.
+    places = []
+    for i in range(options["places"]):
+        lat, lng = rng.choice(points) if i % 2 == 0 else random_walk(rng, 1)[0]
+        lat, lng = (lat + rng.randint(-2000, 2000)) / PRECISION, (lng + rng.randint(-2000, 2000)) / PRECISION
+        places.append(Place(name=f"Place {i}", category=rng.choice(PLACE_CATEGORIES), lat=lat, lng=lng, cell=point_cell(lat, lng)))
+    Place.objects.bulk_create(places, batch_size=1000)
+
+    vehicles = []
+    for i in range(options["vehicles"]):
+        mpg = Decimal(rng.randint(300, 700)) / 10
+        vehicles.append(Vehicle(
+            manufacturer=f"Make {i // 10:02d}", model=f"Model {i:03d}", fuel_type=FUEL_TYPES[i % len(FUEL_TYPES)],
+            manufacturer_key=f"make {i // 10:02d}", model_key=f"model {i:03d}", mpg=mpg, min_mpg=mpg - 5, max_mpg=mpg + 5,
+        ))
+    Vehicle.objects.bulk_create(vehicles, batch_size=1000)
+
+    route = trip.route
+    cache_directions(trip.author, route.start_location, route.destination, [], route.geometry, route.distance, route.duration)
+
+    middle = points[len(points) // 2]
+    return {
+        "options": options,
+        "user": user,
+        "other_user": users[1],
+        "trip": trip,
+        "unrouted_trip": unrouted_trip,
+        "shared_trip": shared_trip,
+        "point": (middle[0] / PRECISION, middle[1] / PRECISION),
+        "vehicle_ids": list(Vehicle.objects.order_by("pk").values_list("pk", flat=True)[:5]),
+        "journey": (route.start_location, route.destination),
+    }
@@ -0,0 +1,42 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+# Runs the project under uvicorn in a subprocess until the block exits, for the benchmarks that
+# need a real ASGI server. async_views is "0" or "1", see ROADTRIP_ASYNC_VIEWS in settings.
+@contextmanager
+def uvicorn_server(async_views, port):
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        raise CommandError("uvicorn is not installed, see requirements.txt")
+
+    env = {**os.environ, "ROADTRIP_ASYNC_VIEWS": async_views}
+    env.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.asgi:application", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=settings.BASE_DIR, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            if process.poll() is not None:
+                raise CommandError("uvicorn exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise CommandError(f"uvicorn did not start listening on port {port}")
+                time.sleep(0.1)
+        yield
+    finally:
+        process.terminate()
+        process.wait(10)
@@ -0,0 +1,34 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# Quotes the validators and returns (etag, timestamp, response), where response is a
+# 304 Not Modified if the request's If-None-Match / If-Modified-Since still match, else None.
+def check_validators(request, etag, last_modified):
+    etag = quote_etag(etag)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+def add_validator_headers(response, etag, timestamp):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response.headers["ETag"] = etag
+        if timestamp is not None:
+            response.headers["Last-Modified"] = http_date(timestamp)
+        # Responses depend on the caller's credentials, so caches must revalidate and stay private.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+# Adds ETag / Last-Modified validators to a DRF view's GET.
+# Views using it define get_validators(request, *args, **kwargs), returning (etag, last_modified)
+# for the requested object, or None if it does not exist. It should run a cheap indexed lookup,
+# so an unchanged resource is answered with 304 Not Modified before the full object is loaded
+# and serialized.
+class ConditionalGetMixin:
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp, response = check_validators(request, *validators)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return add_validator_headers(response, etag, timestamp)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import re
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, ProtectedError
+from django.utils import timezone
+
+from .models import DirectionsResult, RouteGeometry
+
+# Cache of directions results, so a user asking for the same journey again reuses the route.
+# Entries are keyed on the normalised origin, destination and ordered waypoints, and point at
+# content-addressed RouteGeometry rows, so popular corridors are stored once. Results come from
+# clients, which fetch directions themselves, so each user only reads back the entries they
+# stored: one user's made-up route never reaches another.
+
+DEFAULT_TTL = timedelta(days=30)  # Roads and traffic patterns change, so results are refetched after this
+DEFAULT_MAX_ENTRIES = 50000
+GEOMETRY_BATCH = 1000  # Unused geometry rows deleted per transaction
+
+# Case, spacing and spacing around commas do not change where a location is.
+def normalise_location(text):
+    text = re.sub(r"\s*,\s*", ", ", str(text or "").strip())
+    return " ".join(text.split()).casefold()
+
+def directions_key(origin, destination, waypoints=()):
+    parts = [normalise_location(origin), normalise_location(destination), [normalise_location(w) for w in waypoints]]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+# Returns the user's cached result for a journey, or None if there is none or it has expired.
+# A hit marks the entry as recently used.
+def lookup_directions(user, origin, destination, waypoints=(), ttl=DEFAULT_TTL):
+    now = timezone.now()
+    result = (
+        DirectionsResult.objects.select_related("geometry")
+        .filter(user=user, key=directions_key(origin, destination, waypoints), fetched_at__gt=now - ttl)
+        .first()
+    )
+    if result is not None:
+        DirectionsResult.objects.filter(pk=result.pk).update(hits=F("hits") + 1, last_used_at=now)
+    return result
+
+# Stores a directions result for a journey on behalf of the user who fetched it, replacing any
+# older one of theirs. geometry is a RouteGeometry row, e.g. the one a route was just saved with.
+def cache_directions(user, origin, destination, waypoints, geometry, distance, duration):
+    if geometry is None:
+        return None
+    now = timezone.now()
+    waypoints = list(waypoints)
+    result, _ = DirectionsResult.objects.update_or_create(
+        user=user,
+        key=directions_key(origin, destination, waypoints),
+        defaults={
+            "origin": origin,
+            "destination": destination,
+            "waypoints": waypoints,
+            "geometry": geometry,
+            "distance": distance or "",
+            "duration": duration or "",
+            "fetched_at": now,
+            "last_used_at": now,
+        },
+    )
+    return result
+
+# Removes expired entries, then the least recently used ones beyond max_entries,
+# then geometry no longer used by any route or entry.
+# Returns the number of expired, evicted and unused geometry rows deleted.
+def prune_directions(ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    with transaction.atomic():
+        expired, _ = DirectionsResult.objects.filter(fetched_at__lte=timezone.now() - ttl).delete()
+        overflow = list(
+            DirectionsResult.objects.order_by("-last_used_at", "-pk").values_list("pk", flat=True)[max_entries:]
+        )
+        evicted, _ = DirectionsResult.objects.filter(pk__in=overflow).delete()
+    return expired, evicted, delete_unused_geometry()
+
+# Deletes geometry no route or entry uses. A route saved meanwhile may start using a row again,
+# which makes its delete fail on the protected foreign key. That row is skipped instead of
+# aborting the prune: each batch is retried row by row, each row checked again as it goes.
+def delete_unused_geometry():
+    deleted = 0
+    pks = list(RouteGeometry.objects.unused().order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), GEOMETRY_BATCH):
+        batch = pks[start:start + GEOMETRY_BATCH]
+        try:
+            deleted += _delete_geometry(batch)
+        except (ProtectedError, IntegrityError):
+            for pk in batch:
+                try:
+                    deleted += _delete_geometry([pk])
+                except (ProtectedError, IntegrityError):
+                    pass  # In use again
+    return deleted
+
+def _delete_geometry(pks):
+    with transaction.atomic():
+        _, counts = RouteGeometry.objects.unused().filter(pk__in=pks).delete()
+    return counts.get(RouteGeometry._meta.label, 0)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Live trip changes for collaborators, streamed as server-sent events by TripEventsView in
+# api/async_views.py. Views publish small change events (new pitstops, which route fields
+# changed, who joined or left) instead of clients polling the full trip and route.
+# Events go through a hub, settings.TRIP_EVENTS_BACKEND. The default InProcessBackend fans out
+# within one server process; running several processes needs a backend on a shared broker
+# (e.g. Redis pub/sub) with the same publish() and subscribe() methods.
+
+QUEUE_SIZE = 100  # Events held for a slow subscriber before it is told to resync
+RETRY_FRAME = b"retry: 5000\n\n"  # How long EventSource clients wait before reconnecting
+KEEPALIVE_FRAME = b": keepalive\n\n"
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"  # Events were dropped; reload the trip and route
+
+def trip_channel(trip_id):
+    return f"trip:{trip_id}"
+
+# One SSE frame, encoded once and shared by every subscriber.
+def encode_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+# A subscriber's queue of frames, filled from any thread and read on the subscriber's event loop.
+class Subscription:
+    def __init__(self, backend, channel):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, frame):
+        self.loop.call_soon_threadsafe(self._put, frame)
+
+    def _put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Rather than grow without bound, drop the backlog and ask the client to reload.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+class InProcessBackend:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}  # channel -> set of subscriptions
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[subscription.channel]
+
+    def publish(self, channel, frame):
+        with self.lock:
+            subscribers = list(self.channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(frame)
+            except RuntimeError:  # Its event loop has closed
+                self.unsubscribe(subscription)
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = import_string(settings.TRIP_EVENTS_BACKEND)()
+        return _hub
+
+# Publishes an event to the trip's subscribers once the current transaction commits, so they
+# never hear about a change that was rolled back (or read it before it is visible).
+def publish_trip_event(trip_id, event, data):
+    frame = encode_event(event, data)
+    transaction.on_commit(lambda: get_hub().publish(trip_channel(trip_id), frame))
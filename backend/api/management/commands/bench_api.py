@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks.runner import LATENCY_TOLERANCE, compare, load_baseline, run_benchmarks, save_baseline, uncovered_urls
+from api.benchmarks.scenarios import build_scenarios
+from api.benchmarks.seed import DEFAULT_OPTIONS, seed_dataset
+
+# Seeds a throwaway test database with a reproducible dataset, requests every API endpoint
+# in-process and reports p50/p95/p99 latency, queries per request and response size.
+# --save writes the results as a JSON baseline; --compare checks them against one and fails
+# on any extra query, a changed status, larger responses or a slower median.
+# Run it with backend/bench_settings.py to use SQLite and no network:
+# Usage: python manage.py bench_api --settings=backend.bench_settings [--save baseline.json | --compare baseline.json]
+class Command(BaseCommand):
+    help = "Benchmark every API endpoint against a seeded test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=DEFAULT_OPTIONS["users"])
+        parser.add_argument("--trips-per-user", type=int, default=DEFAULT_OPTIONS["trips_per_user"])
+        parser.add_argument("--collaborators", type=int, default=DEFAULT_OPTIONS["collaborators"])
+        parser.add_argument("--route-points", type=int, default=DEFAULT_OPTIONS["route_points"])
+        parser.add_argument("--pitstops", type=int, default=DEFAULT_OPTIONS["pitstops"])
+        parser.add_argument("--seed", type=int, default=DEFAULT_OPTIONS["seed"])
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument("--save", metavar="PATH", help="Write the results as a baseline.")
+        parser.add_argument("--compare", metavar="PATH", help="Fail on regressions against a baseline.")
+        parser.add_argument("--latency-tolerance", type=float, default=LATENCY_TOLERANCE,
+                            help="Allowed median slowdown as a fraction of the baseline.")
+
+    def handle(self, *args, **options):
+        if options["users"] < options["collaborators"] + 2:
+            raise CommandError("--users must be at least --collaborators + 2, so a trip has someone left to invite")
+        if options["trips_per_user"] < 5:
+            raise CommandError("--trips-per-user must be at least 5, as every fifth trip is left without a route")
+        dataset_options = {
+            **DEFAULT_OPTIONS,
+            **{name: options[name] for name in ("users", "trips_per_user", "collaborators", "route_points", "pitstops", "seed")},
+        }
+        baseline = load_baseline(options["compare"]) if options["compare"] else None
+        if baseline is not None and baseline["options"] != dataset_options:
+            raise CommandError(f"The baseline was recorded with other options: {baseline['options']}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        cache.clear()
+        try:
+            dataset = seed_dataset(dataset_options)
+            scenarios = build_scenarios(dataset)
+            try:
+                results = run_benchmarks(scenarios, dataset["user"], options["iterations"])
+            except AssertionError as exc:
+                raise CommandError(str(exc))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            cache.clear()
+
+        self.report(dataset_options, results)
+        missing = uncovered_urls(scenarios)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"No scenario for: {', '.join(missing)}"))
+
+        if options["save"]:
+            save_baseline(options["save"], dataset_options, results)
+            self.stdout.write(f"Baseline written to {options['save']}")
+        if baseline is not None:
+            regressions = compare(results, baseline["results"], options["latency_tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def report(self, dataset_options, results):
+        self.stdout.write(
+            f"{dataset_options['users']} users, {dataset_options['trips_per_user']} trips each, "
+            f"{dataset_options['collaborators']} collaborators per trip, {dataset_options['route_points']} route points"
+        )
+        self.stdout.write(f"  {'scenario':<28} {'status':>6} {'queries':>7} {'bytes':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<28} {result['status']:>6} {result['queries']:>7} {result['bytes']:>9} "
+                f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
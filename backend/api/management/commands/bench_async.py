@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.benchmarks.server import uvicorn_server
+from api.models import RoadtripUser, Route, Trip
+
+BENCH_EMAIL = "bench-async@example.com"
+
+# Seeds a user with trips, a route and collaborators, then serves the project with uvicorn twice,
+# once with the sync views (ROADTRIP_ASYNC_VIEWS=0) and once with the async views, and drives each
+# read endpoint from many keep-alive connections. Reports requests per second and p50/p99 latency.
+# --think-ms makes every connection idle between requests, like slow mobile clients.
+# The seeded rows are deleted afterwards. Needs uvicorn installed.
+# Usage: python manage.py bench_async --connections 200 --duration 5 [--think-ms 0]
+class Command(BaseCommand):
+    help = "Compare the sync and async read endpoints under uvicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=200)
+        parser.add_argument("--duration", type=float, default=5, help="Seconds per endpoint.")
+        parser.add_argument("--think-ms", type=float, default=0, help="Pause between requests on a connection.")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user, trip, route_trip = self.seed()
+        try:
+            token = str(AccessToken.for_user(user))
+            endpoints = [
+                ("trip list", "/api/trips/"),
+                ("trip detail", f"/api/trips/{trip.pk}/"),
+                ("route by trip", f"/api/api/routes/by-trip/{route_trip.pk}/"),
+                ("collaborators", f"/api/trip/{trip.pk}/collaborators/"),
+                ("profile", "/api/user/profile/"),
+            ]
+            self.stdout.write(
+                f"{options['connections']} connections, {options['duration']:g}s per endpoint, "
+                f"{options['think_ms']:g} ms think time"
+            )
+            for mode, label in (("0", "sync"), ("1", "async")):
+                with uvicorn_server(mode, options["port"]):
+                    for name, path in endpoints:
+                        result = asyncio.run(self.drive(options, options["port"], path, token))
+                        self.report(label, name, result)
+        finally:
+            RoadtripUser.objects.filter(email__startswith="bench-async").delete()
+
+    def seed(self):
+        RoadtripUser.objects.filter(email__startswith="bench-async").delete()
+        user = RoadtripUser.objects.create_user(BENCH_EMAIL, "bench-password-123", "Bench", "Async")
+        collaborators = [
+            RoadtripUser.objects.create_user(f"bench-async-{i}@example.com", "bench-password-123", "Bench", f"Collaborator {i}")
+            for i in range(3)
+        ]
+        trips = Trip.objects.bulk_create(
+            Trip(title=f"Bench trip {i}", start_location="London", destination="Edinburgh",
+                 trip_date=datetime.date(2025, 6, 1), author=user)
+            for i in range(50)
+        )
+        for trip in trips:
+            trip.collaborators.add(*collaborators)
+        path = [{"lat": 51.5 + i * 0.01, "lng": -0.12 - i * 0.005} for i in range(500)]
+        Route.objects.create(trip=trips[-1], start_location="London", destination="Edinburgh",
+                             distance="403 mi", duration="7 hours 20 mins", route_path=json.dumps(path))
+        return user, trips[0], trips[-1]
+
+    # Keeps options["connections"] keep-alive connections busy for the duration.
+    async def drive(self, options, port, path, token):
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n"
+            "Accept: application/json\r\n\r\n"
+        ).encode()
+        latencies, errors = [], []
+        deadline = time.perf_counter() + options["duration"]
+
+        async def connection():
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError as exc:
+                errors.append(str(exc))
+                return
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    writer.write(request)
+                    await writer.drain()
+                    status_line = await reader.readline()
+                    length = 0
+                    while (line := await reader.readline()) not in (b"\r\n", b""):
+                        name, _, value = line.partition(b":")
+                        if name.strip().lower() == b"content-length":
+                            length = int(value)
+                    await reader.readexactly(length)
+                    if b" 200 " not in status_line:
+                        errors.append(status_line.decode().strip())
+                    latencies.append(time.perf_counter() - start)
+                    if options["think_ms"]:
+                        await asyncio.sleep(options["think_ms"] / 1000)
+            except (OSError, asyncio.IncompleteReadError) as exc:
+                errors.append(repr(exc))
+            finally:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection() for _ in range(options["connections"])))
+        return latencies, errors, time.perf_counter() - started
+
+    def report(self, label, name, result):
+        latencies, errors, elapsed = result
+        if len(latencies) < 2:
+            self.stdout.write(f"  {label:<6} {name:<14} no completed requests ({len(errors)} errors)")
+            return
+        cuts = statistics.quantiles(latencies, n=100)
+        line = (
+            f"  {label:<6} {name:<14} {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {cuts[49] * 1000:7.1f} ms  p99 {cuts[98] * 1000:7.1f} ms"
+        )
+        if errors:
+            line += f"  {len(errors)} errors, e.g. {errors[0]}"
+        self.stdout.write(line)
@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.benchmarks.server import uvicorn_server
+from api.models import RoadtripUser, Route, Trip
+
+BENCH_EMAIL = "bench-events@example.com"
+
+# Measures live trip events (api/events.py) under uvicorn: opens many subscribers on one trip's
+# event stream, then moves its pitstops one at a time through the pitstop operations endpoint.
+# Reports how long each change took to reach the subscribers (p50/p99), whether every subscriber
+# got every change, and the bytes per change against polling the route for it.
+# The seeded rows are deleted afterwards. Needs uvicorn installed.
+# Usage: python manage.py bench_events --subscribers 200 --events 50 [--interval-ms 50]
+class Command(BaseCommand):
+    help = "Measure live trip event delivery under uvicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=200)
+        parser.add_argument("--events", type=int, default=50, help="Pitstop changes to make.")
+        parser.add_argument("--interval-ms", type=float, default=50, help="Pause between changes.")
+        parser.add_argument("--port", type=int, default=8766)
+
+    def handle(self, *args, **options):
+        user, trip = self.seed()
+        try:
+            token = str(AccessToken.for_user(user))
+            with uvicorn_server("1", options["port"]):
+                result = asyncio.run(self.drive(options, options["port"], trip.pk, token))
+        finally:
+            RoadtripUser.objects.filter(email__startswith="bench-events").delete()
+        self.report(options, *result)
+
+    def seed(self):
+        RoadtripUser.objects.filter(email__startswith="bench-events").delete()
+        user = RoadtripUser.objects.create_user(BENCH_EMAIL, "bench-password-123", "Bench", "Events")
+        trip = Trip.objects.create(title="Bench trip", start_location="London", destination="Edinburgh",
+                                   trip_date=datetime.date(2025, 6, 1), author=user)
+        path = [{"lat": 51.5 + i * 0.01, "lng": -0.12 - i * 0.005} for i in range(500)]
+        Route.objects.create(trip=trip, start_location="London", destination="Edinburgh", distance="403 mi",
+                             duration="7 hours 20 mins", route_path=json.dumps(path),
+                             pitstops=[f"Services {i}" for i in range(8)])
+        return user, trip
+
+    async def drive(self, options, port, trip_id, token):
+        headers = f"Host: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n"
+        sent = {}  # pitstops version -> when the change was sent
+        received = [[] for _ in range(options["subscribers"])]  # per subscriber, (version, when, frame bytes)
+        ready = asyncio.Semaphore(0)
+
+        async def subscriber(index):
+            subscribed = False
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                writer.write(f"GET /api/trips/{trip_id}/events/ HTTP/1.1\r\n{headers}Accept: text/event-stream\r\n\r\n".encode())
+                status_line = await reader.readline()
+                if b" 200 " not in status_line:
+                    raise CommandError(f"Subscribing failed: {status_line.decode().strip()}")
+                while await reader.readline() not in (b"\r\n", b""):
+                    pass
+                buffer = b""
+                while len(received[index]) < options["events"]:
+                    size = int(await reader.readline(), 16)  # Chunked transfer encoding
+                    buffer += (await reader.readexactly(size + 2))[:-2]
+                    while b"\n\n" in buffer:
+                        frame, buffer = buffer.split(b"\n\n", 1)
+                        if not subscribed:  # The retry frame comes once the subscription is in place
+                            subscribed = True
+                            ready.release()
+                        if frame.startswith(b"event: pitstops\n"):
+                            data = json.loads(frame.split(b"data: ", 1)[1])
+                            received[index].append((data["version"], time.perf_counter(), len(frame) + 2))
+            finally:
+                if not subscribed:
+                    ready.release()  # Don't keep the benchmark waiting, gather() raises the error
+                writer.close()
+
+        async def request(reader, writer, method, path, body=b""):
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\n{headers}Accept: application/json\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            status_line = await reader.readline()
+            size = len(status_line)
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                size += len(line)
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            body = await reader.readexactly(length)
+            if b" 200 " not in status_line:
+                raise CommandError(f"{method} {path} failed: {status_line.decode().strip()}")
+            return body, size + 2 + length
+
+        subscribers = [asyncio.create_task(subscriber(i)) for i in range(options["subscribers"])]
+        for _ in subscribers:
+            await ready.acquire()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            _, poll_bytes = await request(reader, writer, "GET", f"/api/api/routes/by-trip/{trip_id}/")
+            for _ in range(options["events"]):
+                # Moving the first pitstop to the end changes them every time without growing the list.
+                body, _ = await request(reader, writer, "GET", f"/api/api/routes/by-trip/{trip_id}/")
+                first = json.loads(body)["pitstops"][0]
+                operations = json.dumps({"operations": [{"op": "move", "pitstop": first, "index": 99}]}).encode()
+                start = time.perf_counter()
+                body, _ = await request(reader, writer, "POST", f"/api/routes/{trip_id}/pitstops/", operations)
+                sent[json.loads(body)["version"]] = start
+                await asyncio.sleep(options["interval_ms"] / 1000)
+            await asyncio.wait_for(asyncio.gather(*subscribers), 10)
+        except asyncio.TimeoutError:
+            pass  # Reported as missed events
+        finally:
+            writer.close()
+            for task in subscribers:
+                task.cancel()
+        return sent, received, poll_bytes
+
+    def report(self, options, sent, received, poll_bytes):
+        latencies = [when - sent[version] for events in received for version, when, _ in events if version in sent]
+        frame_bytes = [size for events in received for _, _, size in events]
+        missed = sum(len(sent) - len({version for version, _, _ in events}) for events in received)
+        self.stdout.write(f"{options['subscribers']} subscribers, {len(sent)} pitstop changes, {options['interval_ms']:g} ms apart")
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100)
+            self.stdout.write(f"  delivery    p50 {cuts[49] * 1000:7.1f} ms  p99 {cuts[98] * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms")
+        self.stdout.write(f"  missed      {missed} of {len(sent) * options['subscribers']} deliveries")
+        if frame_bytes:
+            self.stdout.write(f"  per change  {statistics.mean(frame_bytes):7.0f} bytes as an event, {poll_bytes} bytes to poll the route")
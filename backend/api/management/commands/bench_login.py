@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from api.models import RoadtripUser
+from api.views import LoginViewWithFeedback
+
+# The login flow before the single-hash change: an existence query, then authenticate(),
+# then the parent serializer authenticating again. Kept here only as a baseline.
+class DoubleHashLoginSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        try:
+            RoadtripUser.objects.get(email=attrs["email"])
+        except RoadtripUser.DoesNotExist:
+            raise AuthenticationFailed("Invalid login credentials.")
+        if not authenticate(email=attrs["email"], password=attrs["password"]):
+            raise AuthenticationFailed("Invalid login credentials.")
+        return super().validate(attrs)
+
+class DoubleHashLoginView(LoginViewWithFeedback):
+    serializer_class = DoubleHashLoginSerializer
+
+# Measures logins per second on one core through LoginViewWithFeedback, using the configured
+# password hasher. Runs inside a transaction that is rolled back, so no users are left behind.
+# Usage: python manage.py bench_login --logins 20 [--baseline]
+class Command(BaseCommand):
+    help = "Benchmark login throughput of LoginViewWithFeedback."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=20)
+        parser.add_argument("--baseline", action="store_true", help="Also time the old double-hash flow.")
+
+    def handle(self, *args, **options):
+        email, password = "bench-login@example.com", "bench-password-123"
+        factory = APIRequestFactory()
+        views = [("single hash", LoginViewWithFeedback.as_view())]
+        if options["baseline"]:
+            views.append(("double hash (old)", DoubleHashLoginView.as_view()))
+        cases = [
+            ("valid", {"email": email, "password": password}, 200),
+            ("wrong password", {"email": email, "password": "wrong"}, 401),
+            ("unknown email", {"email": "nobody@example.com", "password": password}, 401),
+        ]
+
+        with transaction.atomic():
+            RoadtripUser.objects.create_user(email, password, "Bench", "Login")
+            self.stdout.write(f"{options['logins']} logins per case, one process")
+            for label, view in views:
+                for case, data, expected in cases:
+                    start = time.perf_counter()
+                    for _ in range(options["logins"]):
+                        response = view(factory.post("/api/token/", data, format="json"))
+                        if response.status_code != expected:
+                            raise CommandError(f"{label} {case}: expected {expected}, got {response.status_code} {response.data}")
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"  {label:<18} {case:<15} {options['logins'] / elapsed:8.1f} logins/s  "
+                        f"({elapsed / options['logins'] * 1000:7.1f} ms each)"
+                    )
+            transaction.set_rollback(True)
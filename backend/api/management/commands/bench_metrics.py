@@ -0,0 +1,81 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.benchmarks.scenarios import build_scenarios, scenario_path
+from api.benchmarks.seed import seed_dataset
+from api.metrics import record_query
+
+# Measures the overhead of the request metrics in api/metrics.py: the read endpoints of the
+# bench_api scenarios are requested in alternating rounds with the metrics middleware and query
+# wrapper in place and with both removed, and the total times compared. The renderer's timing
+# stays in both, as views pick their renderers when they are imported.
+# Usage: python manage.py bench_metrics --settings=backend.bench_settings [--rounds 10 --requests 20]
+class Command(BaseCommand):
+    help = "Measure the overhead of the request metrics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=10)
+        parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint per round.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        cache.clear()
+        try:
+            dataset = seed_dataset({"users": 5, "trips_per_user": 10})
+            scenarios = [
+                scenario for scenario in build_scenarios(dataset)
+                if scenario.get("method", "get") == "get" and scenario["url"] not in ("trip-export", "metrics")
+            ]
+            token = str(AccessToken.for_user(dataset["user"]))
+            requests = [(scenario_path(scenario), scenario.get("query")) for scenario in scenarios]
+
+            totals = {"with metrics": 0.0, "without metrics": 0.0}
+            for round in range(options["rounds"]):
+                if round % 2:  # Alternate which mode goes first
+                    totals["with metrics"] += self.time_requests(token, requests, options["requests"])
+                with self.without_metrics():
+                    totals["without metrics"] += self.time_requests(token, requests, options["requests"])
+                if not round % 2:
+                    totals["with metrics"] += self.time_requests(token, requests, options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            cache.clear()
+
+        count = options["rounds"] * options["requests"] * len(requests)
+        for label, total in totals.items():
+            self.stdout.write(f"  {label:<16} {total * 1000 / count:7.3f} ms per request")
+        overhead = totals["with metrics"] / totals["without metrics"] - 1
+        self.stdout.write(f"{len(requests)} endpoints, {count} requests per mode, overhead {overhead:+.1%}")
+
+    # A new client each time, as the test client loads the middleware once.
+    def time_requests(self, token, requests, repeat):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        client.get(*requests[0])
+        start = time.perf_counter()
+        for path, query in requests:
+            for _ in range(repeat):
+                client.get(path, query)
+        return time.perf_counter() - start
+
+    @contextmanager
+    def without_metrics(self):
+        middleware = [name for name in settings.MIDDLEWARE if name != "api.metrics.MetricsMiddleware"]
+        with override_settings(MIDDLEWARE=middleware):
+            connection.execute_wrappers.remove(record_query)
+            try:
+                yield
+            finally:
+                connection.execute_wrappers.append(record_query)
@@ -0,0 +1,74 @@
+import random
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand
+
+from api.petrol import LITRES_PER_GALLON, compute_costs, to_pence, split_pence, format_pence, format_shares
+
+# Compares the vectorised petrol estimate with a naive per-combination loop.
+# Usage: python manage.py bench_petrol_costs --trips 200 --vehicles 300
+class Command(BaseCommand):
+    help = "Benchmark batch petrol cost estimation against a per-row loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trips", type=int, default=200)
+        parser.add_argument("--vehicles", type=int, default=300)
+        parser.add_argument("--passengers", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        distances = [rng.uniform(5, 600) for _ in range(options["trips"])]
+        mpgs = [rng.uniform(25, 75) for _ in range(options["vehicles"])]
+        price = Decimal("1.459")
+        passengers = options["passengers"]
+        combinations = len(distances) * len(mpgs)
+
+        def naive():
+            costs = []
+            for distance in distances:
+                for mpg in mpgs:
+                    gallons = distance / mpg
+                    litres = gallons * LITRES_PER_GALLON
+                    costs.append(litres * float(price))
+            return costs
+
+        # What a per-row implementation does: Decimal rounding and a share split for every combination.
+        def naive_rounded():
+            results = []
+            for cost in naive():
+                total = Decimal(repr(cost)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                base, extra = divmod(int(total * 100), passengers)
+                results.append((str(total), format_shares(base, extra, passengers)))
+            return results
+
+        def vectorised():
+            return compute_costs(distances, mpgs, price)[1]
+
+        def vectorised_rounded():
+            pence = to_pence(vectorised())
+            base, extra = split_pence(pence, passengers)
+            return [
+                (format_pence(p), format_shares(b, e, passengers))
+                for p, b, e in zip(pence.ravel().tolist(), base.ravel().tolist(), extra.ravel().tolist())
+            ]
+
+        self.stdout.write(f"{len(distances)} trips x {len(mpgs)} vehicles = {combinations} combinations")
+        for label, func in [
+            ("naive loop, costs only", naive),
+            ("vectorised, costs only", vectorised),
+            ("naive loop, strings + shares", naive_rounded),
+            ("vectorised, strings + shares", vectorised_rounded),
+        ]:
+            seconds = self.best_of(func)
+            self.stdout.write(f"  {label:<28} {seconds * 1000:9.2f} ms  ({seconds / combinations * 1e9:7.1f} ns/combination)")
+
+    def best_of(self, func, repeat=5):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
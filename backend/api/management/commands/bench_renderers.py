@@ -0,0 +1,71 @@
+import random
+import timeit
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+
+from api.benchmarks.seed import random_walk
+from api.compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from api.models import Route
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+from api.serializers import RouteSerializer
+
+# Compares response encodings on large RouteSerializer payloads: a list of routes with long
+# route paths, pitstops and passenger shares, as /api/routes/ returns them. Reports encode time
+# and size for DRF's JSONRenderer, the orjson renderer and MessagePack, then the time and bytes
+# saved by gzip and brotli on the JSON body. Formats whose package is missing are skipped.
+# Usage: python manage.py bench_renderers --routes 20 --points 500 2000 --repeat 50
+class Command(BaseCommand):
+    help = "Benchmark JSON, MessagePack and compression on large route payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--routes", type=int, default=20, help="Routes per payload, like one page of /api/routes/.")
+        parser.add_argument("--points", type=int, nargs="+", default=[500, 2000, 5000])
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        repeat = options["repeat"]
+
+        renderers = [("drf json", DRFJSONRenderer())]
+        if orjson is not None:
+            renderers.append(("orjson", ORJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+        compressors = [("gzip", lambda body: zlib.compress(body, GZIP_LEVEL, wbits=31))]
+        if brotli is not None:
+            compressors.append(("brotli", lambda body: brotli.compress(body, quality=BROTLI_QUALITY)))
+
+        for count in options["points"]:
+            data = RouteSerializer(self.routes(rng, options["routes"], count), many=True).data
+            self.stdout.write(f"{options['routes']} routes of {count} points:")
+            for label, renderer in renderers:
+                body = renderer.render(data)
+                seconds = timeit.timeit(lambda: renderer.render(data), number=repeat) / repeat
+                self.stdout.write(f"  {label:<10} {seconds * 1000:8.2f} ms  {len(body):>10} bytes")
+
+            body = renderers[0][1].render(data)  # Every JSON renderer produces the same bytes
+            for label, compress in compressors:
+                compressed = compress(body)
+                seconds = timeit.timeit(lambda: compress(body), number=repeat) / repeat
+                saved = 1 - len(compressed) / len(body)
+                self.stdout.write(f"  {'json+' + label:<10} {seconds * 1000:8.2f} ms  {len(compressed):>10} bytes  ({saved:.0%} saved)")
+
+    # Unsaved routes with long paths, pitstops and per-passenger shares.
+    def routes(self, rng, number, points):
+        now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        routes = []
+        for i in range(number):
+            route = Route(
+                trip_id=i + 1, start_location="London", destination="Edinburgh", distance=f"{rng.randint(20, 500)} mi",
+                duration="7 hours 20 mins", pitstops=[f"Services {n}" for n in range(rng.randint(3, 12))],
+                petrol_cost=Decimal(rng.randint(1000, 9000)) / 100, created_at=now, updated_at=now,
+                passenger_shares=[{"name": f"Passenger {n}", "share": f"{rng.randint(100, 3000) / 100:.2f}"} for n in range(4)],
+            )
+            route.path_points = random_walk(rng, points)
+            routes.append(route)
+        return routes
@@ -0,0 +1,51 @@
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.polyline import encode_polyline, decode_polyline, pack_points, unpack_points, format_route_path
+
+# Compares the old JSON-stringified polyline storage of Route.route_path with the packed
+# int32 delta format in RouteGeometry.geometry: stored size, API read cost and geometry decode cost.
+# Usage: python manage.py bench_route_path --points 500 --repeat 2000
+class Command(BaseCommand):
+    help = "Benchmark packed route geometry against the JSON-stringified polyline format."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, nargs="+", default=[100, 500, 2000])
+        parser.add_argument("--repeat", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        repeat = options["repeat"]
+
+        for count in options["points"]:
+            points = self.random_walk(rng, count)
+            polyline = encode_polyline(points)
+            json_column = json.dumps(json.dumps(polyline))  # What the JSONField stored
+            packed = pack_points(points)
+
+            timings = {
+                "json read (api)": timeit.timeit(lambda: json.loads(json_column), number=repeat),
+                "packed read (api)": timeit.timeit(lambda: format_route_path(packed), number=repeat),
+                "json decode geometry": timeit.timeit(lambda: decode_polyline(json.loads(json.loads(json_column))), number=repeat),
+                "packed decode geometry": timeit.timeit(lambda: unpack_points(packed), number=repeat),
+                "json write": timeit.timeit(lambda: json.dumps(json.dumps(encode_polyline(points))), number=repeat),
+                "packed write": timeit.timeit(lambda: pack_points(points), number=repeat),
+            }
+
+            self.stdout.write(f"{count} points: json column {len(json_column.encode())} bytes, packed column {len(packed)} bytes")
+            for label, seconds in timings.items():
+                self.stdout.write(f"  {label:<24} {seconds / repeat * 1e6:10.1f} us/op")
+
+    # A road-like path across the UK: small steps with occasional turns.
+    def random_walk(self, rng, count):
+        lat, lng = 5150000, -12000
+        points = []
+        for _ in range(count):
+            lat += rng.randint(-300, 600)
+            lng += rng.randint(-600, 600)
+            points.append((lat, lng))
+        return points
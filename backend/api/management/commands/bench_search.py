@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks.seed import TOWNS
+from api.models import RoadtripUser, Route, SearchWord, Trip, TripSearchTerm
+from api.search import index_trips, search_trips
+
+# Times trip search (api/search.py) for an account with many trips, next to other accounts of
+# the same size, against a SQLite test database. Reports p50/p99 per query and the number of
+# index rows, and compares with filtering every trip's fields in Python as the browser does now.
+# Usage: python manage.py bench_search --settings=backend.bench_settings [--trips 20000 --users 3]
+class Command(BaseCommand):
+    help = "Benchmark trip search on large accounts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trips", type=int, default=20000, help="Trips per account.")
+        parser.add_argument("--users", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = self.seed(options)
+            queries = ["Edinburgh", "edinbrugh", "york services", "Leeds to Bath", "zzzz"]
+            self.stdout.write(
+                f"{options['users']} accounts of {options['trips']} trips, {TripSearchTerm.objects.filter(user=user).count()} "
+                f"index rows each, {SearchWord.objects.count()} words"
+            )
+            for query in queries:
+                timings, results = [], []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    results = search_trips(user, query)
+                    timings.append(time.perf_counter() - start)
+                scan = self.time_scan(user, query)
+                cuts = statistics.quantiles(timings, n=100)
+                self.stdout.write(
+                    f"  {query!r:<18} {len(results):>3} results  p50 {cuts[49] * 1000:7.2f} ms  "
+                    f"p99 {cuts[98] * 1000:7.2f} ms  (full scan {scan * 1000:7.1f} ms)"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        password = make_password("bench-password-123")
+        users = RoadtripUser.objects.bulk_create(
+            RoadtripUser(email=f"bench-search-{i}@example.com", first_name="Bench", last_name=f"Search {i}", password=password)
+            for i in range(options["users"])
+        )
+        for user in users:
+            for offset in range(0, options["trips"], 1000):
+                trips = []
+                for i in range(offset, min(offset + 1000, options["trips"])):
+                    start, destination = rng.sample(TOWNS, 2)
+                    trips.append(Trip(author=user, title=f"{start} to {destination} {i}", start_location=start,
+                                      destination=destination, trip_date=date(2025, 1, 1)))
+                trips = Trip.objects.bulk_create(trips)
+                Route.objects.bulk_create(
+                    Route(trip=trip, start_location=trip.start_location, destination=trip.destination, distance="100 mi",
+                          duration="2 hours", pitstops=[f"{rng.choice(TOWNS)} services {n}" for n in range(3)])
+                    for trip in trips
+                )
+                index_trips(trip.pk for trip in trips)
+        return users[0]
+
+    # Loading every trip and matching substrings, what the trip list page has to do without search.
+    def time_scan(self, user, query):
+        start = time.perf_counter()
+        needle = query.casefold()
+        rows = Trip.objects.visible_to(user).values_list("title", "start_location", "destination", "route__pitstops")
+        [row for row in rows if any(needle in str(value).casefold() for value in row)]
+        return time.perf_counter() - start
@@ -0,0 +1,122 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Place
+from api.spatial import point_cell
+
+# OpenStreetMap amenity/tourism tags mapped onto the pitstop filter names used by the frontend.
+# Values already using the filter names pass through unchanged.
+CATEGORY_ALIASES = {
+    "fuel": "gas_station",
+    "petrol_station": "gas_station",
+    "service_station": "gas_station",
+    "services": "gas_station",
+    "charging": "charging_station",
+    "electric_vehicle_charging_station": "charging_station",
+    "toilets": "restroom",
+    "toilet": "restroom",
+    "fast_food": "restaurant",
+    "food_court": "restaurant",
+    "pub": "restaurant",
+    "cafe": "cafe",
+    "café": "cafe",
+    "coffee_shop": "cafe",
+    "hotel": "lodging",
+    "motel": "lodging",
+    "guest_house": "lodging",
+    "hostel": "lodging",
+    "attraction": "tourist_attraction",
+    "viewpoint": "tourist_attraction",
+    "museum": "tourist_attraction",
+}
+
+def normalise_category(category):
+    key = str(category or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return CATEGORY_ALIASES.get(key, key)
+
+# Rows from a CSV with name, category, lat and lng columns, plus optional address and id.
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield {
+                "name": row.get("name"),
+                "category": row.get("category"),
+                "address": row.get("address", ""),
+                "lat": row.get("lat") or row.get("latitude"),
+                "lng": row.get("lng") or row.get("lon") or row.get("longitude"),
+                "source_id": row.get("id", ""),
+            }
+
+# Point features from a GeoJSON FeatureCollection, e.g. an OpenStreetMap export.
+def read_geojson(path):
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f).get("features", [])
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            continue
+        properties = feature.get("properties") or {}
+        lng, lat = geometry["coordinates"][:2]
+        address = properties.get("address") or " ".join(
+            filter(None, (properties.get("addr:street"), properties.get("addr:city"), properties.get("addr:postcode")))
+        )
+        yield {
+            "name": properties.get("name"),
+            "category": properties.get("category") or properties.get("amenity") or properties.get("tourism"),
+            "address": address,
+            "lat": lat,
+            "lng": lng,
+            "source_id": str(feature.get("id") or properties.get("id") or ""),
+        }
+
+# Bulk-loads pitstop places from CSV or GeoJSON files into the Place table.
+# Rows without a name, category or valid coordinates are skipped. The table is replaced
+# in a single transaction, so the command can be re-run safely with an updated dataset.
+# Usage: python manage.py load_places services.csv attractions.geojson
+class Command(BaseCommand):
+    help = "Load pitstop places from CSV or GeoJSON files into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        places = []
+        skipped = 0
+        for path in options["paths"]:
+            reader = read_geojson if Path(path).suffix.lower() in (".geojson", ".json") else read_csv
+            try:
+                rows = list(reader(path))
+            except (OSError, ValueError, csv.Error) as e:
+                raise CommandError(f"Could not read {path}: {e}")
+
+            for row in rows:
+                try:
+                    lat, lng = float(row["lat"]), float(row["lng"])
+                except (TypeError, ValueError):
+                    skipped += 1
+                    continue
+                name = (row["name"] or "").strip()
+                category = normalise_category(row["category"])
+                if not name or not category or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                    skipped += 1
+                    continue
+                places.append(Place(
+                    name=name[:200],
+                    category=category[:50],
+                    address=(row["address"] or "").strip()[:255],
+                    lat=lat,
+                    lng=lng,
+                    cell=point_cell(lat, lng),
+                    source_id=(row["source_id"] or "")[:100],
+                ))
+
+        with transaction.atomic():
+            Place.objects.all().delete()
+            Place.objects.bulk_create(places, batch_size=options["batch_size"])
+
+        self.stdout.write(f"Loaded {len(places)} places, skipped {skipped} rows")
@@ -0,0 +1,76 @@
+import json
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Vehicle
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "fuelData.json"
+
+# Maps the dataset's fuel descriptions onto the categories shown in the petrol calculator.
+def normalise_fuel_type(fuel_type):
+    lower = fuel_type.lower()
+    if "electric" in lower and ("petrol" in lower or "diesel" in lower):
+        return "Hybrid"
+    if "electric" in lower:
+        return "Electric"
+    if "diesel" in lower:
+        return "Diesel"
+    if "petrol" in lower:
+        return "Petrol"
+    return fuel_type.strip().title()
+
+def one_decimal(value):
+    return Decimal(str(value)).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+
+# Bulk-loads the fuel economy dataset into the Vehicle table.
+# Rows without a usable mpg figure are skipped, and duplicate manufacturer/model/fuel type
+# rows are merged into one with their average, minimum and maximum mpg.
+# The table is replaced in a single transaction, so the command can be re-run safely.
+# Usage: python manage.py load_vehicles [--path fuelData.json]
+class Command(BaseCommand):
+    help = "Load the vehicle fuel economy dataset into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=str(DEFAULT_PATH))
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        grouped = defaultdict(list)
+        for row in rows:
+            mpg = row.get("WLTP Imperial Combined")
+            if not mpg or mpg <= 0:
+                continue
+            manufacturer = row["Manufacturer"].strip()
+            model = row["Model"].strip()
+            grouped[(manufacturer, model, normalise_fuel_type(row["Fuel Type"]))].append(mpg)
+
+        vehicles = [
+            Vehicle(
+                manufacturer=manufacturer,
+                model=model,
+                fuel_type=fuel_type,
+                manufacturer_key=manufacturer.lower(),
+                model_key=model.lower(),
+                mpg=one_decimal(sum(figures) / len(figures)),
+                min_mpg=one_decimal(min(figures)),
+                max_mpg=one_decimal(max(figures)),
+                variants=len(figures),
+            )
+            for (manufacturer, model, fuel_type), figures in sorted(grouped.items())
+        ]
+
+        with transaction.atomic():
+            Vehicle.objects.all().delete()
+            Vehicle.objects.bulk_create(vehicles, batch_size=options["batch_size"])
+
+        self.stdout.write(f"Loaded {len(vehicles)} vehicles from {len(rows)} rows")
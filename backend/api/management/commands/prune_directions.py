@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.directions import DEFAULT_MAX_ENTRIES, DEFAULT_TTL, prune_directions
+
+# Expires and evicts cached directions results and deletes route geometry nothing uses any more.
+# Run it periodically, e.g. daily from cron.
+# Usage: python manage.py prune_directions [--max-entries 50000] [--ttl-days 30]
+class Command(BaseCommand):
+    help = "Prune the directions cache and unused route geometry."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+        parser.add_argument("--ttl-days", type=float, default=DEFAULT_TTL.total_seconds() / 86400)
+
+    def handle(self, *args, **options):
+        expired, evicted, unused = prune_directions(timedelta(days=options["ttl_days"]), options["max_entries"])
+        self.stdout.write(f"Expired {expired}, evicted {evicted} least recently used, deleted {unused} unused geometries")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.search import prune_search_words
+
+# Deletes the search vocabulary words that no trip uses any more, left behind when trips are
+# renamed or deleted. Run it periodically, e.g. daily from cron.
+# Usage: python manage.py prune_search_words
+class Command(BaseCommand):
+    help = "Delete search vocabulary words no trip uses any more."
+
+    def handle(self, *args, **options):
+        deleted = prune_search_words()
+        self.stdout.write(f"Deleted {deleted} unused search words")
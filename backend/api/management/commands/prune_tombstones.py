@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.sync import prune_tombstones
+
+# Deletes the tombstones of deleted trips and collaborator removals that no sync cursor still
+# in use can need. Run it periodically, e.g. daily from cron.
+# Usage: python manage.py prune_tombstones [--days 30]
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.SYNC_TOMBSTONE_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options["days"])
+        self.stdout.write(f"Deleted {deleted} tombstones older than {options['days']} days")
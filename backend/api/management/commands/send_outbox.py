@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import deliver_pending
+
+# Background worker that drains the email outbox.
+# Usage: python manage.py send_outbox            (runs until stopped)
+#        python manage.py send_outbox --once     (drains what is due, then exits)
+class Command(BaseCommand):
+    help = "Send queued transactional emails from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once nothing is due.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = deliver_pending(options["batch_size"], options["max_attempts"])
+            except Exception as e:
+                # Usually the mail server is unreachable. Nothing was marked as sent, so retry later.
+                if options["once"]:
+                    raise
+                self.stderr.write(f"Outbox delivery failed: {e}")
+                time.sleep(options["interval"])
+                continue
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,30 @@
+import re
+
+from .petrol import parse_distance_miles
+
+# Numeric forms of the display strings clients save in Route.distance and Route.duration,
+# e.g. "212 mi" and "3 hours 40 mins", kept in Route.distance_m and Route.duration_s so the
+# database can filter, sort and aggregate routes by length.
+
+METERS_PER_MILE = 1609.344
+MAX_VALUE = 2**31 - 1  # Largest value the integer columns hold
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(d|days?|h|hours?|hrs?|m|mins?|minutes?|s|secs?|seconds?)\b", re.IGNORECASE)
+_UNIT_SECONDS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+def _stored(value):
+    return round(value) if value <= MAX_VALUE else None
+
+# A distance string in whole meters, or None if it cannot be read.
+def distance_meters(text):
+    miles = parse_distance_miles(text)
+    return None if miles is None else _stored(miles * METERS_PER_MILE)
+
+# A duration string such as "1 day 2 hours" or "45 mins" in seconds, or None if it cannot be read.
+def duration_seconds(text):
+    if text is None:
+        return None
+    parts = _DURATION_PATTERN.findall(str(text))
+    if not parts:
+        return None
+    return _stored(sum(float(value) * _UNIT_SECONDS[unit[0].lower()] for value, unit in parts))
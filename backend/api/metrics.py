@@ -0,0 +1,198 @@
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Request metrics in the Prometheus text format. MetricsMiddleware times every request and
+# records, per URL name and method: latency, database queries and their time, time spent in
+# serializers building the response data (see api/serializers.py), time spent encoding it
+# (see api/renderers.py) and response size. Each is a histogram with
+# fixed buckets, so recording is a bisect and a few additions under a lock.
+# Queries are counted by a wrapper installed on every database connection, which only does
+# work while a request is being measured. Requests slower than settings.SLOW_REQUEST_MS are
+# logged with their queries.
+
+logger = logging.getLogger("api.slow_requests")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+MAX_RECORDED_QUERIES = 1000  # Per request, for the slow-request log; all queries are counted
+MAX_LOGGED_QUERIES = 50
+
+_current = ContextVar("request_metrics", default=None)
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=("view", "method")):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            label_text = _format_labels(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name, help, labels=("view", "method", "status")):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, labels):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.labels, labels)}}} {value}")
+        return lines
+
+_lock = threading.Lock()
+REQUESTS = Counter("roadtrip_requests_total", "Requests by URL name, method and status.")
+REQUEST_SECONDS = Histogram("roadtrip_request_seconds", "Time to produce the response.", SECONDS_BUCKETS)
+DB_QUERIES = Histogram("roadtrip_db_queries", "Database queries per request.", QUERY_BUCKETS)
+DB_SECONDS = Histogram("roadtrip_db_seconds", "Time spent in database queries per request.", SECONDS_BUCKETS)
+SERIALIZE_SECONDS = Histogram("roadtrip_serialize_seconds", "Time spent in serializers building the response data, queries they run included.", SECONDS_BUCKETS)
+RENDER_SECONDS = Histogram("roadtrip_render_seconds", "Time spent encoding the response data into the body.", SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram("roadtrip_response_bytes", "Response body size as sent, for non-streaming responses.", BYTES_BUCKETS)
+METRICS = (REQUESTS, REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, SERIALIZE_SECONDS, RENDER_SECONDS, RESPONSE_BYTES)
+
+# Per-request tallies, shared with sync_to_async threads through the context variable.
+class RequestMetrics:
+    __slots__ = ("query_count", "queries", "db_seconds", "serialize_seconds", "render_seconds")
+
+    def __init__(self):
+        self.query_count = 0
+        self.queries = []  # (sql, seconds); the SQL strings already exist, so keeping them is cheap
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.query_count += 1
+        metrics.db_seconds += elapsed
+        if len(metrics.queries) < MAX_RECORDED_QUERIES:
+            metrics.queries.append((sql, elapsed))
+
+def add_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+connection_created.connect(add_query_wrapper)
+
+# Adds serializer time to the current request, if it is being measured.
+def record_serialize(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.serialize_seconds += seconds
+
+# Adds rendering time to the current request, if it is being measured.
+def record_render(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.render_seconds += seconds
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, metrics, elapsed):
+        match = request.resolver_match
+        labels = (match.view_name if match else "unmatched", request.method)
+        size = None if response.streaming else len(response.content)
+        with _lock:
+            REQUESTS.inc((*labels, response.status_code))
+            REQUEST_SECONDS.observe(labels, elapsed)
+            DB_QUERIES.observe(labels, metrics.query_count)
+            DB_SECONDS.observe(labels, metrics.db_seconds)
+            SERIALIZE_SECONDS.observe(labels, metrics.serialize_seconds)
+            RENDER_SECONDS.observe(labels, metrics.render_seconds)
+            if size is not None:
+                RESPONSE_BYTES.observe(labels, size)
+
+        if elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            queries = sorted(metrics.queries, key=lambda query: query[1], reverse=True)[:MAX_LOGGED_QUERIES]
+            logger.warning(
+                "Slow request: %s %s (%s) %s in %.1f ms, %d queries in %.1f ms, serializers %.1f ms, rendering %.1f ms\n%s",
+                request.method, request.path, labels[0], response.status_code, elapsed * 1000,
+                metrics.query_count, metrics.db_seconds * 1000, metrics.serialize_seconds * 1000, metrics.render_seconds * 1000,
+                "\n".join(f"  {seconds * 1000:8.2f} ms  {sql}" for sql, seconds in queries),
+            )
+
+# The metrics of this process in the Prometheus text format, for scrapers sending
+# settings.METRICS_TOKEN as a bearer token. They name every endpoint and its traffic, so
+# without a token configured they are not served at all.
+def metrics_view(request):
+    if not settings.METRICS_TOKEN:
+        return HttpResponseForbidden()
+    expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+        return HttpResponseForbidden()
+    with _lock:
+        lines = [line for metric in METRICS for line in metric.render()]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
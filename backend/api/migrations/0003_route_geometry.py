@@ -0,0 +1,140 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+import json
+import sys
+import zlib
+from array import array
+
+from django.db import migrations, models
+
+# The polyline helpers of api/polyline.py as they were when this migration was written, so it
+# keeps converting the same way whatever becomes of that module.
+
+PRECISION = 100000
+
+
+def decode_polyline(encoded):
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat, lng))
+    return points
+
+
+def encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    out = []
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+    return "".join(out)
+
+
+def pack_points(points):
+    if not points:
+        return b""
+    values = array("i")
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        values.append(lat - prev_lat)
+        values.append(lng - prev_lng)
+        prev_lat, prev_lng = lat, lng
+    if sys.byteorder == "big":
+        values.byteswap()
+    return zlib.compress(values.tobytes())
+
+
+def unpack_deltas(data):
+    values = array("i")
+    if data:
+        values.frombytes(zlib.decompress(bytes(data)))
+        if sys.byteorder == "big":
+            values.byteswap()
+    return values
+
+
+def point_from_coordinate(coordinate):
+    if isinstance(coordinate, dict):
+        lat, lng = coordinate["lat"], coordinate["lng"]
+    else:
+        lat, lng = coordinate
+    return round(float(lat) * PRECISION), round(float(lng) * PRECISION)
+
+
+def parse_route_path(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return decode_polyline(value)
+        if isinstance(value, dict):
+            value = value.get("points", "")
+        if isinstance(value, str):
+            return decode_polyline(value)
+    if isinstance(value, list):
+        return [point_from_coordinate(coordinate) for coordinate in value]
+    raise ValueError("Unsupported route_path format")
+
+
+def format_route_path(data):
+    if not data:
+        return ""
+    return json.dumps("".join(map(encode_value, unpack_deltas(data))))
+
+
+# Decodes each stored polyline and packs it into the binary geometry column.
+def pack_route_paths(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    for route in Route.objects.only("pk", "route_path").iterator(chunk_size=500):
+        try:
+            route_geometry = pack_points(parse_route_path(route.route_path))
+        except (ValueError, TypeError, KeyError, OverflowError):
+            route_geometry = b""  # Unreadable paths are recalculated by the client
+        Route.objects.filter(pk=route.pk).update(route_geometry=route_geometry)
+
+
+# Restores the JSON-stringified polyline from the packed geometry.
+def unpack_route_paths(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    for route in Route.objects.only("pk", "route_geometry").iterator(chunk_size=500):
+        route_path = format_route_path(route.route_geometry) or []
+        Route.objects.filter(pk=route.pk).update(route_path=route_path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='route_geometry',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.RunPython(pack_route_paths, unpack_route_paths),
+        migrations.RemoveField(
+            model_name='route',
+            name='route_path',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_trip_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='pitstops_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_route_pitstops_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vehicle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('manufacturer', models.CharField(max_length=100)),
+                ('model', models.CharField(max_length=150)),
+                ('fuel_type', models.CharField(max_length=50)),
+                ('manufacturer_key', models.CharField(max_length=100)),
+                ('model_key', models.CharField(max_length=150)),
+                ('mpg', models.DecimalField(decimal_places=1, max_digits=5)),
+                ('min_mpg', models.DecimalField(decimal_places=1, max_digits=5)),
+                ('max_mpg', models.DecimalField(decimal_places=1, max_digits=5)),
+                ('variants', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['manufacturer_key', 'model_key', 'fuel_type'], name='vehicle_prefix_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops', 'varchar_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('manufacturer', 'model', 'fuel_type'), name='unique_vehicle')],
+            },
+        ),
+    ]
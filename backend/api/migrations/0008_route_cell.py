@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import math
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A copy of the grid of api/spatial.py and the geometry unpacking of api/polyline.py, so the
+# cells written here do not depend on what those modules later become.
+
+PRECISION = 100000
+CELL_DEGREES = 0.2
+CELL_UNITS = round(CELL_DEGREES * PRECISION)
+LNG_CELLS = round(360 / CELL_DEGREES) + 1
+LNG_WRAP = round(360 / CELL_DEGREES)
+
+
+def unpack_points(data):
+    values = array("i")
+    if data:
+        values.frombytes(zlib.decompress(bytes(data)))
+        if sys.byteorder == "big":
+            values.byteswap()
+    return list(zip(accumulate(values[0::2]), accumulate(values[1::2])))
+
+
+def cell_id(lat_index, lng_index):
+    return lat_index * LNG_CELLS + lng_index
+
+
+def grid(value, offset):
+    return (value + offset * PRECISION) / CELL_UNITS
+
+
+def column(lng_index):
+    return lng_index if 0 <= lng_index <= LNG_WRAP else lng_index % LNG_WRAP
+
+
+def segment_cells(a, b, cells):
+    x0, y0 = grid(a[0], 90), grid(a[1], 180)
+    x1, y1 = grid(b[0], 90), grid(b[1], 180)
+    if abs(y1 - y0) > LNG_WRAP / 2:
+        y1 -= math.copysign(LNG_WRAP, y1 - y0)
+    cx, cy = math.floor(x0), math.floor(y0)
+    end_x, end_y = math.floor(x1), math.floor(y1)
+    cells.add(cell_id(cx, cy))
+    if (cx, cy) == (end_x, end_y):
+        return
+
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    next_x = ((cx + (step_x > 0)) - x0) / dx if dx else math.inf
+    next_y = ((cy + (step_y > 0)) - y0) / dy if dy else math.inf
+    delta_x = abs(1 / dx) if dx else math.inf
+    delta_y = abs(1 / dy) if dy else math.inf
+
+    for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+        if next_x < next_y:
+            cx += step_x
+            next_x += delta_x
+        else:
+            cy += step_y
+            next_y += delta_y
+        cells.add(cell_id(cx, column(cy)))
+
+
+def path_cells(points):
+    cells = set()
+    if len(points) == 1:
+        segment_cells(points[0], points[0], cells)
+    for a, b in zip(points, points[1:]):
+        segment_cells(a, b, cells)
+    return cells
+
+
+# Indexes the geometry of routes saved before the grid index existed.
+def index_existing_routes(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    RouteCell = apps.get_model("api", "RouteCell")
+    for trip_id, geometry in Route.objects.values_list("trip_id", "route_geometry").iterator(chunk_size=500):
+        RouteCell.objects.bulk_create(
+            [RouteCell(route_id=trip_id, cell=cell) for cell in sorted(path_cells(unpack_points(geometry)))],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_vehicle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.PositiveIntegerField()),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='api.route')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cell', 'route'), name='unique_route_cell')],
+            },
+        ),
+        migrations.RunPython(index_existing_routes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_route_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('category', models.CharField(max_length=50)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('cell', models.PositiveIntegerField()),
+                ('source_id', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell', 'category'], name='place_cell_idx')],
+            },
+        ),
+    ]
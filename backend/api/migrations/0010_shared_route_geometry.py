@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:44
+
+import hashlib
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Moves each route's own copy of its geometry into one shared row per distinct geometry.
+def share_route_geometry(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    RouteGeometry = apps.get_model("api", "RouteGeometry")
+    for trip_id, packed in Route.objects.values_list("trip_id", "route_geometry").iterator(chunk_size=500):
+        if not packed:
+            continue
+        packed = bytes(packed)
+        geometry, _ = RouteGeometry.objects.get_or_create(digest=hashlib.sha256(packed).hexdigest(), defaults={"geometry": packed})
+        Route.objects.filter(pk=trip_id).update(geometry=geometry)
+
+
+# Gives each route its own copy of the shared geometry again.
+def copy_route_geometry(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    for trip_id, packed in Route.objects.filter(geometry__isnull=False).values_list("trip_id", "geometry__geometry").iterator(chunk_size=500):
+        Route.objects.filter(pk=trip_id).update(route_geometry=packed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_place'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteGeometry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('geometry', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='geometry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='routes', to='api.routegeometry'),
+        ),
+        migrations.RunPython(share_route_geometry, copy_route_geometry),
+        migrations.RemoveField(
+            model_name='route',
+            name='route_geometry',
+        ),
+        migrations.CreateModel(
+            name='DirectionsResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('origin', models.CharField(max_length=255)),
+                ('destination', models.CharField(max_length=255)),
+                ('waypoints', models.JSONField(blank=True, default=list)),
+                ('distance', models.CharField(max_length=50)),
+                ('duration', models.CharField(max_length=50)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('geometry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='directions', to='api.routegeometry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fetched_at'], name='directions_fetched_idx'), models.Index(fields=['last_used_at'], name='directions_lru_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_shared_route_geometry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # TripCollaborator takes over the table Django created for Trip.collaborators,
+        # so only the model state changes here.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='TripCollaborator',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.trip')),
+                        ('roadtripuser', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'api_trip_collaborators',
+                        'unique_together': {('trip', 'roadtripuser')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='trip',
+                    name='collaborators',
+                    field=models.ManyToManyField(blank=True, related_name='collaborated_trips', through='api.TripCollaborator', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='tripcollaborator',
+            name='added_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='tripcollaborator',
+            index=models.Index(fields=['roadtripuser', 'added_at'], name='collaborator_added_idx'),
+        ),
+        migrations.CreateModel(
+            name='TripTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('trip_id', models.BigIntegerField()),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('removed', 'Removed')], max_length=10)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_idx'),
+                    models.Index(fields=['deleted_at'], name='tombstone_prune_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['author', 'updated_at'], name='trip_author_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['updated_at', 'trip'], name='route_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:37
+
+import re
+
+from django.db import migrations, models
+
+# The distance and duration parsing of api/measures.py and api/petrol.py as of this migration,
+# copied so the stored measures stay what this migration computed.
+
+METERS_PER_MILE = 1609.344
+MILES_PER_KM = 0.621371
+MAX_VALUE = 2**31 - 1
+
+NUMBER = r"(\d[\d,]*(?:\.\d+)?)"  # A number starts with a digit, so a lone comma is no number
+DISTANCE_PATTERN = re.compile(NUMBER + r"\s*(mi|miles?|km|kilometers?|kilometres?|m)\b", re.IGNORECASE)
+BARE_NUMBER = re.compile(r"\s*" + NUMBER + r"\s*")
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(d|days?|h|hours?|hrs?|m|mins?|minutes?|s|secs?|seconds?)\b", re.IGNORECASE)
+UNIT_SECONDS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+def stored(value):
+    return round(value) if value <= MAX_VALUE else None
+
+
+def distance_meters(text):
+    if text is None:
+        return None
+    text = str(text)
+    match = DISTANCE_PATTERN.search(text) or BARE_NUMBER.fullmatch(text)
+    if not match:
+        return None
+    miles = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) if match.re is DISTANCE_PATTERN else "mi").lower()
+    if unit.startswith("k"):
+        miles *= MILES_PER_KM
+    elif unit == "m":
+        miles = miles / 1000 * MILES_PER_KM
+    return stored(miles * METERS_PER_MILE)
+
+
+def duration_seconds(text):
+    if text is None:
+        return None
+    parts = DURATION_PATTERN.findall(str(text))
+    if not parts:
+        return None
+    return stored(sum(float(value) * UNIT_SECONDS[unit[0].lower()] for value, unit in parts))
+
+
+# Parses the distance and duration strings of existing routes into the new columns.
+def fill_route_measures(apps, schema_editor):
+    Route = apps.get_model("api", "Route")
+    batch = []
+    for route in Route.objects.only("distance", "duration").iterator(chunk_size=1000):
+        route.distance_m = distance_meters(route.distance)
+        route.duration_s = duration_seconds(route.duration)
+        batch.append(route)
+        if len(batch) == 1000:
+            Route.objects.bulk_update(batch, ["distance_m", "duration_s"])
+            batch = []
+    Route.objects.bulk_update(batch, ["distance_m", "duration_s"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='distance_m',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='duration_s',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_route_measures, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['distance_m'], name='route_distance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(fields=['duration_s'], name='route_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['author', 'trip_date'], name='trip_author_date_idx'),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:48
+
+import django.db.models.deletion
+import json
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Word splitting and weighting from api/search.py at the time of this migration, kept here so
+# the index it builds does not follow later edits to that module.
+
+FIELD_WEIGHTS = {"title": 3, "start_location": 2, "destination": 2, "pitstops": 1}
+MAX_WORD_LENGTH = 50
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def words(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return [word[:MAX_WORD_LENGTH] for word in NON_WORD.sub(" ", text).split()]
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trip_terms(title, start_location, destination, pitstops):
+    if isinstance(pitstops, str):
+        try:
+            pitstops = json.loads(pitstops)
+        except ValueError:
+            pitstops = []
+    texts = {
+        "title": [title or ""],
+        "start_location": [start_location or ""],
+        "destination": [destination or ""],
+        "pitstops": [pitstop for pitstop in pitstops or [] if isinstance(pitstop, str)],
+    }
+    terms = {}
+    for field, values in texts.items():
+        for value in values:
+            for word in words(value):
+                terms[word] = max(terms.get(word, 0), FIELD_WEIGHTS[field])
+    return terms
+
+
+def add_words(new_words, word_model, trigram_model):
+    new_words = set(new_words) - set(word_model.objects.filter(word__in=new_words).values_list("word", flat=True))
+    if not new_words:
+        return
+    word_model.objects.bulk_create(
+        [word_model(word=word, trigram_count=len(trigrams(word))) for word in new_words],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    added = word_model.objects.filter(word__in=new_words).values_list("pk", "word")
+    trigram_model.objects.bulk_create(
+        [trigram_model(word_id=pk, trigram=gram) for pk, word in added for gram in trigrams(word)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+# Indexes the trips saved before search existed, for their authors and collaborators.
+def index_existing_trips(apps, schema_editor):
+    Trip = apps.get_model("api", "Trip")
+    TripCollaborator = apps.get_model("api", "TripCollaborator")
+    TripSearchTerm = apps.get_model("api", "TripSearchTerm")
+    SearchWord = apps.get_model("api", "SearchWord")
+    SearchWordTrigram = apps.get_model("api", "SearchWordTrigram")
+    members = {}
+    for trip_id, user_id in TripCollaborator.objects.values_list("trip_id", "roadtripuser_id").iterator(chunk_size=2000):
+        members.setdefault(trip_id, []).append(user_id)
+
+    trips = Trip.objects.values_list("pk", "author_id", "title", "start_location", "destination", "route__pitstops")
+    rows, vocabulary = [], set()
+    for trip_id, author_id, title, start_location, destination, pitstops in trips.iterator(chunk_size=500):
+        terms = trip_terms(title, start_location, destination, pitstops)
+        vocabulary.update(terms)
+        for user_id in [author_id, *members.get(trip_id, [])]:
+            rows.extend(TripSearchTerm(user_id=user_id, trip_id=trip_id, term=term, weight=weight) for term, weight in terms.items())
+        if len(rows) >= 5000:
+            TripSearchTerm.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    TripSearchTerm.objects.bulk_create(rows, batch_size=1000)
+    vocabulary = sorted(vocabulary)
+    for start in range(0, len(vocabulary), 500):
+        add_words(vocabulary[start:start + 500], SearchWord, SearchWordTrigram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_route_measures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=50, unique=True)),
+                ('trigram_count', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['word'], name='search_word_prefix_idx', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchWordTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='api.searchword')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'word'), name='unique_search_word_trigram')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TripSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.trip')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'term', 'trip'), name='unique_trip_search_term')],
+            },
+        ),
+        migrations.RunPython(index_existing_trips, migrations.RunPython.noop),
+    ]
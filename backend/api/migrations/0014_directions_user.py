@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Cached results so far were shared by everyone and may hold routes any user made up. They
+# have no owner to scope them to, so they are dropped and refetched.
+def drop_shared_results(apps, schema_editor):
+    apps.get_model("api", "DirectionsResult").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_trip_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_shared_results, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='directionsresult',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='directionsresult',
+            name='key',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='directionsresult',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_user_directions'),
+        ),
+    ]
@@ -1,43 +1,313 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.conf import settings
+from django.utils import timezone
+from .measures import distance_meters, duration_seconds
+from .polyline import pack_points, unpack_points, parse_route_path, format_route_path
 
 # Code inspired from 
 # Title: Django & React Web App Tutorial - Authentication, Databases, Deployments & More...
 # Author: Tech With Tim
 # Youtube link: https://www.youtube.com/watch?v=c-QsfbznSXI&t=7203s
 
+# Queryset helpers shared by the trip listing and detail views.
+class TripQuerySet(models.QuerySet):
+
+    # Trips the user owns or collaborates on, without a join that needs DISTINCT.
+    def visible_to(self, user):
+        collaborated = Trip.collaborators.through.objects.filter(roadtripuser=user).values("trip_id")
+        return self.filter(models.Q(author=user) | models.Q(id__in=collaborated))
+
+    # Trips matching the listing filters of TripFilterSerializer. Distance and duration filters
+    # use the route's numeric columns, so trips without a route never match them.
+    def matching(self, date_from=None, date_to=None, min_distance_m=None, max_distance_m=None, min_duration_s=None, max_duration_s=None):
+        lookups = {
+            "trip_date__gte": date_from,
+            "trip_date__lte": date_to,
+            "route__distance_m__gte": min_distance_m,
+            "route__distance_m__lte": max_distance_m,
+            "route__duration_s__gte": min_duration_s,
+            "route__duration_s__lte": max_duration_s,
+        }
+        return self.filter(**{lookup: value for lookup, value in lookups.items() if value is not None})
+
+    # Annotates route status and preloads the author and collaborators so serializing
+    # any number of trips costs a fixed number of queries.
+    def with_listing_data(self):
+        routes = Route.objects.filter(trip=models.OuterRef("pk"))
+        return self.select_related("author").prefetch_related("collaborators").annotate(
+            has_route=models.Exists(routes),
+            has_updated_route=models.Exists(routes.filter(updated_at__isnull=False)),
+        )
+
 class Trip(models.Model):
     title = models.CharField(max_length=100) 
     start_location = models.CharField(max_length=255)  
     destination = models.CharField(max_length=255)  
     trip_date = models.DateField()  
     created_at = models.DateTimeField(auto_now_add=True) 
+    updated_at = models.DateTimeField(auto_now=True)  # Also bumped when collaborators change, see api/signals.py
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="trips")
-    collaborators = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="collaborated_trips", blank=True)
+    collaborators = models.ManyToManyField(settings.AUTH_USER_MODEL, through="TripCollaborator", related_name="collaborated_trips", blank=True)
+
+    objects = TripQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="trip_created_keyset_idx"), # Keyset pagination order
+            models.Index(fields=["author", "updated_at"], name="trip_author_updated_idx"), # Changes since a sync cursor
+            models.Index(fields=["author", "trip_date"], name="trip_author_date_idx"), # Date range filters
+        ]
     
     def __str__(self):
         return self.title
     
+    # Single indexed lookup instead of loading every collaborator. Views should prefer
+    # api.permissions.has_trip_access, which also caches the answer for the request.
     def is_user_allowed(self, user):
-        return user == self.author or user in self.collaborators.all()
+        return user.pk == self.author_id or self.collaborators.filter(pk=user.pk).exists()
+
+# A user's membership of a trip they collaborate on. Uses the table and columns Django created
+# for the plain many-to-many field, with when the user was added, so a sync can send the routes
+# of trips someone joined since their last sync (see api/sync.py).
+class TripCollaborator(models.Model):
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE)
+    roadtripuser = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    added_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "api_trip_collaborators"
+        unique_together = [("trip", "roadtripuser")]
+        indexes = [
+            models.Index(fields=["roadtripuser", "added_at"], name="collaborator_added_idx"), # Joined since a sync cursor
+        ]
+
+# Left when a trip is deleted or a user is removed from it, so that user's next sync can drop it.
+# One row per user who lost the trip. Plain ids rather than foreign keys, as the trip is gone and
+# the user may be too; rows older than settings.SYNC_TOMBSTONE_DAYS are pruned.
+class TripTombstone(models.Model):
+    DELETED = "deleted"
+    REMOVED = "removed"
+    REASON_CHOICES = [(DELETED, "Deleted"), (REMOVED, "Removed")]
+
+    user_id = models.BigIntegerField()
+    trip_id = models.BigIntegerField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "deleted_at"], name="tombstone_user_idx"), # Removals since a sync cursor
+            models.Index(fields=["deleted_at"], name="tombstone_prune_idx"),
+        ]
     
+# A word of a trip's title, locations or pitstops, stored once for each member of the trip so
+# searches only read the searching user's rows, see api/search.py.
+class TripSearchTerm(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", db_index=False)  # Led by the unique index
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="+")
+    term = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField()  # Of the most important field the word is in
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "term", "trip"], name="unique_trip_search_term"), # Also serves searches
+        ]
+
+# The words indexed for search, with their trigrams in SearchWordTrigram, used to find the
+# indexed words a misspelt or partly typed query word stands for. Words no trip uses any more
+# are deleted by the prune_search_words command.
+class SearchWord(models.Model):
+    word = models.CharField(max_length=50, unique=True)
+    trigram_count = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%' in any locale.
+            models.Index(fields=["word"], name="search_word_prefix_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+class SearchWordTrigram(models.Model):
+    trigram = models.CharField(max_length=3)
+    word = models.ForeignKey(SearchWord, on_delete=models.CASCADE, related_name="trigrams")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["trigram", "word"], name="unique_search_word_trigram"), # Also serves lookups
+        ]
+
+# Stores each distinct route geometry once; routes and cached directions results point at it.
+class RouteGeometryManager(models.Manager):
+    # Returns the stored row for packed geometry, creating it if it is new, or None if empty.
+    def intern(self, packed):
+        if not packed:
+            return None
+        packed = bytes(packed)
+        geometry, _ = self.get_or_create(digest=hashlib.sha256(packed).hexdigest(), defaults={"geometry": packed})
+        return geometry
+
+    # intern() for many geometries in a few queries. Returns the rows in the same order.
+    def intern_many(self, packed_list):
+        packed_list = [bytes(packed or b"") for packed in packed_list]
+        digests = [hashlib.sha256(packed).hexdigest() if packed else None for packed in packed_list]
+        wanted = dict(zip(digests, packed_list))
+        wanted.pop(None, None)
+
+        rows = self.in_bulk(list(wanted), field_name="digest")
+        missing = [self.model(digest=digest, geometry=packed) for digest, packed in wanted.items() if digest not in rows]
+        if missing:
+            # Concurrent imports may store the same geometry first, so read the rows back.
+            self.bulk_create(missing, batch_size=500, ignore_conflicts=True)
+            rows.update(self.in_bulk([row.digest for row in missing], field_name="digest"))
+        return [rows[digest] if digest else None for digest in digests]
+
+    # Rows no longer used by any route or cached directions result.
+    def unused(self):
+        return self.filter(routes__isnull=True, directions__isnull=True)
+
+# Content-addressed route geometry, keyed by the SHA-256 of its packed bytes.
+class RouteGeometry(models.Model):
+    digest = models.CharField(max_length=64, unique=True)
+    geometry = models.BinaryField()  # Delta-encoded int32 lat/lng pairs, see api/polyline.py
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = RouteGeometryManager()
+
 class Route(models.Model):
     trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name="route")  # Same ID as trip if overwritten
     start_location = models.CharField(max_length=255)  
     destination = models.CharField(max_length=255)  
     distance = models.CharField(max_length=50)  
     duration = models.CharField(max_length=50)  
-    route_path = models.JSONField(default=list)  # better as a JSONField for waypoints allows for better performance
+    distance_m = models.PositiveIntegerField(null=True, blank=True)  # distance in meters, set on save (see api/measures.py)
+    duration_s = models.PositiveIntegerField(null=True, blank=True)  # duration in seconds, set on save
+    geometry = models.ForeignKey(RouteGeometry, on_delete=models.PROTECT, null=True, blank=True, related_name="routes")  # Shared with identical routes
     pitstops = models.JSONField(default=list)
+    pitstops_version = models.PositiveIntegerField(default=0)  # Bumped on every pitstop change, used to detect conflicting edits
     petrol_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     passenger_shares = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)  
     updated_at = models.DateTimeField(auto_now=True)  
 
+    # Large JSON columns left out of summary listings.
+    SUMMARY_DEFERRED_FIELDS = ("pitstops", "passenger_shares")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "trip"], name="route_created_keyset_idx"), # Keyset pagination order
+            models.Index(fields=["updated_at", "trip"], name="route_updated_idx"), # Changes since a sync cursor
+            models.Index(fields=["distance_m"], name="route_distance_idx"), # Trip filters and ordering
+            models.Index(fields=["duration_s"], name="route_duration_idx"),
+        ]
+
     def __str__(self):
         return f"Route for {self.trip.title} - {self.distance}, {self.duration}"
 
+    # Packed route geometry. Assigned geometry is held on the instance and only
+    # looked up or stored as a shared RouteGeometry row when the route is saved.
+    @property
+    def packed_geometry(self):
+        if hasattr(self, "_pending_geometry"):
+            return self._pending_geometry
+        return bytes(self.geometry.geometry) if self.geometry_id else b""
+
+    @packed_geometry.setter
+    def packed_geometry(self, packed):
+        self._pending_geometry = bytes(packed or b"")
+
+    # Decoded route geometry as integer (lat, lng) points in 1e-5 degrees.
+    @property
+    def path_points(self):
+        return unpack_points(self.packed_geometry)
+
+    @path_points.setter
+    def path_points(self, points):
+        self.packed_geometry = pack_points(points)
+
+    # The route geometry in the format clients send and expect, a JSON-stringified polyline.
+    @property
+    def route_path(self):
+        return format_route_path(self.packed_geometry)
+
+    @route_path.setter
+    def route_path(self, value):
+        self.path_points = parse_route_path(value)
+
+    # Parses distance and duration into distance_m and duration_s. save() calls this; code
+    # writing routes with bulk_create() has to call it itself.
+    def update_measures(self):
+        self.distance_m = distance_meters(self.distance)
+        self.duration_s = duration_seconds(self.duration)
+
+    def save(self, *args, **kwargs):
+        if hasattr(self, "_pending_geometry"):
+            self.geometry = RouteGeometry.objects.intern(self._pending_geometry)
+            del self._pending_geometry
+        self.update_measures()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            measures = {"distance": "distance_m", "duration": "duration_s"}
+            kwargs["update_fields"] = [*update_fields, *(measures[name] for name in update_fields if name in measures)]
+        super().save(*args, **kwargs)
+
+# Grid cells a route's path passes through, see api/spatial.py.
+# Lets "trips passing near a point" be answered with an indexed lookup instead of decoding every route.
+class RouteCell(models.Model):
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="cells")
+    cell = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cell", "route"], name="unique_route_cell"), # Also serves cell lookups
+        ]
+
+# Places that can be suggested as pitstops, loaded in bulk with the load_places command.
+# Each place stores the same grid cell as RouteCell so corridor searches along a route
+# only read the places in cells near its path.
+class Place(models.Model):
+    name = models.CharField(max_length=200)
+    category = models.CharField(max_length=50)  # Uses the pitstop filter names, e.g. gas_station, restaurant
+    address = models.CharField(max_length=255, blank=True)
+    lat = models.FloatField()
+    lng = models.FloatField()
+    cell = models.PositiveIntegerField()
+    source_id = models.CharField(max_length=100, blank=True)  # Identifier in the source dataset, if any
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cell", "category"], name="place_cell_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.category})"
+
+# Cached directions results, keyed by a hash of the normalised origin, destination and ordered
+# waypoints (see api/directions.py), so clients can reuse a route before calling a directions service.
+# Entries expire a fixed time after they were fetched and the least recently used are pruned first.
+class DirectionsResult(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", db_index=False)  # Who fetched it, led by the unique index
+    key = models.CharField(max_length=64)
+    origin = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+    waypoints = models.JSONField(default=list, blank=True)
+    geometry = models.ForeignKey(RouteGeometry, on_delete=models.CASCADE, related_name="directions")
+    distance = models.CharField(max_length=50)
+    duration = models.CharField(max_length=50)
+    hits = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fetched_at"], name="directions_fetched_idx"), # Expiry
+            models.Index(fields=["last_used_at"], name="directions_lru_idx"), # Least recently used first
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_user_directions"), # Also serves lookups
+        ]
+
 # Code adopted from 
 # Title: YT-Django-Theory-Create-Custom-User-Models-Admin-Testing
 # Author: veryacademy
@@ -72,4 +342,61 @@ class RoadtripUser(AbstractBaseUser):
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name} ({self.email})"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name} ({self.email})"
+
+# Transactional email waiting to be delivered by the send_outbox worker.
+# Rows are written in the same transaction as the change that triggers the email.
+class OutboxEmail(models.Model):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, null=True)  # None uses DEFAULT_FROM_EMAIL
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"), # Worker polling order
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+# Deduplicated fuel economy figures per manufacturer, model and fuel type.
+# Loaded in bulk from api/data/fuelData.json by the load_vehicles command.
+class Vehicle(models.Model):
+    manufacturer = models.CharField(max_length=100)
+    model = models.CharField(max_length=150)
+    fuel_type = models.CharField(max_length=50)  # Normalised: Petrol, Diesel, Hybrid, Electric, ...
+    # Lower-cased copies used for case-insensitive prefix search.
+    manufacturer_key = models.CharField(max_length=100)
+    model_key = models.CharField(max_length=150)
+    mpg = models.DecimalField(max_digits=5, decimal_places=1)  # Average WLTP imperial combined mpg across variants
+    min_mpg = models.DecimalField(max_digits=5, decimal_places=1)
+    max_mpg = models.DecimalField(max_digits=5, decimal_places=1)
+    variants = models.PositiveIntegerField(default=1)  # Number of source rows merged into this one
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["manufacturer", "model", "fuel_type"], name="unique_vehicle"),
+        ]
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%' in any locale.
+            models.Index(
+                fields=["manufacturer_key", "model_key", "fuel_type"],
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops", "varchar_pattern_ops"],
+                name="vehicle_prefix_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.manufacturer} {self.model} ({self.fuel_type}) - {self.mpg} mpg"
@@ -0,0 +1,96 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Queues an email for the send_outbox worker instead of sending it during the request.
+# Call inside the transaction that makes the change, so the email only exists if the change commits.
+def queue_email(subject, message, recipient_list, from_email=None):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        recipients=list(recipient_list),
+        from_email=from_email,
+    )
+
+# The unsaved email telling a user they were added to a trip as a collaborator. Save it, or
+# bulk create several, in the transaction that adds them.
+def collaborator_invite(trip, collaborator):
+    return OutboxEmail(
+        subject="You've been added to a trip on Roadtrip Mate!",
+        body=(
+            f"Hi {collaborator.first_name},\n\n"
+            f"You’ve been added as a collaborator to the trip \"{trip.title}\" "
+            f"by {trip.author.first_name} {trip.author.last_name}.\n\n"
+            "Log in to view and help plan the route:\n"
+            "Happy travels! 🚗💨"
+        ),
+        recipients=[collaborator.email],
+    )
+
+# Exponential backoff between attempts, capped at an hour.
+def retry_delay(attempts, base_seconds=30, max_seconds=3600):
+    return timedelta(seconds=min(base_seconds * 2 ** (attempts - 1), max_seconds))
+
+# Sends one batch of due emails over a single SMTP connection.
+# Rows are locked with SKIP LOCKED so several workers can drain the outbox side by side.
+# Returns the number of emails sent and the number that failed.
+def deliver_pending(batch_size=50, max_attempts=5, connection=None):
+    sent = failed = 0
+    now = timezone.now()
+
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not batch:
+            return sent, failed
+
+        connection = connection or get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for email in batch:
+                try:
+                    EmailMessage(
+                        subject=email.subject,
+                        body=email.body,
+                        from_email=email.from_email,
+                        to=email.recipients,
+                        connection=connection,
+                    ).send()
+                except Exception as e:
+                    logger.warning("Outbox email %s failed: %s", email.pk, e)
+                    email.attempts += 1
+                    email.last_error = str(e)
+                    if email.attempts >= max_attempts:
+                        email.status = OutboxEmail.FAILED
+                    else:
+                        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+                    failed += 1
+                    # The SMTP session may be unusable after an error, so start a fresh one.
+                    # If the server is gone, leave the rest of the batch for the next run.
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception as e:
+                        logger.warning("Outbox could not reconnect: %s", e)
+                        break
+                else:
+                    email.attempts += 1
+                    email.status = OutboxEmail.SENT
+                    email.sent_at = timezone.now()
+                    email.save(update_fields=["attempts", "status", "sent_at"])
+                    sent += 1
+        finally:
+            connection.close()
+
+    return sent, failed
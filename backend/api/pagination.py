@@ -0,0 +1,160 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.functions import Coalesce
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset pagination, ordered by (created_at, pk) unless a subclass sets another ordering.
+# Each page filters past the last row of the previous page instead of using OFFSET,
+# so fetching page 500 costs the same index range scan as fetching page 1.
+# The ordering must end with a unique field so every row has a distinct position.
+# Fields starting with "-" sort descending.
+class KeysetPagination(BasePagination):
+    ordering = ("created_at", "pk")
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request)])
+
+    # The rows of the requested page, plus one extra row to find out whether there is a next page.
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        queryset = self.order_queryset(queryset)
+
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def order_queryset(self, queryset):
+        return queryset.order_by(*self.ordering)
+
+    # The ordering's field names, without the "-" of descending ones.
+    def ordering_names(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    # Rows that sort after the given position: (a > x) OR (a = x AND b > y) OR ...
+    # with < instead of > for descending fields.
+    def after(self, position):
+        condition = models.Q()
+        names = self.ordering_names()
+        for index, field in enumerate(self.ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {name: position[name] for name in names[:index]}
+            condition |= models.Q(**equal, **{f"{names[index]}__{lookup}": position[names[index]]})
+        return condition
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def encode_cursor(self, obj):
+        position = {}
+        for field in self.ordering_names():
+            value = getattr(obj, field)
+            position[field] = value.isoformat() if hasattr(value, "isoformat") else value
+        raw = json.dumps(position, separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(raw.encode()).decode("ascii")
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position = {
+                field: self.model_field(queryset, field).to_python(position[field])
+                for field in self.ordering_names()
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position.values():
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    # The field a cursor value is parsed with: a model field or an annotation's output field.
+    def model_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        meta = queryset.model._meta
+        return meta.pk if name == "pk" else meta.get_field(name)
+
+# Vehicles page in alphabetical order, matching the unique (manufacturer, model, fuel_type) index.
+class VehiclePagination(KeysetPagination):
+    ordering = ("manufacturer", "model", "fuel_type")
+    page_size = 100
+
+# Trips page by creation date, or by ?ordering= trip_date, distance or duration, with "-" for
+# descending (e.g. ?ordering=-distance for the longest first). Distance and duration are the
+# route's numeric columns, 0 for trips without a route.
+class TripPagination(KeysetPagination):
+    ordering_query_param = "ordering"
+    orderings = {
+        "created_at": ("created_at", "pk"),
+        "trip_date": ("trip_date", "pk"),
+        "-trip_date": ("-trip_date", "-pk"),
+        "distance": ("route_distance_m", "pk"),
+        "-distance": ("-route_distance_m", "-pk"),
+        "duration": ("route_duration_s", "pk"),
+        "-duration": ("-route_duration_s", "-pk"),
+    }
+    annotations = {
+        "route_distance_m": Coalesce("route__distance_m", 0, output_field=models.PositiveIntegerField()),
+        "route_duration_s": Coalesce("route__duration_s", 0, output_field=models.PositiveIntegerField()),
+    }
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.ordering_query_param, "created_at")
+        if name not in self.orderings:
+            raise exceptions.ValidationError({self.ordering_query_param: [f"Must be one of: {', '.join(self.orderings)}."]})
+        return self.orderings[name]
+
+    def order_queryset(self, queryset):
+        names = self.ordering_names()
+        queryset = queryset.annotate(**{name: value for name, value in self.annotations.items() if name in names})
+        return super().order_queryset(queryset)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import msgpack, orjson
+
+# Request parsers, set in REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"], pairing the renderers
+# in api/renderers.py.
+
+# JSON decoded with orjson, which like DRF's strict mode rejects NaN and Infinity. Bodies in
+# another charset than UTF-8, and everything when orjson is not installed, are left to DRF.
+class JSONParser(parsers.JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+# MessagePack request bodies, for clients that also accept MessagePack responses.
+class MessagePackParser(parsers.BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
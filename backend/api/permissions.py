@@ -0,0 +1,41 @@
+from rest_framework.permissions import BasePermission
+from .models import Trip, Route
+
+# Checks whether the request's user owns or collaborates on a trip.
+# Author checks need no query, collaborator checks are a single indexed EXISTS,
+# and the answer is remembered on the request so repeated checks are free.
+def has_trip_access(request, trip_id, author_id=None):
+    user = request.user
+    if not user or not user.is_authenticated:
+        return False
+    if not hasattr(request, "_trip_access"):
+        request._trip_access = {}
+    if author_id is not None and author_id == user.pk:
+        return True
+    if trip_id not in request._trip_access:
+        request._trip_access[trip_id] = Trip.objects.filter(pk=trip_id).visible_to(user).exists()
+    return request._trip_access[trip_id]
+
+# Async version of has_trip_access for the async views, sharing the per-request cache.
+async def ahas_trip_access(request, trip_id, author_id=None):
+    user = request.user
+    if not user or not user.is_authenticated:
+        return False
+    if not hasattr(request, "_trip_access"):
+        request._trip_access = {}
+    if author_id is not None and author_id == user.pk:
+        return True
+    if trip_id not in request._trip_access:
+        request._trip_access[trip_id] = await Trip.objects.filter(pk=trip_id).visible_to(user).aexists()
+    return request._trip_access[trip_id]
+
+# Object permission for trip and route endpoints: only the trip author and collaborators may access.
+class IsTripMember(BasePermission):
+    message = "Not authorized"
+
+    def has_object_permission(self, request, view, obj):
+        if isinstance(obj, Trip):
+            return has_trip_access(request, obj.pk, obj.author_id)
+        if isinstance(obj, Route):
+            return has_trip_access(request, obj.trip_id)
+        return False
@@ -0,0 +1,73 @@
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+# Petrol cost estimation shared by the batch estimate endpoint.
+# Uses the same equation as the petrol calculator page: gallons = miles / mpg,
+# litres = gallons * 4.54609, cost = litres * price per litre.
+# The cost grid is computed with numpy floats; amounts become exact whole pence with Decimal
+# rounding, and everything after that (splitting, formatting) is integer arithmetic.
+
+LITRES_PER_GALLON = 4.54609
+MILES_PER_KM = 0.621371
+PENNY = Decimal("0.01")
+
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)"  # Thousands separators allowed, but a number starts with a digit
+_DISTANCE_PATTERN = re.compile(_NUMBER + r"\s*(mi|miles?|km|kilometers?|kilometres?|m)\b", re.IGNORECASE)
+_BARE_NUMBER = re.compile(r"\s*" + _NUMBER + r"\s*")
+
+# Parses the display strings stored in Route.distance, e.g. "212 mi" or "1,204 km", into miles.
+# The number needs a distance unit after it, so "5 min" is not a distance; only a string that is
+# nothing but a number, e.g. "212", is read as miles. Anything else gives None.
+def parse_distance_miles(text):
+    if text is None:
+        return None
+    text = str(text)
+    match = _DISTANCE_PATTERN.search(text) or _BARE_NUMBER.fullmatch(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) if match.re is _DISTANCE_PATTERN else "mi").lower()
+    if unit.startswith("k"):
+        return value * MILES_PER_KM
+    if unit == "m":
+        return value / 1000 * MILES_PER_KM
+    return value
+
+# Litres and cost for every (trip, vehicle) pair in one vectorised pass.
+# Returns two arrays of shape (len(distances), len(mpgs)).
+def compute_costs(distances_miles, mpgs, fuel_price):
+    distances = np.asarray(distances_miles, dtype=np.float64)
+    mpg = np.asarray(mpgs, dtype=np.float64)
+    litres = np.outer(distances, LITRES_PER_GALLON / mpg)
+    return litres, litres * float(fuel_price)
+
+# Rounds amounts in pounds to whole pence, half up, keeping the array's shape. Each float is
+# read as the shortest decimal that round-trips, so 2.675 is Decimal("2.675") and becomes 268
+# pence, not the 267 its binary value would round to.
+def to_pence(amounts):
+    amounts = np.asarray(amounts, dtype=np.float64)
+    pence = [int(Decimal(str(amount)).quantize(PENNY, ROUND_HALF_UP).scaleb(2)) for amount in amounts.ravel().tolist()]
+    return np.array(pence, dtype=np.int64).reshape(amounts.shape)
+
+# Splits totals in pence between payers so the shares add up to each total exactly.
+# Returns the base share and how many payers pay one extra penny.
+def split_pence(pence, payers):
+    payers = np.maximum(np.asarray(payers, dtype=np.int64), 1)
+    return np.divmod(pence, payers)
+
+# Formats whole pence as an exact pounds string, e.g. 1234 -> "12.34".
+def format_pence(pence):
+    pence = int(pence)
+    sign = "-" if pence < 0 else ""
+    pounds, pence = divmod(abs(pence), 100)
+    return f"{sign}{pounds}.{pence:02d}"
+
+# Per-passenger shares of a total as strings. Leftover pence go to the first payers,
+# and the driver comes first and pays nothing if excluded.
+def format_shares(base, extra, passengers, exclude_driver=False):
+    exclude_driver = exclude_driver and passengers > 1  # A driver travelling alone pays it all
+    payers = passengers - 1 if exclude_driver else passengers
+    shares = [format_pence(base + 1)] * int(extra) + [format_pence(base)] * (payers - int(extra))
+    return ["0.00"] + shares if exclude_driver else shares
@@ -0,0 +1,107 @@
+import json
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .events import publish_trip_event
+from .models import Route
+from .search import index_trips
+
+# Raised when an operation no longer matches the stored pitstops, e.g. another
+# collaborator removed or moved the same pitstop first, or the client's version is stale.
+class PitstopConflict(Exception):
+    def __init__(self, message, pitstops, version):
+        super().__init__(message)
+        self.pitstops = pitstops
+        self.version = version
+
+# Older rows may hold pitstops as a JSON string rather than a list.
+def normalize_pitstops(pitstops):
+    if isinstance(pitstops, list):
+        return pitstops
+    try:
+        pitstops = json.loads(pitstops) if pitstops else []
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return pitstops if isinstance(pitstops, list) else []
+
+def _index(value, size, name):
+    if value is None:
+        return size
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"'{name}' must be an integer")
+    return max(0, min(value, size))
+
+# Applies a batch of operations to a list of pitstops and returns the new list.
+#   {"op": "add", "pitstop": ..., "index": optional position}  - ignored if already present
+#   {"op": "remove", "pitstop": ...}
+#   {"op": "move", "pitstop": ..., "index": new position}
+# Pitstops are addressed by value rather than position so edits from other collaborators
+# that shift positions do not make an operation hit the wrong pitstop.
+# Raises ValueError for malformed operations and LookupError if a pitstop is missing.
+def apply_pitstop_operations(pitstops, operations):
+    pitstops = list(pitstops)
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("'operations' must be a non-empty list")
+
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError("Each operation must be an object")
+        op = operation.get("op")
+        pitstop = operation.get("pitstop")
+        if not pitstop:
+            raise ValueError("Each operation needs a 'pitstop'")
+
+        if op == "add":
+            if pitstop not in pitstops:
+                pitstops.insert(_index(operation.get("index"), len(pitstops), "index"), pitstop)
+        elif op == "remove":
+            if pitstop not in pitstops:
+                raise LookupError(f"Pitstop '{pitstop}' is no longer on this route")
+            pitstops.remove(pitstop)
+        elif op == "move":
+            if pitstop not in pitstops:
+                raise LookupError(f"Pitstop '{pitstop}' is no longer on this route")
+            if operation.get("index") is None:
+                raise ValueError("'move' needs an 'index'")
+            pitstops.remove(pitstop)
+            pitstops.insert(_index(operation["index"], len(pitstops), "index"), pitstop)
+        else:
+            raise ValueError(f"Unknown operation '{op}'")
+
+    return pitstops
+
+# Applies operations to a route's pitstops under a row lock and writes back only the
+# pitstops column, its version counter and updated_at, leaving the geometry untouched.
+# If expected_version is given and the stored version differs, nothing is written.
+# Changes are published to the trip's event subscribers (see api/events.py) and searchable.
+# Returns the new (pitstops, version); raises Route.DoesNotExist, ValueError or PitstopConflict.
+def update_pitstops(trip_id, operations, expected_version=None):
+    with transaction.atomic():
+        current = (
+            Route.objects.select_for_update()
+            .filter(pk=trip_id)
+            .values("pitstops", "pitstops_version")
+            .get()
+        )
+        pitstops = normalize_pitstops(current["pitstops"])
+        version = current["pitstops_version"]
+
+        if expected_version is not None and expected_version != version:
+            raise PitstopConflict("The pitstops were changed by someone else", pitstops, version)
+        try:
+            updated = apply_pitstop_operations(pitstops, operations)
+        except LookupError as e:
+            raise PitstopConflict(str(e), pitstops, version)
+
+        if updated != pitstops:
+            Route.objects.filter(pk=trip_id).update(
+                pitstops=updated,
+                pitstops_version=F("pitstops_version") + 1,
+                updated_at=timezone.now(),
+            )
+            version += 1
+            publish_trip_event(trip_id, "pitstops", {"pitstops": updated, "version": version})
+            index_trips([trip_id])
+        return updated, version
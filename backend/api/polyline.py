@@ -0,0 +1,137 @@
+import json
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+# Helpers for route geometry.
+# Points are (lat, lng) pairs of integers in units of 1e-5 degrees, the precision Google's
+# encoded polyline format uses, so converting between the formats is lossless.
+# Reference Doc: https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+
+PRECISION = 100000
+
+# Decodes a Google encoded polyline string into a list of integer (lat, lng) points.
+def decode_polyline(encoded):
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat, lng))
+    return points
+
+def _encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    out = []
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+    return "".join(out)
+
+# Memoises the polyline characters for each delta. Consecutive points on a road are close
+# together, so most deltas repeat and encoding becomes a dictionary lookup per value.
+class _EncodedDeltas(dict):
+    max_size = 1 << 16
+
+    def __missing__(self, value):
+        encoded = _encode_value(value)
+        if len(self) < self.max_size:
+            self[value] = encoded
+        return encoded
+
+_encoded_deltas = _EncodedDeltas()
+
+def _deltas(points):
+    values = array("i")
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        values.append(lat - prev_lat)
+        values.append(lng - prev_lng)
+        prev_lat, prev_lng = lat, lng
+    return values
+
+def _encode_deltas(values):
+    return "".join(map(_encoded_deltas.__getitem__, values))
+
+# Encodes integer (lat, lng) points as a Google encoded polyline string.
+def encode_polyline(points):
+    return _encode_deltas(_deltas(points))
+
+# Packs points as deflate-compressed little-endian int32 values: the first point absolute,
+# then lat/lng deltas. Deltas between nearby points are small, so they compress well.
+def pack_points(points):
+    if not points:
+        return b""
+    values = _deltas(points)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return zlib.compress(values.tobytes())
+
+def _unpack_deltas(data):
+    values = array("i")
+    if data:
+        values.frombytes(zlib.decompress(bytes(data)))
+        if sys.byteorder == "big":
+            values.byteswap()
+    return values
+
+# Unpacks bytes written by pack_points back into a list of points.
+def unpack_points(data):
+    values = _unpack_deltas(data)
+    return list(zip(accumulate(values[0::2]), accumulate(values[1::2])))
+
+# Encodes packed geometry straight to a polyline, since both formats store deltas.
+def packed_to_polyline(data):
+    return _encode_deltas(_unpack_deltas(data))
+
+def _point_from_coordinate(coordinate):
+    if isinstance(coordinate, dict):
+        lat, lng = coordinate["lat"], coordinate["lng"]
+    else:
+        lat, lng = coordinate
+    return round(float(lat) * PRECISION), round(float(lng) * PRECISION)
+
+# Accepts the route_path formats clients send and returns integer points.
+# Handles the JSON-stringified polyline the frontend stores, a bare polyline,
+# and lists of [lat, lng] pairs or {"lat": .., "lng": ..} objects.
+def parse_route_path(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return decode_polyline(value)
+        if isinstance(value, dict):
+            value = value.get("points", "")
+        if isinstance(value, str):
+            return decode_polyline(value)
+    if isinstance(value, list):
+        return [_point_from_coordinate(coordinate) for coordinate in value]
+    raise ValueError("Unsupported route_path format")
+
+# Formats packed geometry the way clients expect route_path: a JSON-stringified polyline.
+def format_route_path(data):
+    if not data:
+        return ""
+    return json.dumps(packed_to_polyline(data))
+
+# Converts integer points to (lat, lng) degrees.
+def to_degrees(points):
+    return [(lat / PRECISION, lng / PRECISION) for lat, lng in points]
@@ -0,0 +1,105 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Read replica routing. Views using ReplicaReadMixin send the queries of safe (GET/HEAD/OPTIONS)
+# requests to a randomly chosen replica; everything else uses the primary ("default").
+# Once a request writes, its later reads use the primary, and the user stays on the primary for
+# PIN_SECONDS so reads straight after a write are not served stale by a lagging replica.
+# Replicas are the DATABASES aliases starting with "replica", see backend/settings.py.
+
+PIN_SECONDS = 10
+
+REPLICAS = [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+_read_alias = ContextVar("read_alias", default=None)
+_wrote = ContextVar("wrote", default=False)
+
+def _pin_key(user_id):
+    return f"api:db-pinned:{user_id}"
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _wrote.get():
+            return "default"  # Read your own writes
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return "default"
+
+    # Replicas hold the same data as the primary.
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    # Replicas get their schema through replication, not migrations.
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in REPLICAS
+
+# Sends the rest of a safe request's reads to a replica, unless it already wrote or its user
+# is pinned to the primary. Call once the request's user is known.
+def use_replica(request):
+    if REPLICAS and request.method in SAFE_METHODS and not _wrote.get() and not is_pinned(request.user):
+        _read_alias.set(random.choice(REPLICAS))
+
+async def ause_replica(request):
+    if REPLICAS and request.method in SAFE_METHODS and not _wrote.get():
+        user = request.user
+        if not (user and user.is_authenticated and await cache.aget(_pin_key(user.pk))):
+            _read_alias.set(random.choice(REPLICAS))
+
+# Scopes the routing state to one request and pins users that wrote to the primary.
+# Works under both WSGI and ASGI.
+class PrimaryStickinessMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        read_token = _read_alias.set(None)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            self.pin_after_write(request)
+            return response
+        finally:
+            _read_alias.reset(read_token)
+            _wrote.reset(wrote_token)
+
+    async def __acall__(self, request):
+        read_token = _read_alias.set(None)
+        wrote_token = _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            if REPLICAS and _wrote.get():
+                await sync_to_async(self.pin_after_write)(request)
+            return response
+        finally:
+            _read_alias.reset(read_token)
+            _wrote.reset(wrote_token)
+
+    def pin_after_write(self, request):
+        # DRF stores the token-authenticated user on the Django request too.
+        user = getattr(request, "user", None)
+        if REPLICAS and _wrote.get() and user is not None and user.is_authenticated:
+            cache.set(_pin_key(user.pk), True, PIN_SECONDS)
+
+# Lets a DRF view's safe requests read from a replica. Applied after authentication, so the
+# user lookup and a user's pin to the primary are already known.
+class ReplicaReadMixin:
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        use_replica(request)
@@ -0,0 +1,166 @@
+import json
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, ExpressionWrapper, F, FloatField, IntegerField, Max, OuterRef, Sum, Value, When
+
+from .models import SearchWord, SearchWordTrigram, Trip, TripSearchTerm
+
+# Search over trip titles, start locations, destinations and route pitstop names.
+# TripSearchTerm holds every word of a trip once per member (author and collaborators), so a
+# search only reads the user's own rows through the (user, term, trip) index, however many
+# trips everyone else has. Each query word first stands for the user's indexed words it prefixes
+# or closely resembles, found through the trigrams of the SearchWord vocabulary as PostgreSQL's
+# pg_trgm would ("york" gives "  y", " yo", "yor", "ork", "rk "), so partial words and small
+# typos still match. Trips must match every query word. Works the same on PostgreSQL and
+# SQLite, no extensions needed. Trips are reindexed when they, their route's pitstops or their
+# collaborators change.
+# Matching whole words rather than trigrams reads about a tenth of the rows for a query, which
+# is what keeps common words like "services" fast on large accounts.
+
+# A word found in the title counts for more than one found only in a pitstop name.
+FIELD_WEIGHTS = {"title": 3, "start_location": 2, "destination": 2, "pitstops": 1}
+MAX_WEIGHT = max(FIELD_WEIGHTS.values())
+EXACT_BONUS = 2  # Exact words rank above the words they were mistaken for
+MIN_SIMILARITY = 0.5  # Dice coefficient of trigrams a word needs to stand for a query word
+MAX_EXPANSIONS = 20  # Indexed words one query word may stand for
+MAX_QUERY_WORDS = 8
+MAX_WORD_LENGTH = 50  # Longer words are cut, see TripSearchTerm.term
+MAX_RESULTS = 50
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Lower case words without accents, so "Cote d'Azur" finds "Côte d'Azur".
+def words(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return [word[:MAX_WORD_LENGTH] for word in _NON_WORD.sub(" ", text).split()]
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# The words of one trip with the weight of the most important field each appears in.
+# Pitstops may be a list or, in older rows, a JSON string.
+def trip_terms(title, start_location, destination, pitstops):
+    if isinstance(pitstops, str):
+        try:
+            pitstops = json.loads(pitstops)
+        except ValueError:
+            pitstops = []
+    texts = {
+        "title": [title or ""],
+        "start_location": [start_location or ""],
+        "destination": [destination or ""],
+        "pitstops": [pitstop for pitstop in pitstops or [] if isinstance(pitstop, str)],
+    }
+    terms = {}
+    for field, values in texts.items():
+        for value in values:
+            for word in words(value):
+                terms[word] = max(terms.get(word, 0), FIELD_WEIGHTS[field])
+    return terms
+
+# Adds words not yet in the vocabulary, with their trigrams.
+def add_words(new_words):
+    new_words = set(new_words) - set(SearchWord.objects.filter(word__in=new_words).values_list("word", flat=True))
+    if not new_words:
+        return
+    SearchWord.objects.bulk_create(
+        [SearchWord(word=word, trigram_count=len(trigrams(word))) for word in new_words],
+        batch_size=1000,
+        ignore_conflicts=True,  # Added by a concurrent save
+    )
+    added = SearchWord.objects.filter(word__in=new_words).values_list("pk", "word")
+    SearchWordTrigram.objects.bulk_create(
+        [SearchWordTrigram(word_id=pk, trigram=gram) for pk, word in added for gram in trigrams(word)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+# Rebuilds the search rows of the given trips for all their members.
+def index_trips(trip_ids):
+    trip_ids = list(trip_ids)
+    if not trip_ids:
+        return
+    trips = Trip.objects.filter(pk__in=trip_ids).values_list("pk", "author_id", "title", "start_location", "destination", "route__pitstops")
+    members = {}
+    for trip_id, user_id in Trip.collaborators.through.objects.filter(trip_id__in=trip_ids).values_list("trip_id", "roadtripuser_id"):
+        members.setdefault(trip_id, []).append(user_id)
+
+    rows = []
+    vocabulary = set()
+    for trip_id, author_id, title, start_location, destination, pitstops in trips:
+        terms = trip_terms(title, start_location, destination, pitstops)
+        vocabulary.update(terms)
+        for user_id in [author_id, *members.get(trip_id, [])]:
+            rows.extend(TripSearchTerm(user_id=user_id, trip_id=trip_id, term=term, weight=weight) for term, weight in terms.items())
+    with transaction.atomic():
+        add_words(vocabulary)
+        TripSearchTerm.objects.filter(trip_id__in=trip_ids).delete()
+        TripSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+# The words of the user's trips a query word may stand for: those it is the start of, and those
+# sharing enough of its trigrams. The word itself comes first when it is indexed. Only the
+# user's own words are considered, before the cut to MAX_EXPANSIONS, so other users' words
+# never crowd out theirs.
+def expand(user, word):
+    prefixed = SearchWord.objects.filter(
+        Exists(TripSearchTerm.objects.filter(user=user, term=OuterRef("word"))),  # Probes the (user, term) index
+        word__startswith=word,
+    ).order_by("word")
+    expansions = list(prefixed.values_list("word", flat=True)[:MAX_EXPANSIONS])
+
+    wanted = trigrams(word)
+    # Dice coefficient 2 * shared / (len(wanted) + trigram_count) of at least MIN_SIMILARITY
+    similar = (
+        SearchWordTrigram.objects.filter(
+            Exists(TripSearchTerm.objects.filter(user=user, term=OuterRef("word__word"))),
+            trigram__in=wanted,
+        )
+        .values("word__word")
+        .annotate(shared=Count("pk"))
+        .filter(shared__gte=ExpressionWrapper((len(wanted) + F("word__trigram_count")) * (MIN_SIMILARITY / 2), output_field=FloatField()))
+        .order_by("-shared", "word__word")
+    )
+    for row in similar[:MAX_EXPANSIONS]:
+        if row["word__word"] not in expansions:
+            expansions.append(row["word__word"])
+    return expansions
+
+# Deletes the vocabulary words no trip uses any more, with their trigrams. Returns how many.
+def prune_search_words():
+    _, deleted = SearchWord.objects.exclude(word__in=TripSearchTerm.objects.values("term")).delete()
+    return deleted.get(SearchWord._meta.label, 0)
+
+# The user's trips best matching the query as (trip id, score) pairs, best first. The score
+# is the weighted share of the query's words found, from 0 to 1.
+def search_trips(user, query, limit=20):
+    wanted = list(dict.fromkeys(words(query)))[:MAX_QUERY_WORDS]
+    if not wanted:
+        return []
+    expansions = []
+    for word in wanted:
+        expanded = expand(user, word)
+        if not expanded:
+            return []  # No trip can match every word
+        expansions.append(expanded)
+
+    # Each query word is a column that is 1 when any of the words it stands for is in the trip.
+    has_words = {
+        f"has_{i}": Max(Case(When(term__in=expanded, then=Value(1)), default=Value(0)))
+        for i, expanded in enumerate(expansions)
+    }
+    matches = (
+        TripSearchTerm.objects.filter(user=user, term__in={term for expanded in expansions for term in expanded})
+        .values("trip_id")
+        .annotate(
+            score=Sum(Case(When(term__in=wanted, then=F("weight") * EXACT_BONUS), default=F("weight"), output_field=IntegerField())),
+            **has_words,
+        )
+        .filter(**{name: 1 for name in has_words})
+        .order_by("-score", "-trip_id")[:limit]
+    )
+    best = MAX_WEIGHT * EXACT_BONUS * len(wanted)
+    return [(row["trip_id"], min(round(row["score"] / best, 3), 1.0)) for row in matches]
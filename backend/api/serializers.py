@@ -1,8 +1,14 @@
+import time
+
 from rest_framework import serializers
-from .models import Trip, Route, RoadtripUser
+from .metrics import record_serialize
+from .models import Trip, Route, RoadtripUser, Vehicle, Place, DirectionsResult
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
+from .polyline import pack_points, parse_route_path, format_route_path
 
 # Code adopted from 
 # Title: Django & React Web App Tutorial - Authentication, Databases, Deployments & More...
@@ -12,9 +18,23 @@ from django.contrib.auth import authenticate
 
 # Serializers convert Django models to JSON, which APIs communicate with.
 
+# Adds the time output serializers spend building response data to the request's metrics (see
+# api/metrics.py), apart from the renderer's encoding. A top-level serializer, or each item of a
+# top-level many=True list, is timed; nested serializers count towards their parent.
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return super().to_representation(instance)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record_serialize(time.perf_counter() - start)
+
 # Provides serailization for user registration and profile updates.
 # Code inspired by Tech With Tim Video - Line 17 - 34
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = RoadtripUser  
         fields = ["id", "email", "first_name", "last_name", "password"]
@@ -35,13 +55,13 @@ class UserSerializer(serializers.ModelSerializer):
 
 # The rest of the code was following a similar template from what I learnt in the.
 # Provides basic collaborator information for use in trip views. 
-class CollaboratorSerializer(serializers.ModelSerializer):
+class CollaboratorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = RoadtripUser
         fields = ['id', 'email', 'first_name', 'last_name']
 
 # Provides serialization for trip objects, including author, collaborators and route status indicators.
-class TripSerializer(serializers.ModelSerializer):
+class TripSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True) # Author is automaitcally assigned and cannot be changed.
     collaborators = CollaboratorSerializer(many=True, read_only=True) # Collaborators cannot be modified from the serializer.
     has_route = serializers.SerializerMethodField() # Returns True if a route exists for a trip.
@@ -53,37 +73,175 @@ class TripSerializer(serializers.ModelSerializer):
         extra_kwargs = {"author": {"read_only": True}} # Ensures author is set automatically
     
     def get_has_route(self, obj):
+        # Use the annotation from Trip.objects.with_listing_data() when available.
+        if hasattr(obj, "has_route"):
+            return obj.has_route
         # Check if a route exists in the Route table with a matching trip_id.
         return Route.objects.filter(trip_id=obj.id).exists()
     
     def get_has_updated_route(self, obj):
+        if hasattr(obj, "has_updated_route"):
+            return obj.has_updated_route
         # Check if a route exists and the 'updated_at' field indicates an update
         route = Route.objects.filter(trip_id=obj.id).first()
         return bool(route and route.updated_at)
 
+# Slim trip representation for ?fields=summary listings, without nested users or route status.
+class TripSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Trip
+        fields = ["id", "title", "start_location", "destination", "trip_date", "created_at"]
+        read_only_fields = fields
+
+# Optional filters for trip listings: ?date_from= and ?date_to= on the trip date, and the route's
+# ?min_distance_m=, ?max_distance_m=, ?min_duration_s= and ?max_duration_s=.
+class TripFilterSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    min_distance_m = serializers.IntegerField(required=False, min_value=0)
+    max_distance_m = serializers.IntegerField(required=False, min_value=0)
+    min_duration_s = serializers.IntegerField(required=False, min_value=0)
+    max_duration_s = serializers.IntegerField(required=False, min_value=0)
+
+# Optional filter for route listings: ?trip= limits them to one trip.
+class RouteFilterSerializer(serializers.Serializer):
+    trip = serializers.IntegerField(required=False, min_value=1)
+
+# Reads and writes the packed route geometry as the JSON-stringified polyline clients use.
+class RoutePathField(serializers.Field):
+    def to_representation(self, value):
+        return format_route_path(value)
+
+    def to_internal_value(self, data):
+        try:
+            return pack_points(parse_route_path(data))
+        except (ValueError, TypeError, KeyError, OverflowError):
+            raise serializers.ValidationError("Invalid route path.")
+
 # Serializes route data including trip locations, distance, durations, pitstops and petrol costs information.
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    route_path = RoutePathField(source="packed_geometry", required=False)
+
     class Meta:
         model = Route
-        fields = ["trip", "start_location", "destination", "distance", "duration", "route_path", "pitstops", "petrol_cost", "passenger_shares", "created_at", "updated_at"]
+        fields = ["trip", "start_location", "destination", "distance", "duration", "distance_m", "duration_s", "route_path", "pitstops", "pitstops_version", "petrol_cost", "passenger_shares", "created_at", "updated_at"]
         extra_kwargs = {
-            "route_path": {"required": False}, # These fields are all optional
+            "pitstops_version": {"read_only": True},
+            "distance_m": {"read_only": True},  # Parsed from distance and duration when saved
+            "duration_s": {"read_only": True},
             "pitstops": {"required": False},
             "passenger_shares": {"required": False},
-            "petrol_cost": {"required": False}}  
+            "petrol_cost": {"required": False}} # These fields are all optional
+
+# A route update: the route's writable fields, and the pitstops_version the client last saw.
+class RouteUpdateSerializer(RouteSerializer):
+    pitstops_version = serializers.IntegerField(min_value=0, required=False, write_only=True)
+
+# Slim route representation for ?fields=summary listings. Leaves out the large JSON columns.
+class RouteSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Route
+        fields = ["trip", "start_location", "destination", "distance", "duration", "distance_m", "duration_s", "petrol_cost", "created_at", "updated_at"]
+        read_only_fields = fields
+
+# Fuel economy figures for a vehicle, used by the petrol calculator.
+class VehicleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Vehicle
+        fields = ["id", "manufacturer", "model", "fuel_type", "mpg", "min_mpg", "max_mpg", "variants"]
+
+# A place suggested as a pitstop along a route.
+class PlaceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Place
+        fields = ["id", "name", "category", "address", "lat", "lng"]
+
+# A cached directions result as returned by the directions lookup endpoint.
+class DirectionsResultSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    route_path = RoutePathField(source="geometry.geometry", read_only=True)
+
+    class Meta:
+        model = DirectionsResult
+        fields = ["origin", "destination", "waypoints", "route_path", "distance", "duration", "fetched_at"]
+        read_only_fields = fields
+
+# A directions result a client fetched itself and offers to the cache.
+class DirectionsInputSerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=255)
+    destination = serializers.CharField(max_length=255)
+    waypoints = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list, max_length=25)
+    route_path = RoutePathField()
+    distance = serializers.CharField(max_length=50)
+    duration = serializers.CharField(max_length=50)
+
+# Collaborators of a trip as a list of their emails.
+class CollaboratorEmailsField(serializers.ListField):
+    child = serializers.EmailField()
+
+    def to_representation(self, value):
+        return [user.email for user in value.all()]
+
+# A route as written to and read from trip exports.
+class RouteTransferSerializer(serializers.ModelSerializer):
+    route_path = RoutePathField(source="packed_geometry", required=False)
+
+    class Meta:
+        model = Route
+        fields = ["start_location", "destination", "distance", "duration", "route_path", "pitstops", "petrol_cost", "passenger_shares"]
+
+# One line of a trip export, see api/transfer.py.
+class TripTransferSerializer(serializers.ModelSerializer):
+    collaborators = CollaboratorEmailsField(required=False, default=list)
+    route = RouteTransferSerializer(required=False, allow_null=True)
+
+    class Meta:
+        model = Trip
+        fields = ["id", "title", "start_location", "destination", "trip_date", "created_at", "collaborators", "route"]
+        read_only_fields = ["id", "created_at"]
+
+# A trip given inline to the petrol estimate endpoint instead of by id.
+class PetrolTripInputSerializer(serializers.Serializer):
+    label = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    distance_miles = serializers.FloatField(min_value=0)
+    passengers = serializers.IntegerField(min_value=1, max_value=50, default=1)
+
+# A vehicle given inline to the petrol estimate endpoint instead of by id.
+class PetrolVehicleInputSerializer(serializers.Serializer):
+    label = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    mpg = serializers.FloatField(min_value=0.1)
+
+# Validates a batch petrol estimate: every trip is priced with every vehicle.
+class PetrolEstimateSerializer(serializers.Serializer):
+    MAX_COMBINATIONS = 10000
+
+    trip_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    trips = PetrolTripInputSerializer(many=True, required=False, default=list)
+    vehicle_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    vehicles = PetrolVehicleInputSerializer(many=True, required=False, default=list)
+    fuel_price = serializers.DecimalField(max_digits=6, decimal_places=3, min_value=0) # £ per litre
+    exclude_driver = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        trip_count = len(attrs["trip_ids"]) + len(attrs["trips"])
+        vehicle_count = len(attrs["vehicle_ids"]) + len(attrs["vehicles"])
+        if not trip_count or not vehicle_count:
+            raise serializers.ValidationError("At least one trip and one vehicle are required.")
+        if trip_count * vehicle_count > self.MAX_COMBINATIONS:
+            raise serializers.ValidationError(f"At most {self.MAX_COMBINATIONS} trip and vehicle combinations can be estimated at once.")
+        return attrs
 
 # Custom login serializer that provide clearer error messages when login fails.
 class LoginSerializerWithFeedback(TokenObtainPairSerializer):
 
     # Overrides the default validate method to return more detailed login feedback.
+    # The user is looked up and the password hashed exactly once: authenticate() also hashes
+    # for unknown emails, so both failures cost the same and share one message.
     def validate(self, attrs):
-        try:
-            RoadtripUser.objects.get(email=attrs['email']) # Checks if the email is registered
-        except RoadtripUser.DoesNotExist:
-            raise AuthenticationFailed("Invalid login credentials.")
-
-        user = authenticate(email=attrs['email'], password=attrs['password']) # Verifies credentials
-        if not user:
+        self.user = authenticate(self.context.get("request"), email=attrs['email'], password=attrs['password']) # Verifies credentials
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
             raise AuthenticationFailed("Invalid login credentials.")
 
-        return super().validate(attrs)
+        refresh = self.get_token(self.user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
@@ -0,0 +1,87 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import forget_user
+from .events import publish_trip_event
+from .models import Route, Trip, TripSearchTerm, TripTombstone, RoadtripUser
+from .search import index_trips
+from .sync import record_tombstones
+
+# Collaborator changes are part of a trip's representation, so they bump Trip.updated_at
+# to keep ETags and Last-Modified validators honest, and are published to the trip's
+# event subscribers. A clear has no pk_set; subscribers then reload the collaborator list.
+# Removed collaborators get a tombstone so their next sync drops the trip (see api/sync.py).
+@receiver(m2m_changed, sender=Trip.collaborators.through)
+def touch_trip_on_collaborator_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":  # Afterwards there is no telling who was removed
+        memberships = sender.objects.filter(roadtripuser=instance) if reverse else sender.objects.filter(trip=instance)
+        record_tombstones(memberships.values_list("trip_id", "roadtripuser_id"), TripTombstone.REMOVED)
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    change = {"action": "added" if action == "post_add" else "removed"}
+    if not reverse:
+        Trip.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        publish_trip_event(instance.pk, "collaborators", {**change, "user_ids": sorted(pk_set or ())})
+        if action == "post_remove":
+            record_tombstones([(instance.pk, user_id) for user_id in pk_set], TripTombstone.REMOVED)
+        index_trips([instance.pk])
+    elif pk_set:
+        Trip.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+        for trip_id in pk_set:
+            publish_trip_event(trip_id, "collaborators", {**change, "user_ids": [instance.pk]})
+        if action == "post_remove":
+            record_tombstones([(trip_id, instance.pk) for trip_id in pk_set], TripTombstone.REMOVED)
+        index_trips(pk_set)
+    elif action == "post_clear":  # The user left every trip they collaborated on
+        TripSearchTerm.objects.filter(user=instance).exclude(trip__author=instance).delete()
+
+# Deleting a user removes them from other people's trips without an m2m_changed signal.
+@receiver(pre_delete, sender=RoadtripUser)
+def touch_trips_on_user_delete(sender, instance, **kwargs):
+    trip_ids = list(Trip.objects.filter(collaborators=instance).values_list("pk", flat=True))
+    Trip.objects.filter(pk__in=trip_ids).update(updated_at=timezone.now())
+    for trip_id in trip_ids:
+        publish_trip_event(trip_id, "collaborators", {"action": "removed", "user_ids": [instance.pk]})
+
+# Trips embed their author's and collaborators' names and emails, so a change to them bumps
+# Trip.updated_at like a collaborator change does. Saves of other fields, such as last_login
+# on every login, leave the trips alone.
+USER_DETAIL_FIELDS = {"email", "first_name", "last_name"}
+
+@receiver(post_save, sender=RoadtripUser)
+def touch_trips_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not USER_DETAIL_FIELDS & set(update_fields)):
+        return
+    Trip.objects.visible_to(instance).update(updated_at=timezone.now())
+
+# Keeps the search index (api/search.py) in step with trip titles and locations and with
+# route pitstops. Route saves that leave the pitstops alone are skipped.
+@receiver(post_save, sender=Trip)
+def index_saved_trip(sender, instance, **kwargs):
+    index_trips([instance.pk])
+
+@receiver(post_save, sender=Route)
+def index_saved_route(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "pitstops" in update_fields:
+        index_trips([instance.pk])
+
+# Tombstones for everyone who had a trip that is being deleted, read while its collaborators
+# are still there.
+@receiver(pre_delete, sender=Trip)
+def record_trip_deleted(sender, instance, **kwargs):
+    members = [instance.author_id, *instance.collaborators.through.objects.filter(trip=instance).values_list("roadtripuser_id", flat=True)]
+    record_tombstones([(instance.pk, user_id) for user_id in members], TripTombstone.DELETED)
+
+# Ends the event streams of a deleted trip.
+@receiver(post_delete, sender=Trip)
+def publish_trip_deleted(sender, instance, **kwargs):
+    publish_trip_event(instance.pk, "deleted", {})
+
+# Profile edits, password changes and deleted accounts take effect on the very next request
+# instead of after the cached user used by CachedJWTAuthentication expires.
+@receiver(post_save, sender=RoadtripUser)
+@receiver(post_delete, sender=RoadtripUser)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
@@ -0,0 +1,227 @@
+import math
+
+import numpy as np
+from django.db import transaction
+
+from .models import Place, Route, RouteCell
+from .polyline import PRECISION, unpack_points
+
+# Grid index over route geometry for "trips passing near a point" queries.
+# The map is divided into fixed cells of CELL_DEGREES; every route stores the cells its path
+# crosses. A query looks up the cells around the point through an ordinary indexed column,
+# then measures the exact distance to the candidate routes. Works on any database, no PostGIS.
+
+CELL_DEGREES = 0.2  # About 22km north-south and 14km east-west in the UK
+CELL_UNITS = round(CELL_DEGREES * PRECISION)  # Cell size in the 1e-5 degree units of route points
+LNG_CELLS = round(360 / CELL_DEGREES) + 1
+LNG_WRAP = round(360 / CELL_DEGREES)  # Columns around the globe; the last one, exactly 180°, is column 0 again
+LAT_ROWS = round(180 / CELL_DEGREES)
+MAX_RADIUS_KM = 200
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320  # At the equator, scaled by cos(latitude)
+
+def cell_id(lat_index, lng_index):
+    return lat_index * LNG_CELLS + lng_index
+
+def _grid(value, offset):
+    return (value + offset * PRECISION) / CELL_UNITS
+
+# The column of a lng index that may run past ±180°.
+def _column(lng_index):
+    return lng_index if 0 <= lng_index <= LNG_WRAP else lng_index % LNG_WRAP
+
+# The columns of a range of lng indexes that may run past ±180°, wrapped around the globe.
+# Points at exactly 180° are stored in the last column, which covers the same ground as column 0.
+def _columns(lng_indexes):
+    columns = {_column(lng_index) for lng_index in lng_indexes}
+    if columns & {0, LNG_WRAP}:
+        columns.update((0, LNG_WRAP))
+    return columns
+
+# Cells crossed by the segment from a to b, walking the grid one boundary at a time. A segment
+# crossing the antimeridian goes the short way round.
+def _segment_cells(a, b, cells):
+    x0, y0 = _grid(a[0], 90), _grid(a[1], 180)
+    x1, y1 = _grid(b[0], 90), _grid(b[1], 180)
+    if abs(y1 - y0) > LNG_WRAP / 2:
+        y1 -= math.copysign(LNG_WRAP, y1 - y0)
+    cx, cy = math.floor(x0), math.floor(y0)
+    end_x, end_y = math.floor(x1), math.floor(y1)
+    cells.add(cell_id(cx, cy))
+    if (cx, cy) == (end_x, end_y):
+        return
+
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    next_x = ((cx + (step_x > 0)) - x0) / dx if dx else math.inf
+    next_y = ((cy + (step_y > 0)) - y0) / dy if dy else math.inf
+    delta_x = abs(1 / dx) if dx else math.inf
+    delta_y = abs(1 / dy) if dy else math.inf
+
+    for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+        if next_x < next_y:
+            cx += step_x
+            next_x += delta_x
+        else:
+            cy += step_y
+            next_y += delta_y
+        cells.add(cell_id(cx, _column(cy)))
+
+# All grid cells a path of integer (lat, lng) points passes through.
+def path_cells(points):
+    cells = set()
+    if len(points) == 1:
+        _segment_cells(points[0], points[0], cells)
+    for a, b in zip(points, points[1:]):
+        _segment_cells(a, b, cells)
+    return cells
+
+# Cells overlapping the bounding box of a circle around a point in degrees.
+def cells_near(lat, lng, radius_km):
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    lng_delta = radius_km / (KM_PER_DEGREE_LNG * max(math.cos(math.radians(lat)), 0.01))
+    lat_range = range(max(math.floor((lat - lat_delta + 90) / CELL_DEGREES), 0), min(math.floor((lat + lat_delta + 90) / CELL_DEGREES), LAT_ROWS) + 1)
+    lng_range = range(math.floor((lng - lng_delta + 180) / CELL_DEGREES), math.floor((lng + lng_delta + 180) / CELL_DEGREES) + 1)
+    return [cell_id(x, y) for x in lat_range for y in sorted(_columns(lng_range))]
+
+# Longitude differences taken the short way round, between -180 and 180 degrees.
+def _wrapped_degrees(delta):
+    return np.remainder(delta + 180, 360) - 180
+
+# Shortest distance in km from each point (in degrees) to a path of integer points, and how far
+# along the path the closest position lies. Uses a flat projection around each point, accurate to
+# well under 1% at these distances. The path is split into runs of segments, and each point is
+# only measured against runs whose bounding box, grown by max_km, contains it; points further
+# than max_km from the whole path get an infinite distance.
+def distances_along_path(lats, lngs, points, max_km=math.inf, run_length=16):
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    distances = np.full(len(lats), math.inf)
+    along = np.zeros(len(lats))
+    if not len(points) or not len(lats):
+        return distances, along
+    path = np.asarray(points, dtype=np.float64) / PRECISION
+    if len(path) == 1:
+        path = np.vstack((path, path))
+
+    # Segment lengths use the latitude of their midpoint for the east-west scale.
+    segment_lat = np.diff(path[:, 0]) * KM_PER_DEGREE_LAT
+    segment_lng = _wrapped_degrees(np.diff(path[:, 1])) * KM_PER_DEGREE_LNG * np.cos(np.radians((path[:-1, 0] + path[1:, 0]) / 2))
+    segment_length = np.hypot(segment_lat, segment_lng)
+    path_offset = np.concatenate(([0.0], np.cumsum(segment_length)[:-1]))
+
+    # Bounding box of every run of segments, including the point that closes the run.
+    starts = np.arange(0, len(path) - 1, run_length)
+    ends = np.minimum(starts + run_length, len(path) - 1)
+    run_lat_min = np.minimum(np.minimum.reduceat(path[:-1, 0], starts), path[ends, 0])
+    run_lat_max = np.maximum(np.maximum.reduceat(path[:-1, 0], starts), path[ends, 0])
+    run_lng_min = np.minimum(np.minimum.reduceat(path[:-1, 1], starts), path[ends, 1])
+    run_lng_max = np.maximum(np.maximum.reduceat(path[:-1, 1], starts), path[ends, 1])
+    lat_margin = max_km / KM_PER_DEGREE_LAT
+    lng_margin = max_km / (KM_PER_DEGREE_LNG * max(math.cos(math.radians(np.abs(path[:, 0]).max() + lat_margin)), 0.01)) if max_km < math.inf else math.inf
+    near_lat = (lats[:, None] >= run_lat_min - lat_margin) & (lats[:, None] <= run_lat_max + lat_margin)
+    near_lng = np.zeros_like(near_lat)
+    for turn in (-360, 0, 360):  # A point just across the antimeridian from a run
+        near_lng |= (lngs[:, None] + turn >= run_lng_min - lng_margin) & (lngs[:, None] + turn <= run_lng_max + lng_margin)
+    near = near_lat & near_lng
+
+    for run in np.flatnonzero(near.any(axis=0)).tolist():
+        rows = np.flatnonzero(near[:, run])
+        run_path = path[starts[run]:ends[run] + 1]
+        lat = lats[rows, None]
+        x = _wrapped_degrees(run_path[:, 1] - lngs[rows, None]) * (KM_PER_DEGREE_LNG * np.cos(np.radians(lat)))
+        y = (run_path[:, 0] - lat) * KM_PER_DEGREE_LAT
+        x0, y0 = x[:, :-1], y[:, :-1]
+        dx, dy = x[:, 1:] - x0, y[:, 1:] - y0
+        length_squared = dx * dx + dy * dy
+        t = np.divide(-(x0 * dx + y0 * dy), length_squared, out=np.zeros_like(length_squared), where=length_squared > 0)
+        np.clip(t, 0, 1, out=t)
+        cx, cy = x0 + t * dx, y0 + t * dy
+        d = np.sqrt(cx * cx + cy * cy)
+
+        closest = d.argmin(axis=1)
+        index = np.arange(len(rows))
+        run_distance = d[index, closest]
+        better = run_distance < distances[rows]
+        segment = starts[run] + closest[better]
+        distances[rows[better]] = run_distance[better]
+        along[rows[better]] = path_offset[segment] + t[index[better], closest[better]] * segment_length[segment]
+    return distances, along
+
+def distance_to_path_km(lat, lng, points, max_km=math.inf):
+    return float(distances_along_path([lat], [lng], points, max_km)[0][0])
+
+# Grid cell of a point in degrees, matching the cells stored for route paths.
+def point_cell(lat, lng):
+    lat_units = round(lat * PRECISION) + 90 * PRECISION
+    lng_units = round(lng * PRECISION) + 180 * PRECISION
+    return cell_id(lat_units // CELL_UNITS, lng_units // CELL_UNITS)
+
+# Cells within buffer_km of any cell a path crosses.
+def corridor_cells(points, buffer_km):
+    cells = path_cells(points)
+    if not cells:
+        return set()
+    max_lat = max(abs(point[0]) for point in points) / PRECISION
+    lat_rings = math.ceil(buffer_km / (CELL_DEGREES * KM_PER_DEGREE_LAT))
+    lng_rings = math.ceil(buffer_km / (CELL_DEGREES * KM_PER_DEGREE_LNG * max(math.cos(math.radians(max_lat)), 0.01)))
+    corridor = set()
+    for cell in cells:
+        lat_index, lng_index = divmod(cell, LNG_CELLS)
+        for x in range(max(lat_index - lat_rings, 0), min(lat_index + lat_rings, LAT_ROWS) + 1):
+            for y in _columns(range(lng_index - lng_rings, lng_index + lng_rings + 1)):
+                corridor.add(cell_id(x, y))
+    return corridor
+
+# Replaces the stored cells for a route. Call whenever its geometry changes.
+def index_route(trip_id, points):
+    index_routes([(trip_id, points)])
+
+# index_route() for many routes at once, given (trip_id, points) pairs.
+def index_routes(routes):
+    routes = list(routes)
+    with transaction.atomic():
+        RouteCell.objects.filter(route_id__in=[trip_id for trip_id, _ in routes]).delete()
+        RouteCell.objects.bulk_create(
+            [RouteCell(route_id=trip_id, cell=cell) for trip_id, points in routes for cell in sorted(path_cells(points))],
+            batch_size=1000,
+        )
+
+# Routes of the given trips passing within radius_km of a point, as (trip_id, distance_km)
+# pairs sorted by distance.
+def routes_near(trips, lat, lng, radius_km):
+    nearby = RouteCell.objects.filter(cell__in=cells_near(lat, lng, radius_km)).values("route_id")
+    candidates = Route.objects.filter(trip__in=trips, pk__in=nearby).values_list("trip_id", "geometry__geometry")
+    matches = []
+    for trip_id, geometry in candidates:
+        distance = distance_to_path_km(lat, lng, unpack_points(geometry), radius_km)
+        if distance <= radius_km:
+            matches.append((trip_id, distance))
+    return sorted(matches, key=lambda match: match[1])
+
+# Places within buffer_km of a path of integer points, nearest to the route first, with at most
+# `limit` per category. Each result is (place, distance_km, along_km), where along_km is how
+# far from the start of the route the closest point lies.
+def places_along_route(points, buffer_km, categories=None, limit=10):
+    candidates = Place.objects.filter(cell__in=corridor_cells(points, buffer_km))
+    if categories:
+        candidates = candidates.filter(category__in=categories)
+    candidates = list(candidates.values_list("pk", "lat", "lng", "category"))
+    if not candidates:
+        return []
+
+    ids, lats, lngs, place_categories = zip(*candidates)
+    distances, along = distances_along_path(lats, lngs, points, buffer_km)
+    per_category = {}
+    chosen = []
+    for i in np.argsort(distances, kind="stable").tolist():
+        if distances[i] > buffer_km:
+            break
+        category = place_categories[i]
+        if per_category.get(category, 0) < limit:
+            per_category[category] = per_category.get(category, 0) + 1
+            chosen.append(i)
+
+    places = Place.objects.in_bulk([ids[i] for i in chosen])
+    return [(places[ids[i]], float(distances[i]), float(along[i])) for i in chosen]
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import Route, Trip, TripCollaborator, TripTombstone
+
+# Incremental sync: everything about a user's trips that changed since their last sync, so a
+# reconnecting client fetches the few trips and routes that changed instead of the whole list.
+# The cursor is the server time the previous sync started. Trips and routes are matched on their
+# indexed updated_at, collaborator additions on TripCollaborator.added_at, and deleted trips or
+# removals on TripTombstone rows. Clients apply the changes by id, so an entity sent twice does
+# no harm.
+
+# Rows are stamped when saved, not when committed, so a change that commits just after a sync
+# read the table can carry an earlier time than the cursor. Looking back this far catches it.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Cursors are microseconds since the epoch, so they need no escaping in a query string.
+def encode_cursor(moment):
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+# The time a cursor stands for, or None if it is not one.
+def decode_cursor(value):
+    if not (value.isascii() and value.isdigit()) or len(value) > 16:
+        return None
+    return EPOCH + timedelta(microseconds=int(value))
+
+# Whether tombstones for a cursor this old may already have been pruned. Such clients have to
+# replace everything they hold with a full sync.
+def cursor_expired(since):
+    return since < timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+# The user's trips and routes changed since the cursor, and the ids of trips they lost, as
+# (trips, routes, deleted trip ids). Without a cursor, every trip and route and nothing deleted.
+def changes_since(user, since=None):
+    trips = Trip.objects.visible_to(user)
+    routes = Route.objects.filter(trip__in=trips.values("pk"))
+    if since is None:
+        return trips, routes, []
+
+    since -= SYNC_OVERLAP
+    changed = trips.filter(updated_at__gte=since)
+    # A trip the user just joined may have an old route, which they have never seen.
+    joined = TripCollaborator.objects.filter(roadtripuser=user, added_at__gte=since).values("trip_id")
+    routes = routes.filter(models.Q(updated_at__gte=since) | models.Q(trip_id__in=joined))
+    deleted = (
+        TripTombstone.objects.filter(user_id=user.pk, deleted_at__gte=since)
+        .exclude(trip_id__in=trips.values("pk"))  # Removed and then added back
+        .values_list("trip_id", flat=True)
+        .distinct()
+    )
+    return changed, routes, sorted(deleted)
+
+# Tombstones for users losing trips, from (trip id, user id) pairs: every member when a trip
+# is deleted, removed collaborators when they are taken off it.
+def record_tombstones(memberships, reason):
+    TripTombstone.objects.bulk_create(
+        [TripTombstone(trip_id=trip_id, user_id=user_id, reason=reason) for trip_id, user_id in memberships],
+        batch_size=1000,
+    )
+
+# Deletes tombstones older than any cursor that may still be used.
+def prune_tombstones(days=None):
+    days = settings.SYNC_TOMBSTONE_DAYS if days is None else days
+    deleted, _ = TripTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,910 @@
+import asyncio
+import gzip
+import io
+import json
+import smtplib
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import async_views
+from .benchmarks.runner import compare, run_benchmarks, uncovered_urls
+from .benchmarks.scenarios import build_scenarios
+from .benchmarks.seed import seed_dataset
+from .compression import brotli
+from .directions import delete_unused_geometry
+from .events import RETRY_FRAME
+from .measures import distance_meters, duration_seconds
+from .models import OutboxEmail, Place, RoadtripUser, Route, RouteCell, RouteGeometry, RouteGeometryManager, SearchWord, SearchWordTrigram, Trip, Vehicle
+from .outbox import deliver_pending, queue_email
+from .permissions import has_trip_access
+from .petrol import parse_distance_miles, to_pence
+from .pitstops import update_pitstops
+from .polyline import pack_points
+from .renderers import JSONRenderer, msgpack
+from .replicas import PIN_SECONDS, REPLICAS
+from .search import index_trips, search_trips
+from .spatial import LNG_CELLS, cells_near, point_cell
+from .sync import encode_cursor
+
+# Run with: python manage.py test api --settings=backend.test_settings
+
+def make_user(name):
+    return RoadtripUser.objects.create_user(email=f"{name}@example.com", password="test-password-123", first_name=name.title(), last_name="Tester")
+
+# Users who never log in, without the cost of hashing a password for each.
+def make_users(prefix, count):
+    return RoadtripUser.objects.bulk_create(
+        [RoadtripUser(email=f"{prefix}{i}@example.com", first_name=prefix.title(), last_name=str(i)) for i in range(count)]
+    )
+
+# Trips for the author, each shared with the collaborators and given a route.
+def make_trips(author, count, collaborators=()):
+    trips = []
+    for i in range(count):
+        trip = Trip.objects.create(author=author, title=f"Leeds to York {i}", start_location="Leeds", destination="York", trip_date=date(2025, 1, 1))
+        trip.collaborators.add(*collaborators)
+        Route.objects.create(trip=trip, start_location="Leeds", destination="York", distance="25 mi", duration="40 mins", pitstops=["Wetherby"])
+        trips.append(trip)
+    return trips
+
+# Requests may read through the replica, see backend/test_settings.py.
+class RoadtripTestCase(TestCase):
+    databases = {"default", *REPLICAS}
+
+# The connection safe reads go through, see api/replicas.py.
+def read_connection():
+    return connections[REPLICAS[0] if REPLICAS else "default"]
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+# The trip list loads authors, collaborators and route status up front, so its queries do not
+# grow with the number of trips.
+class TripListQueryCountTests(RoadtripTestCase):
+    def list_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/trips/", {"page_size": 200})
+        self.assertEqual(response.status_code, 200)
+        return len(response.data["results"]), len(queries)
+
+    def test_query_count_is_flat(self):
+        author, *collaborators = [make_user(name) for name in ("author", "ann", "bob")]
+        client = client_for(author)
+        make_trips(author, 5, collaborators)
+        few, few_queries = self.list_queries(client)
+        make_trips(author, 45, collaborators)
+        many, many_queries = self.list_queries(client)
+        self.assertEqual((few, many), (5, 50))
+        self.assertEqual(few_queries, many_queries)
+
+    def test_collaborator_sees_shared_trips(self):
+        author, collaborator = make_user("author"), make_user("ann")
+        make_trips(author, 3, [collaborator])
+        count, _ = self.list_queries(client_for(collaborator))
+        self.assertEqual(count, 3)
+
+# ?trip= narrows the route list to one trip and must be a trip id.
+class RouteListFilterTests(RoadtripTestCase):
+    def test_trip_filter(self):
+        author = make_user("author")
+        first, second = make_trips(author, 2)
+        client = client_for(author)
+        response = client.get("/api/routes/", {"trip": second.pk})
+        self.assertEqual([route["trip"] for route in response.data["results"]], [second.pk])
+        self.assertEqual(len(client.get("/api/routes/", {"trip": ""}).data["results"]), 2)
+        for value in ("abc", "1.5", "0"):
+            self.assertEqual(client.get("/api/routes/", {"trip": value}).status_code, 400, value)
+
+# A route_path that does not parse is the client's mistake, not a server error.
+class UpdateRouteTests(RoadtripTestCase):
+    def test_invalid_route_path_is_rejected(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        client = client_for(author)
+        url = f"/api/routes/{trip.pk}/update/"
+        for value in ([[1]], [["a", "b"]], {"points": 5}):
+            response = client.patch(url, {"route_path": value, "distance": "30 mi"}, format="json")
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn("route_path", response.data)
+        self.assertEqual(Route.objects.get(pk=trip.pk).distance, "25 mi")
+
+        response = client.patch(url, {"route_path": '"_p~iF~ps|U_ulLnnqC"', "distance": "30 mi"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        route = Route.objects.get(pk=trip.pk)
+        self.assertEqual((route.distance, route.path_points), ("30 mi", [(3850000, -12020000), (4070000, -12095000)]))
+
+    def test_pitstops_version(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        client = client_for(author)
+        url = f"/api/routes/{trip.pk}/update/"
+        for value in (True, -1, "three", 1.5):
+            response = client.patch(url, {"pitstops": ["Selby"], "pitstops_version": value}, format="json")
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn("pitstops_version", response.data)
+        self.assertEqual(client.patch(url, {"pitstops": ["Selby"], "pitstops_version": "0"}, format="json").status_code, 200)
+        response = client.patch(url, {"pitstops": ["Tadcaster"], "pitstops_version": 0}, format="json")
+        self.assertEqual((response.status_code, response.data["version"]), (409, 1))
+        self.assertEqual(client.patch(url, {"pitstops": ["Tadcaster"], "pitstops_version": 1}, format="json").status_code, 200)
+        route = Route.objects.get(pk=trip.pk)
+        self.assertEqual((route.pitstops, route.pitstops_version), (["Tadcaster"], 2))
+
+# Every member's event stream keeps delivering after collaborators change, the author's included.
+class TripEventsTests(RoadtripTestCase):
+    async def subscribe(self, user, trip):
+        request = AsyncRequestFactory().get(f"/api/trips/{trip.pk}/events/", headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"})
+        response = await async_views.TripEventsView.as_view()(request, pk=trip.pk)
+        self.assertEqual(response.status_code, 200)
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await anext(frames), RETRY_FRAME)
+        return frames
+
+    # Runs a change and the events it publishes on commit, which TestCase would otherwise hold back.
+    def commit(self, change, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            change(*args)
+
+    async def next_event(self, frames):
+        frame = await asyncio.wait_for(anext(frames), 2)
+        return frame.split(b"\n", 1)[0]
+
+    async def test_members_receive_events_after_collaborator_change(self):
+        author, collaborator, newcomer = [await sync_to_async(make_user)(name) for name in ("author", "ann", "bob")]
+        trip, = await sync_to_async(make_trips)(author, 1, [collaborator])
+        streams = [await self.subscribe(author, trip), await self.subscribe(collaborator, trip)]
+        try:
+            await sync_to_async(self.commit)(trip.collaborators.add, newcomer)
+            for frames in streams:
+                self.assertEqual(await self.next_event(frames), b"event: collaborators")
+            await sync_to_async(self.commit)(update_pitstops, trip.pk, [{"op": "add", "pitstop": "Tebay"}])
+            for frames in streams:
+                self.assertEqual(await self.next_event(frames), b"event: pitstops")
+        finally:
+            for frames in streams:
+                await frames.aclose()
+
+    async def test_removed_collaborator_stream_ends(self):
+        author, collaborator = [await sync_to_async(make_user)(name) for name in ("author", "ann")]
+        trip, = await sync_to_async(make_trips)(author, 1, [collaborator])
+        frames = await self.subscribe(collaborator, trip)
+        await sync_to_async(self.commit)(trip.collaborators.remove, collaborator)
+        self.assertEqual(await self.next_event(frames), b"event: collaborators")
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(frames), 2)
+
+# Directions results come from clients, so each user only reads back the ones they stored.
+class DirectionsTests(RoadtripTestCase):
+    journey = {"origin": "Leeds", "destination": "York"}
+
+    def offer(self, user):
+        data = {**self.journey, "route_path": [{"lat": 53.8, "lng": -1.55}, {"lat": 53.96, "lng": -1.08}], "distance": "25 mi", "duration": "40 mins"}
+        return client_for(user).post("/api/directions/", data, format="json")
+
+    def test_results_are_scoped_to_the_user_who_stored_them(self):
+        owner, other = make_user("owner"), make_user("other")
+        self.assertEqual(self.offer(owner).status_code, 201)
+        self.assertEqual(client_for(owner).get("/api/directions/", self.journey).status_code, 200)
+        self.assertEqual(client_for(other).get("/api/directions/", self.journey).status_code, 404)
+
+        # Another user's result for the same journey is kept apart rather than replacing it.
+        self.assertEqual(self.offer(other).status_code, 201)
+        self.assertEqual(client_for(owner).get("/api/directions/", self.journey).status_code, 200)
+
+    def test_prune_skips_geometry_used_again(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        used = RouteGeometry.objects.intern(pack_points([(5380000, -155000), (5396000, -108000)]))
+        Route.objects.filter(pk=trip.pk).update(geometry=used)
+        unused = RouteGeometry.objects.intern(pack_points([(5100000, -100000), (5110000, -110000)]))
+
+        # Pretend a route started using a geometry after it was found unused.
+        with mock.patch.object(RouteGeometryManager, "unused", lambda manager: manager.all()):
+            self.assertEqual(delete_unused_geometry(), 1)
+        self.assertTrue(RouteGeometry.objects.filter(pk=used.pk).exists())
+        self.assertFalse(RouteGeometry.objects.filter(pk=unused.pk).exists())
+
+# /metrics/ needs the configured token, and reports serializer time apart from rendering.
+class MetricsTests(RoadtripTestCase):
+    def scrape(self, **headers):
+        return self.client.get("/metrics/", headers=headers)
+
+    def test_not_served_without_a_token_configured(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.scrape().status_code, 403)
+            self.assertEqual(self.scrape(Authorization="Bearer ").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_token_required(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(Authorization="Bearer wrong").status_code, 403)
+        self.assertEqual(self.scrape(Authorization="Bearer scrape-token").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_serializer_time_is_recorded(self):
+        author = make_user("author")
+        make_trips(author, 3)
+        self.assertEqual(client_for(author).get("/api/trips/").status_code, 200)
+        body = self.scrape(Authorization="Bearer scrape-token").content.decode()
+        sums = [line for line in body.splitlines() if line.startswith('roadtrip_serialize_seconds_sum{view="trip-list",method="GET"}')]
+        self.assertEqual(len(sums), 1)
+        self.assertGreater(float(sums[0].split()[-1]), 0)
+
+# Costs are rounded to whole pence as the decimal amounts they print as, half up.
+class PetrolCostTests(RoadtripTestCase):
+    def test_to_pence_rounds_half_up_exactly(self):
+        self.assertEqual(to_pence([2.675, 1.005, 0.125, 0.124999, 12345.675]).tolist(), [268, 101, 13, 12, 1234568])
+        self.assertEqual(to_pence([[0.0, 0.004], [0.005, 5 * 0.535]]).tolist(), [[0, 0], [1, 268]])
+
+    def test_shares_add_up_to_the_rounded_cost(self):
+        user = make_user("driver")
+        response = client_for(user).post("/api/petrol/estimate/", {
+            "trips": [{"distance_miles": 1, "passengers": 3}],
+            "vehicles": [{"mpg": 4.54609}],  # One litre per mile
+            "fuel_price": "1.005",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        result, = response.data["results"]
+        self.assertEqual((result["litres"], result["cost"], result["shares"]), ("1.00", "1.01", ["0.34", "0.34", "0.33"]))
+
+    def test_parse_distance_miles(self):
+        cases = {"212 mi": 212, "1,204 km": 1204 * 0.621371, "800 m": 0.8 * 0.621371, "approx, 12 mi": 12, "212": 212}
+        for text, miles in cases.items():
+            self.assertAlmostEqual(parse_distance_miles(text), miles, msg=text)
+        for text in ("5 min", "far", ",", None):
+            self.assertIsNone(parse_distance_miles(text), text)
+
+    def test_saved_route_distances(self):
+        user = make_user("driver")
+        readable, unreadable = make_trips(user, 2)
+        Route.objects.filter(pk=readable.pk).update(distance="approx, 12 mi")
+        Route.objects.filter(pk=unreadable.pk).update(distance="5 min")
+        client = client_for(user)
+        data = {"vehicles": [{"mpg": 4.54609}], "fuel_price": "1.50"}
+        response = client.post("/api/petrol/estimate/", {**data, "trip_ids": [readable.pk]}, format="json")
+        self.assertEqual(response.data["results"][0]["litres"], "12.00")
+        response = client.post("/api/petrol/estimate/", {**data, "trip_ids": [readable.pk, unreadable.pk]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str([unreadable.pk]), response.data["trip_ids"][0])
+
+# A trip's validators change when anything it embeds changes, collaborator details included.
+class TripConditionalGetTests(RoadtripTestCase):
+    def test_collaborator_detail_change_invalidates_etag(self):
+        author, collaborator = make_user("author"), make_user("ann")
+        trip, = make_trips(author, 1, [collaborator])
+        client = client_for(author)
+        first = client.get(f"/api/trips/{trip.pk}/")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(client.get(f"/api/trips/{trip.pk}/", headers={"If-None-Match": first["ETag"]}).status_code, 304)
+
+        client_for(collaborator).patch("/api/user/profile/", {"first_name": "Annabel"}, format="json")
+        second = client.get(f"/api/trips/{trip.pk}/", headers={"If-None-Match": first["ETag"]})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data["collaborators"][0]["first_name"], "Annabel")
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        # Last-Modified and /api/sync/ follow updated_at, which moved too.
+        self.assertGreater(Trip.objects.get(pk=trip.pk).updated_at, trip.updated_at)
+
+    def test_login_leaves_trips_unchanged(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        updated_at = Trip.objects.get(pk=trip.pk).updated_at
+        self.assertEqual(self.client.post("/api/token/", {"email": author.email, "password": "test-password-123"}).status_code, 200)
+        self.assertEqual(Trip.objects.get(pk=trip.pk).updated_at, updated_at)
+
+# Safe requests read from the replica; writes go to the primary, and so do the writer's reads
+# for PIN_SECONDS afterwards.
+@skipUnless(REPLICAS, "needs a replica, see backend/test_settings.py")
+class ReplicaRoutingTests(RoadtripTestCase):
+    def setUp(self):
+        cache.clear()  # Pins to the primary from other tests
+        self.user = make_user("author")
+        make_trips(self.user, 2)
+        self.client = client_for(self.user)
+
+    # The status and the number of queries on the primary and on the replica.
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connections["default"]) as primary, CaptureQueriesContext(connections[REPLICAS[0]]) as replica:
+            response = getattr(self.client, method)(path, data, format="json")
+        return response.status_code, len(primary), len(replica)
+
+    def test_reads_use_the_replica(self):
+        status, primary, replica = self.request("get", "/api/trips/")
+        self.assertEqual(status, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_use_the_primary_and_pin_the_writer(self):
+        trip = {"title": "Bath to Bristol", "start_location": "Bath", "destination": "Bristol", "trip_date": "2025-02-01"}
+        status, primary, replica = self.request("post", "/api/trips/", trip)
+        self.assertEqual(status, 201)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        # The writer's next reads see their write on the primary...
+        status, primary, replica = self.request("get", "/api/trips/")
+        self.assertEqual((status, replica), (200, 0))
+        self.assertGreater(primary, 0)
+
+        # ...and go back to the replica once the pin expires.
+        with mock.patch("time.time", return_value=time.time() + PIN_SECONDS + 1):
+            status, primary, replica = self.request("get", "/api/trips/")
+        self.assertEqual((status, primary), (200, 0))
+        self.assertGreater(replica, 0)
+
+        # Other users were never pinned.
+        self.client = client_for(make_user("reader"))
+        status, primary, replica = self.request("get", "/api/trips/")
+        self.assertEqual((status, primary), (200, 0))
+
+LEEDS_TO_YORK = [{"lat": 53.7997, "lng": -1.5492}, {"lat": 53.8839, "lng": -1.2623}, {"lat": 53.9600, "lng": -1.0873}]
+
+def set_route_path(user, trip, path):
+    response = client_for(user).patch(f"/api/routes/{trip.pk}/update/", {"route_path": path}, format="json")
+    assert response.status_code == 200, response.data
+
+# Trips are found through the cells their route crosses, then by exact distance to the path.
+class TripsNearTests(RoadtripTestCase):
+    def near(self, user, **params):
+        return client_for(user).get("/api/trips/near/", params)
+
+    def test_finds_visible_trips_passing_near_a_point(self):
+        author, collaborator, other = make_user("author"), make_user("ann"), make_user("other")
+        trip, unrouted = make_trips(author, 2, [collaborator])
+        set_route_path(author, trip, LEEDS_TO_YORK)
+        others, = make_trips(other, 1)
+        set_route_path(other, others, LEEDS_TO_YORK)
+
+        # Tadcaster is on the way; the path runs through it.
+        for user in (author, collaborator):
+            response = self.near(user, lat=53.8839, lng=-1.2623, radius_km=5)
+            self.assertEqual([result["id"] for result in response.data["results"]], [trip.pk])
+            self.assertLess(response.data["results"][0]["distance_km"], 0.1)
+        # Harrogate is about 15km north of the path.
+        response = self.near(author, lat=53.9921, lng=-1.5418, radius_km=10)
+        self.assertEqual(response.data["results"], [])
+        response = self.near(author, lat=53.9921, lng=-1.5418, radius_km=25)
+        self.assertEqual([result["id"] for result in response.data["results"]], [trip.pk])
+
+    def test_finds_routes_across_the_antimeridian(self):
+        author = make_user("author")
+        crossing, east = make_trips(author, 2)
+        set_route_path(author, crossing, [{"lat": -16.8, "lng": 179.9}, {"lat": -16.8, "lng": -179.9}])  # Across Fiji
+        set_route_path(author, east, [{"lat": -16.8, "lng": 179.97}, {"lat": -16.7, "lng": 179.97}])
+        self.assertLess(RouteCell.objects.filter(route=crossing.pk).count(), 4)  # The short way round
+
+        response = self.near(author, lat=-16.8, lng=-179.95, radius_km=10)
+        results = {result["id"]: result["distance_km"] for result in response.data["results"]}
+        self.assertEqual(set(results), {crossing.pk, east.pk})
+        self.assertLess(results[crossing.pk], 0.1)
+        self.assertAlmostEqual(results[east.pk], 8.5, delta=0.5)  # 0.08 degrees of longitude
+
+        cells = cells_near(-16.7, 179.99, 5)
+        self.assertEqual({cell // LNG_CELLS for cell in cells}, {point_cell(-16.7, 179.99) // LNG_CELLS})  # No spill into the next row
+        self.assertEqual({cell % LNG_CELLS for cell in cells}, {point_cell(-16.7, 179.99) % LNG_CELLS, point_cell(-16.7, 180) % LNG_CELLS, 0})
+
+    def test_rejects_bad_parameters(self):
+        user = make_user("author")
+        for params in ({}, {"lat": "north", "lng": 0}, {"lat": 91, "lng": 0}, {"lat": 0, "lng": 0, "radius_km": 500}):
+            self.assertEqual(self.near(user, **params).status_code, 400, params)
+
+def make_place(name, category, lat, lng):
+    return Place.objects.create(name=name, category=category, lat=lat, lng=lng, cell=point_cell(lat, lng))
+
+# Pitstop suggestions come from the local place table, nearest to the route first.
+class RoutePlacesTests(RoadtripTestCase):
+    def test_suggests_places_within_the_buffer(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        set_route_path(author, trip, LEEDS_TO_YORK)
+        on_route = make_place("Tadcaster Services", "gas_station", 53.8845, -1.2630)
+        nearby = make_place("Bramham Diner", "restaurant", 53.8700, -1.3500)
+        make_place("Harrogate Garage", "gas_station", 53.9921, -1.5418)  # About 15km off the route
+
+        url = f"/api/routes/{trip.pk}/places/"
+        client = client_for(author)
+        response = client.get(url, {"buffer_km": 5})
+        self.assertEqual([place["id"] for place in response.data["results"]], [on_route.pk, nearby.pk])
+        self.assertLess(response.data["results"][0]["distance_km"], 0.2)
+        self.assertAlmostEqual(response.data["results"][0]["along_km"], 21, delta=2)
+
+        response = client.get(url, {"buffer_km": 5, "categories": "restaurant"})
+        self.assertEqual([place["id"] for place in response.data["results"]], [nearby.pk])
+        self.assertEqual(len(client.get(url, {"buffer_km": 20}).data["results"]), 3)
+        self.assertEqual(len(client.get(url, {"buffer_km": 20, "limit": 1}).data["results"]), 2)  # One per category
+        self.assertEqual(client.get(url, {"buffer_km": 50}).status_code, 400)
+        self.assertEqual(client_for(make_user("other")).get(url).status_code, 403)
+
+# A login hashes the password once, whether it succeeds, is wrong or names no account.
+class LoginTests(RoadtripTestCase):
+    def login(self, email, password):
+        with mock.patch("django.contrib.auth.hashers.pbkdf2", wraps=hashers.pbkdf2) as pbkdf2:
+            response = APIClient().post("/api/token/", {"email": email, "password": password}, format="json")
+        return response, pbkdf2.call_count
+
+    def test_one_hash_per_login(self):
+        user = make_user("author")
+        response, hashes = self.login("author@example.com", "test-password-123")
+        self.assertEqual((response.status_code, hashes), (200, 1))
+        self.assertEqual(AccessToken(response.data["access"])["user_id"], str(user.pk))
+
+        for email, password in (("author@example.com", "wrong-password"), ("nobody@example.com", "test-password-123")):
+            response, hashes = self.login(email, password)
+            self.assertEqual((response.status_code, hashes), (401, 1), email)
+            self.assertEqual(response.data["detail"], "Invalid login credentials.")
+
+# Token-authenticated requests read the user from the cache until the user changes.
+class CachedUserTests(RoadtripTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("author")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def profile(self, queries):
+        with self.assertNumQueries(queries, using="default"):
+            return self.client.get("/api/user/profile/")
+
+    def test_warm_cache_skips_the_user_query(self):
+        self.assertEqual(self.profile(1).data["first_name"], "Author")
+        self.assertEqual(self.profile(0).status_code, 200)
+
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.assertEqual(self.profile(1).data["first_name"], "Renamed")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile(1).status_code, 401)
+
+# The async views answer GETs exactly like the sync views they stand in for under ASGI, and
+# hand every other method to them.
+class AsyncViewTests(RoadtripTestCase):
+    async def compare(self, view, path, user, **kwargs):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.session = SessionStore()  # As the session and authentication middleware would
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        response = await view.as_view()(request, **kwargs)
+        expected = await sync_to_async(APIClient().get)(path, headers=headers)
+        self.assertEqual(response.status_code, expected.status_code, path)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content), path)
+        self.assertEqual((response.get("ETag"), response["Allow"]), (expected.get("ETag"), expected["Allow"]), path)
+        return response.status_code
+
+    async def test_responses_match_the_sync_views(self):
+        author, collaborator, outsider = [await sync_to_async(make_user)(name) for name in ("author", "ann", "other")]
+        trip, = await sync_to_async(make_trips)(author, 1, [collaborator])
+        endpoints = [
+            (async_views.TripListView, "/api/trips/", {}),
+            (async_views.TripDetailView, f"/api/trips/{trip.pk}/", {"pk": trip.pk}),
+            (async_views.RouteByTripIdView, f"/api/api/routes/by-trip/{trip.pk}/", {"trip_id": trip.pk}),
+            (async_views.TripCollaboratorsView, f"/api/trip/{trip.pk}/collaborators/", {"trip_id": trip.pk}),
+            (async_views.UserProfileView, "/api/user/profile/", {}),
+        ]
+        for view, path, kwargs in endpoints:
+            self.assertEqual(await self.compare(view, path, author, **kwargs), 200)
+            self.assertEqual(await self.compare(view, path, collaborator, **kwargs), 200)
+            self.assertEqual(await self.compare(view, path, None, **kwargs), 401)
+        for view, path, kwargs in endpoints[1:4]:
+            self.assertEqual(await self.compare(view, path, outsider, **kwargs), 403)
+
+    async def test_other_methods_go_to_the_sync_view(self):
+        author = await sync_to_async(make_user)("author")
+        data = {"title": "Bath to Bristol", "start_location": "Bath", "destination": "Bristol", "trip_date": "2025-02-01"}
+        request = AsyncRequestFactory().post("/api/trips/", data, content_type="application/json", headers={"Authorization": f"Bearer {AccessToken.for_user(author)}"})
+        response = await async_views.TripListView.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Trip.objects.filter(author=author, title="Bath to Bristol").aexists())
+
+# Access checks cost at most one EXISTS query per trip and request, however many collaborators a trip has.
+class TripAccessTests(RoadtripTestCase):
+    def test_checks_are_one_query_and_cached_per_request(self):
+        author, collaborator, outsider = make_user("author"), make_user("ann"), make_user("other")
+        trip, = make_trips(author, 1, [collaborator, *make_users("extra", 20)])
+
+        request = SimpleNamespace(user=author)
+        with self.assertNumQueries(0):
+            self.assertTrue(has_trip_access(request, trip.pk, trip.author_id))
+        request = SimpleNamespace(user=collaborator)
+        with self.assertNumQueries(1):
+            self.assertTrue(has_trip_access(request, trip.pk, trip.author_id))
+            self.assertTrue(has_trip_access(request, trip.pk))
+        with self.assertNumQueries(1):
+            self.assertFalse(has_trip_access(SimpleNamespace(user=outsider), trip.pk))
+        self.assertFalse(has_trip_access(SimpleNamespace(user=AnonymousUser()), trip.pk))
+
+    def test_route_detail_access(self):
+        author, collaborator = make_user("author"), make_user("ann")
+        trip, = make_trips(author, 1, [collaborator])
+        path = f"/api/routes/{trip.pk}/"
+        with CaptureQueriesContext(read_connection()) as few:
+            self.assertEqual(client_for(collaborator).get(path).status_code, 200)
+        trip.collaborators.add(*make_users("extra", 20))
+        with CaptureQueriesContext(read_connection()) as many:
+            self.assertEqual(client_for(collaborator).get(path).status_code, 200)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(client_for(make_user("other")).get(path).status_code, 403)
+
+class FailingEmailBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPException("Service unavailable")
+
+# Emails are queued with the change that causes them and sent later by the outbox worker.
+class OutboxTests(RoadtripTestCase):
+    def test_registration_queues_the_welcome_email(self):
+        data = {"email": "new@example.com", "first_name": "New", "last_name": "Tester", "password": "test-password-123"}
+        self.assertEqual(APIClient().post("/api/user/register/", data, format="json").status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.recipients), (OutboxEmail.PENDING, ["new@example.com"]))
+
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual([message.to for message in mail.outbox], [["new@example.com"]])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.SENT, 1))
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email("Hello", "Body", ["ann@example.com"])
+        for attempt in range(1, 4):
+            with mock.patch("django.utils.timezone.now", return_value=email.next_attempt_at):
+                self.assertEqual(deliver_pending(max_attempts=3, connection=FailingEmailBackend()), (0, 1))
+                self.assertEqual(deliver_pending(max_attempts=3, connection=FailingEmailBackend()), (0, 0))  # Not due yet
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, attempt)
+            self.assertIn("Service unavailable", email.last_error)
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+        self.assertEqual(mail.outbox, [])
+
+# Pitstop edits are addressed by name, versioned, and only rewrite the pitstop columns.
+class PitstopOperationsTests(RoadtripTestCase):
+    def test_operations_and_conflicts(self):
+        author, collaborator = make_user("author"), make_user("ann")
+        trip, = make_trips(author, 1, [collaborator])
+        set_route_path(author, trip, LEEDS_TO_YORK)
+        geometry_id = Route.objects.get(pk=trip.pk).geometry_id
+        url = f"/api/routes/{trip.pk}/pitstops/"
+
+        operations = [{"op": "add", "pitstop": "Tadcaster"}, {"op": "add", "pitstop": "Bramham", "index": 0}, {"op": "move", "pitstop": "Wetherby", "index": 0}]
+        with CaptureQueriesContext(connection) as queries:
+            response = client_for(author).post(url, {"operations": operations, "version": 0}, format="json")
+        self.assertEqual(response.data, {"pitstops": ["Wetherby", "Bramham", "Tadcaster"], "version": 1})
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "api_route"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("geometry", updates[0])
+        self.assertEqual(Route.objects.get(pk=trip.pk).geometry_id, geometry_id)
+
+        # The collaborator saw version 0, so their edit is refused with the current pitstops.
+        response = client_for(collaborator).post(url, {"operations": [{"op": "remove", "pitstop": "Wetherby"}], "version": 0}, format="json")
+        self.assertEqual((response.status_code, response.data["pitstops"], response.data["version"]), (409, ["Wetherby", "Bramham", "Tadcaster"], 1))
+        response = client_for(collaborator).post(url, {"operations": [{"op": "remove", "pitstop": "Selby"}]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        response = client_for(collaborator).post(url, {"operations": [{"op": "remove", "pitstop": "Wetherby"}]}, format="json")
+        self.assertEqual(response.data, {"pitstops": ["Bramham", "Tadcaster"], "version": 2})
+
+        for data in ({"operations": []}, {"operations": [{"op": "jump", "pitstop": "Bramham"}]}, {"operations": [{"op": "move", "pitstop": "Bramham"}]}, {"operations": [{"op": "add", "pitstop": "Selby"}], "version": "2"}):
+            self.assertEqual(client_for(author).post(url, data, format="json").status_code, 400, data)
+        self.assertEqual(Route.objects.get(pk=trip.pk).pitstops_version, 2)
+
+# The fuel economy dataset is merged into one row per vehicle and searched by prefix.
+class VehicleSearchTests(RoadtripTestCase):
+    rows = [
+        {"Manufacturer": "Ford ", "Model": "Focus", "Fuel Type": "Petrol", "WLTP Imperial Combined": 50.4},
+        {"Manufacturer": "Ford", "Model": "Focus", "Fuel Type": "Petrol", "WLTP Imperial Combined": 48.7},
+        {"Manufacturer": "Ford", "Model": "Focus", "Fuel Type": "Petrol Electric", "WLTP Imperial Combined": 60.1},
+        {"Manufacturer": "Ford", "Model": "Fiesta", "Fuel Type": "Diesel", "WLTP Imperial Combined": 65.7},
+        {"Manufacturer": "Fiat", "Model": "500", "Fuel Type": "Petrol", "WLTP Imperial Combined": None},
+        {"Manufacturer": "Volvo", "Model": "XC40", "Fuel Type": "Petrol", "WLTP Imperial Combined": 38.2},
+    ]
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as data:
+            json.dump(self.rows, data)
+            data.flush()
+            call_command("load_vehicles", path=data.name, stdout=io.StringIO())
+        self.client = client_for(make_user("author"))
+
+    def search(self, **params):
+        return [(vehicle["model"], vehicle["fuel_type"], vehicle["mpg"]) for vehicle in self.client.get("/api/vehicles/", params).data["results"]]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.search(manufacturer="FO", model="foc"), [("Focus", "Hybrid", "60.1"), ("Focus", "Petrol", "49.6")])
+        self.assertEqual(self.search(manufacturer="ford", fuel_type="die"), [("Fiesta", "Diesel", "65.7")])
+        self.assertEqual(self.search(model="x"), [("XC40", "Petrol", "38.2")])
+        self.assertEqual(self.client.get("/api/vehicles/manufacturers/", {"q": "f"}).data["results"], ["Ford"])
+        self.assertEqual(Vehicle.objects.get(model="Focus", fuel_type="Petrol").variants, 2)
+
+# An export imports back as the same trips, routes and collaborators, searchable and on the map.
+class TripTransferTests(RoadtripTestCase):
+    def import_lines(self, user, lines):
+        return client_for(user).post("/api/trips/import/", "".join(lines), content_type="application/x-ndjson")
+
+    def test_export_imports_back(self):
+        author, collaborator, importer = make_user("author"), make_user("ann"), make_user("importer")
+        trip, other = make_trips(author, 2, [collaborator])
+        set_route_path(author, trip, LEEDS_TO_YORK)
+        response = client_for(author).get("/api/trips/export/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [line.decode() for line in response.streaming_content]
+        self.assertEqual([json.loads(line)["title"] for line in lines], [trip.title, other.title])
+
+        exported = json.loads(lines[1])
+        exported["collaborators"].append("nobody@example.com")
+        with mock.patch("api.transfer.publish_trip_event") as publish:
+            response = self.import_lines(importer, [lines[0], "not json\n", json.dumps({"title": "No dates"}) + "\n", json.dumps(exported) + "\n"])
+        self.assertEqual(response.status_code, 200)
+        summary = {key: value for key, value in response.data.items() if key != "errors"}
+        self.assertEqual(summary, {"trips": 2, "routes": 2, "collaborators": 2, "unknown_collaborators": 1, "invalid_lines": 2})
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2, 3])
+
+        copy = Trip.objects.get(author=importer, title=trip.title)
+        self.assertEqual(list(copy.collaborators.all()), [collaborator])
+        copies = Trip.objects.filter(author=importer).order_by("pk")
+        self.assertEqual([call.args for call in publish.call_args_list], [(copy.pk, "collaborators", {"action": "added", "user_ids": [collaborator.pk]}) for copy in copies])
+        invites = OutboxEmail.objects.order_by("pk")
+        self.assertEqual([email.recipients for email in invites], [[collaborator.email]] * 2)
+        self.assertIn(f'"{trip.title}"', invites[0].body)
+        self.assertEqual(copy.route.path_points, Route.objects.get(pk=trip.pk).path_points)
+        self.assertEqual((copy.route.distance, copy.route.pitstops), ("25 mi", ["Wetherby"]))
+        self.assertEqual([trip_id for trip_id, _ in search_trips(importer, "wetherby")], sorted(Trip.objects.filter(author=importer).values_list("pk", flat=True), reverse=True))
+        response = client_for(importer).get("/api/trips/near/", {"lat": 53.8839, "lng": -1.2623, "radius_km": 5})
+        self.assertEqual([result["id"] for result in response.data["results"]], [copy.pk])
+
+        self.assertEqual(self.import_lines(importer, ["not json\n"]).status_code, 400)
+
+# The bundle holds what the separate trip, route and collaborator endpoints return, in two queries.
+class TripBundleTests(RoadtripTestCase):
+    def test_bundle_matches_the_separate_endpoints(self):
+        author, collaborator = make_user("author"), make_user("ann")
+        trip, = make_trips(author, 1, [collaborator, *make_users("extra", 10)])
+        set_route_path(author, trip, LEEDS_TO_YORK)
+        client = client_for(collaborator)
+        with CaptureQueriesContext(read_connection()) as queries:
+            bundle = client.get(f"/api/trips/{trip.pk}/bundle/").data
+        self.assertEqual(len(queries), 2)
+
+        people = client.get(f"/api/trip/{trip.pk}/collaborators/").data["data"]
+        self.assertEqual(bundle["trip"], client.get(f"/api/trips/{trip.pk}/").data)
+        self.assertEqual(bundle["route"], client.get(f"/api/routes/{trip.pk}/").data)
+        self.assertEqual(bundle["collaborators"], people["collaborators"])
+        self.assertEqual(bundle["owner"]["email"], people["owner"]["email"])
+        self.assertEqual(bundle["permissions"], {"is_owner": False, "can_edit": True, "can_manage_collaborators": False, "can_delete": False})
+
+        self.assertEqual(set(client.get(f"/api/trips/{trip.pk}/bundle/", {"fields": "trip,permissions"}).data), {"trip", "permissions"})
+        self.assertEqual(client.get(f"/api/trips/{trip.pk}/bundle/", {"fields": "trip,weather"}).status_code, 400)
+        self.assertEqual(client_for(make_user("other")).get(f"/api/trips/{trip.pk}/bundle/").status_code, 403)
+
+# Every endpoint has a benchmark scenario, and each answers with the status it expects.
+class BenchmarkSuiteTests(RoadtripTestCase):
+    def test_scenarios_run_and_compare(self):
+        cache.clear()
+        dataset = seed_dataset({"users": 5, "trips_per_user": 5, "collaborators": 2, "route_points": 50, "places": 50, "vehicles": 20})
+        scenarios = build_scenarios(dataset)
+        self.assertEqual(uncovered_urls(scenarios), [])
+        results = run_benchmarks([{**scenario, "repeat": 1} for scenario in scenarios], dataset["user"], 1)
+        self.assertEqual(set(results), {scenario["name"] for scenario in scenarios})
+        self.assertEqual(compare(results, results), [])
+
+        name = next(name for name, result in results.items() if result["queries"])
+        fewer = {**results, name: {**results[name], "queries": results[name]["queries"] - 1}}
+        self.assertEqual(compare(results, fewer), [f"{name}: queries {fewer[name]['queries']} -> {results[name]['queries']}"])
+
+# Responses encode exactly as DRF's JSON, in MessagePack on request, and compress when large.
+class RenderingTests(RoadtripTestCase):
+    def test_json_matches_drf(self):
+        data = {
+            "cost": Decimal("12.50"), "when": datetime(2025, 1, 1, 9, 30, 0, 123456, tzinfo=dt_timezone.utc), "day": date(2025, 1, 1),
+            "label": gettext_lazy("Leeds"), "share": np.float64(1.5), "count": np.int64(3), "text": "line\u2028break", 5: None,
+        }
+        self.assertEqual(JSONRenderer().render(data), DRFJSONRenderer().render(data))
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_messagepack(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        client = client_for(author)
+        response = client.get(f"/api/trips/{trip.pk}/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), client.get(f"/api/trips/{trip.pk}/").json())
+
+        body = msgpack.packb({"operations": [{"op": "add", "pitstop": "Tadcaster"}]})
+        response = client.post(f"/api/routes/{trip.pk}/pitstops/", body, content_type="application/msgpack")
+        self.assertEqual(response.json()["pitstops"], ["Wetherby", "Tadcaster"])
+        self.assertEqual(client.post(f"/api/routes/{trip.pk}/pitstops/", b"\xc1", content_type="application/msgpack").status_code, 400)
+
+    def test_rejects_invalid_json(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        response = client_for(author).post(f"/api/routes/{trip.pk}/pitstops/", '{"version": NaN}', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_compression(self):
+        author = make_user("author")
+        trip, = make_trips(author, 1)
+        set_route_path(author, trip, [{"lat": 53.8 + i / 1000, "lng": -1.55 + i / 700} for i in range(300)])
+        client = client_for(author)
+        plain = client.get(f"/api/routes/{trip.pk}/")
+        self.assertGreater(len(plain.content), settings.COMPRESSION_MIN_BYTES)
+        self.assertNotIn("Content-Encoding", plain)
+
+        encodings = [("gzip", gzip.decompress)] + ([("br", brotli.decompress)] if brotli else [])
+        for encoding, decompress in encodings:
+            response = client.get(f"/api/routes/{trip.pk}/", HTTP_ACCEPT_ENCODING=f"{encoding}, identity")
+            self.assertEqual(response["Content-Encoding"], encoding)
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(decompress(response.content), plain.content)
+            self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+
+            export = client.get("/api/trips/export/", HTTP_ACCEPT_ENCODING=encoding)
+            self.assertEqual(export["Content-Encoding"], encoding)
+            self.assertEqual(json.loads(decompress(b"".join(export.streaming_content)))["title"], trip.title)
+
+        small = client.get("/api/user/profile/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", small)
+
+        for header in ["gzip;q=.", "gzip;q=1.0.0", "gzip;q=0"]:
+            response = client.get(f"/api/routes/{trip.pk}/", HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("Content-Encoding", response)
+        response = client.get(f"/api/routes/{trip.pk}/", HTTP_ACCEPT_ENCODING="br;q=., gzip;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+# A sync sends what changed since the cursor, including trips the user lost or gained.
+class SyncTests(RoadtripTestCase):
+    def sync(self, client, since=None):
+        response = client.get("/api/sync/", {"since": since} if since is not None else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_changes_since_cursor(self):
+        ann, bob = make_user("ann"), make_user("bob")
+        client = client_for(ann)
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() - timedelta(hours=2)):
+            kept, deleted = make_trips(ann, 2)
+            left, joined = make_trips(bob, 2)
+            left.collaborators.add(ann)
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() - timedelta(hours=1)):
+            first = self.sync(client)
+        self.assertTrue(first["reset"])
+        self.assertEqual([trip["id"] for trip in first["trips"]], [kept.pk, deleted.pk, left.pk])
+        self.assertEqual([route["trip"] for route in first["routes"]], [kept.pk, deleted.pk, left.pk])
+        self.assertEqual(self.sync(client, first["cursor"])["trips"], [])
+
+        kept.title = "Leeds to Scarborough"
+        kept.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+        left.collaborators.remove(ann)
+        joined.collaborators.add(ann)
+        changes = self.sync(client, first["cursor"])
+        self.assertFalse(changes["reset"])
+        self.assertEqual([trip["id"] for trip in changes["trips"]], [kept.pk, joined.pk])
+        self.assertEqual([route["trip"] for route in changes["routes"]], [joined.pk])  # Old, but new to ann
+        self.assertEqual(changes["deleted"], [deleted_id, left.pk])
+        self.assertGreater(int(changes["cursor"]), int(first["cursor"]))
+
+        # Too old for the tombstones kept, so everything is sent again.
+        self.assertTrue(self.sync(client, encode_cursor(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1)))["reset"])
+        self.assertEqual(client.get("/api/sync/", {"since": "yesterday"}).status_code, 400)
+
+# Route distance and duration are kept as numbers, so trips filter and sort by them in the database.
+class RouteMeasureTests(RoadtripTestCase):
+    def test_parsing(self):
+        self.assertEqual([distance_meters(text) for text in ("212 mi", "1,000 km", "800 m", "far", None)], [341181, 1000000, 800, None, None])
+        self.assertEqual([duration_seconds(text) for text in ("1 day 2 hours", "3 hours 40 mins", "45 mins", "1.5h", "soon")], [93600, 13200, 2700, 5400, None])
+
+    # Text around or instead of the numbers is stored as NULL rather than failing the save.
+    def test_unreadable_text_is_stored_as_null(self):
+        author = make_user("author")
+        client = client_for(author)
+        trip = Trip.objects.create(author=author, title="Coast", start_location="Leeds", destination="York", trip_date=date(2025, 1, 1))
+        data = {"trip": trip.pk, "start_location": "Leeds", "destination": "York", "distance": "Leeds to York, 25 mi", "duration": "about, 40 mins"}
+        self.assertEqual(client.post("/api/routes/", data, format="json").status_code, 201)
+        route = Route.objects.get(pk=trip.pk)
+        self.assertEqual((route.distance_m, route.duration_s), (40234, 2400))
+
+        response = client.patch(f"/api/routes/{trip.pk}/update/", {"distance": "a fair way, ", "duration": "5 min"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        route.refresh_from_db()
+        self.assertEqual((route.distance_m, route.duration_s), (None, 300))
+        self.assertEqual(distance_meters(","), None)
+
+    def test_trips_filter_and_sort_by_distance(self):
+        author = make_user("author")
+        client = client_for(author)
+        trips = make_trips(author, 4)
+        for trip, distance in zip(trips, ("212 mi", "25 mi", "90 km", "400 mi")):
+            self.assertEqual(client.patch(f"/api/routes/{trip.pk}/update/", {"distance": distance, "duration": "2 hours"}, format="json").status_code, 200)
+        unrouted = Trip.objects.create(author=author, title="Unplanned", start_location="Leeds", destination="Hull", trip_date=date(2025, 1, 1))
+        self.assertEqual(Route.objects.get(pk=trips[2].pk).distance_m, 90000)
+
+        ids, page = [], client.get("/api/trips/", {"ordering": "-distance", "fields": "summary", "page_size": 2}).data
+        while True:
+            ids += [trip["id"] for trip in page["results"]]
+            if not page["next"]:
+                break
+            page = client.get(page["next"]).data
+        self.assertEqual(ids, [trips[3].pk, trips[0].pk, trips[2].pk, trips[1].pk, unrouted.pk])
+
+        response = client.get("/api/trips/", {"ordering": "distance", "min_distance_m": 50000, "max_distance_m": 400000})
+        self.assertEqual([trip["id"] for trip in response.data["results"]], [trips[2].pk, trips[0].pk])
+        self.assertEqual(client.get("/api/trips/", {"ordering": "length"}).status_code, 400)
+        self.assertEqual(client.get("/api/trips/", {"min_distance_m": -1}).status_code, 400)
+
+# Search finds the user's own and shared trips by whole words, prefixes and small typos.
+class TripSearchTests(RoadtripTestCase):
+    def search(self, user, query):
+        response = client_for(user).get("/api/trips/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [trip["id"] for trip in response.data["results"]]
+
+    def test_search(self):
+        author, collaborator, other = make_user("author"), make_user("ann"), make_user("other")
+        coast = Trip.objects.create(author=author, title="Scarborough weekend", start_location="Leeds", destination="Scarborough", trip_date=date(2025, 1, 1))
+        riviera = Trip.objects.create(author=author, title="Riviera", start_location="Nice", destination="Côte d'Azur", trip_date=date(2025, 1, 1))
+        dales, = make_trips(author, 1, [collaborator])
+        make_trips(other, 1)
+
+        self.assertEqual(self.search(author, "scarborough"), [coast.pk])
+        self.assertEqual(self.search(author, "scarbrough"), [coast.pk])  # A typo
+        self.assertEqual(self.search(author, "scar"), [coast.pk])
+        self.assertEqual(self.search(author, "cote d'azur"), [riviera.pk])
+        self.assertEqual(self.search(author, "leeds york"), [dales.pk])  # Every word must match
+        self.assertEqual(self.search(author, "leeds"), [dales.pk, coast.pk])  # Title before start location
+        self.assertEqual(self.search(collaborator, "york"), [dales.pk])
+        self.assertEqual(self.search(other, "scarborough"), [])
+
+        update_pitstops(dales.pk, [{"op": "add", "pitstop": "Harrogate"}])
+        self.assertEqual(self.search(collaborator, "harrogate"), [dales.pk])
+        dales.collaborators.remove(collaborator)
+        self.assertEqual(self.search(collaborator, "york"), [])
+        self.assertEqual(client_for(author).get("/api/trips/search/", {"q": " "}).status_code, 400)
+
+    def test_other_users_words_do_not_crowd_out_matches(self):
+        author, other = make_user("author"), make_user("other")
+        whitby = Trip.objects.create(author=author, title="Weekend in Whitby", start_location="Leeds", destination="Whitby", trip_date=date(2025, 1, 1))
+        Trip.objects.bulk_create([
+            Trip(author=other, title=f"whitaa{chr(ord('a') + i)}", start_location="Leeds", destination="York", trip_date=date(2025, 1, 1))
+            for i in range(25)
+        ])
+        index_trips(Trip.objects.filter(author=other).values_list("pk", flat=True))
+
+        self.assertEqual(self.search(author, "whit"), [whitby.pk])
+        self.assertEqual(self.search(author, "whitbt"), [whitby.pk])  # A typo
+        self.assertEqual(len(self.search(other, "whit")), 20)
+
+    def test_prune_search_words(self):
+        author = make_user("author")
+        trip = Trip.objects.create(author=author, title="Weekend in Whitby", start_location="Leeds", destination="Whitby", trip_date=date(2025, 1, 1))
+        trip.delete()
+        out = io.StringIO()
+        call_command("prune_search_words", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Deleted 4 unused search words")
+        self.assertFalse(SearchWord.objects.exists())
+        self.assertFalse(SearchWordTrigram.objects.exists())
@@ -0,0 +1,117 @@
+import json
+
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+
+from .events import publish_trip_event
+from .models import OutboxEmail, RoadtripUser, Route, RouteGeometry, Trip
+from .outbox import collaborator_invite
+from .polyline import unpack_points
+from .search import index_trips
+from .serializers import TripTransferSerializer
+from .spatial import index_routes
+
+# Bulk export and import of a user's trips as NDJSON: one JSON object per line, holding a trip
+# with its route, pitstops and collaborator emails (see TripTransferSerializer).
+# Exports read the trips in chunks, so memory stays flat however many trips a user has.
+# Imports validate line by line and write each batch with a handful of bulk queries in its own
+# transaction, so a bad line is reported and skipped without losing the batches before it.
+
+EXPORT_CHUNK_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# Trips the user authored. Trips they only collaborate on belong to someone else's export.
+def _export_queryset(user):
+    return (
+        Trip.objects.filter(author=user)
+        .select_related("route__geometry")
+        .prefetch_related(Prefetch("collaborators", queryset=RoadtripUser.objects.only("email")))
+        .order_by("pk")
+    )
+
+# One serializer serves every row, like ListSerializer, since building a ModelSerializer's
+# fields costs far more than serializing or validating a trip with them.
+def export_trips(user, chunk_size=EXPORT_CHUNK_SIZE):
+    serializer = TripTransferSerializer()
+    for trip in _export_queryset(user).iterator(chunk_size=chunk_size):
+        yield json.dumps(serializer.to_representation(trip), separators=(",", ":")) + "\n"
+
+# export_trips() for ASGI, where a sync iterator would be read into memory before streaming.
+async def aexport_trips(user, chunk_size=EXPORT_CHUNK_SIZE):
+    serializer = TripTransferSerializer()
+    async for trip in _export_queryset(user).aiterator(chunk_size=chunk_size):
+        yield json.dumps(serializer.to_representation(trip), separators=(",", ":")) + "\n"
+
+# Imports NDJSON lines (str or bytes) as new trips authored by the user. Collaborators are
+# matched by email and sent the usual invite; unknown emails are counted and skipped. Returns a summary of what was
+# imported and the first MAX_REPORTED_ERRORS invalid lines.
+def import_trips(user, lines, batch_size=IMPORT_BATCH_SIZE):
+    summary = {"trips": 0, "routes": 0, "collaborators": 0, "unknown_collaborators": 0, "invalid_lines": 0, "errors": []}
+    serializer = TripTransferSerializer()
+    batch = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(serializer.run_validation(json.loads(line)))
+        except (ValueError, ValidationError) as exc:
+            summary["invalid_lines"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                errors = exc.detail if isinstance(exc, ValidationError) else ["Invalid JSON."]
+                summary["errors"].append({"line": number, "errors": errors})
+            continue
+
+        if len(batch) >= batch_size:
+            _import_batch(user, batch, summary)
+            batch = []
+    if batch:
+        _import_batch(user, batch, summary)
+    return summary
+
+@transaction.atomic
+def _import_batch(user, rows, summary):
+    trips = Trip.objects.bulk_create(
+        [
+            Trip(author=user, title=row["title"], start_location=row["start_location"],
+                 destination=row["destination"], trip_date=row["trip_date"])
+            for row in rows
+        ],
+        batch_size=500,
+    )
+
+    # Collaborators are added as the collaborators endpoint adds them: each is sent the invite
+    # email and the trip's subscribers hear of it. The trips are new, so there is nothing to
+    # touch or tombstone.
+    emails = {email for row in rows for email in row["collaborators"]}
+    users = {member.email: member for member in RoadtripUser.objects.filter(email__in=emails).only("email", "first_name")}
+    Collaborator = Trip.collaborators.through
+    collaborators = []
+    invites = []
+    for trip, row in zip(trips, rows):
+        added = []
+        for email in set(row["collaborators"]):
+            if email not in users:
+                summary["unknown_collaborators"] += 1
+            elif users[email].pk != user.pk:
+                added.append(users[email])
+        collaborators.extend(Collaborator(trip_id=trip.pk, roadtripuser_id=member.pk) for member in added)
+        invites.extend(collaborator_invite(trip, member) for member in added)
+        if added:
+            publish_trip_event(trip.pk, "collaborators", {"action": "added", "user_ids": sorted(member.pk for member in added)})
+    Collaborator.objects.bulk_create(collaborators, batch_size=1000)
+    OutboxEmail.objects.bulk_create(invites, batch_size=1000)
+
+    routed = [(trip, dict(row["route"])) for trip, row in zip(trips, rows) if row.get("route")]
+    geometries = RouteGeometry.objects.intern_many([route.pop("packed_geometry", b"") for _, route in routed])
+    routes = [Route(trip=trip, geometry=geometry, **route) for (trip, route), geometry in zip(routed, geometries)]
+    for route in routes:
+        route.update_measures()
+    routes = Route.objects.bulk_create(routes, batch_size=500)
+    index_routes((route.pk, unpack_points(geometry.geometry) if geometry else []) for route, geometry in zip(routes, geometries))
+    index_trips(trip.pk for trip in trips)
+
+    summary["trips"] += len(trips)
+    summary["routes"] += len(routes)
+    summary["collaborators"] += len(collaborators)
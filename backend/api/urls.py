@@ -4,23 +4,49 @@
 # Youtube link: https://www.youtube.com/watch?v=c-QsfbznSXI&t=7203s
 
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 # defines api endpoints
 
 urlpatterns = [
     path("trips/", views.TripListCreate.as_view(), name="trip-list"), # List or create trip
     path("trips/<int:pk>/", views.TripDetailView.as_view(), name="trip-detail"), # Retrieve, update or delete trips
+    path("trips/<int:pk>/bundle/", views.TripBundleView.as_view(), name="trip-bundle"), # Trip, route, people and permissions in one request
+    path("trips/<int:pk>/events/", views.TripEventsView.as_view(), name="trip-events"), # Live trip changes as server-sent events (ASGI only)
+    path("trips/near/", views.TripsNearView.as_view(), name="trips-near"), # Trips whose route passes near a point
+    path("trips/search/", views.TripSearchView.as_view(), name="trip-search"), # Ranked search over the user's trips
+    path("trips/export/", views.TripExportView.as_view(), name="trip-export"), # Stream the user's trips as NDJSON
+    path("trips/import/", views.TripImportView.as_view(), name="trip-import"), # Import trips from an NDJSON export
     path("trips/delete/<int:pk>/", views.TripDelete.as_view(), name="delete-trip"), # Delete trip or remove from dashboard
+    path("sync/", views.SyncView.as_view(), name="sync"), # Trips, routes and removals changed since a cursor
     path("routes/", views.RouteListCreate.as_view(), name="route-list"), # List or create routes
     path("routes/<int:pk>/", views.RouteDetailView.as_view(), name="route-detail"), # Get route by Id
     path("api/routes/by-trip/<int:trip_id>/", views.RouteByTripIdView.as_view(), name="route-by-trip"), # Get route by trip Id
     path("routes/<int:trip_id>/add-pitstop/", views.AddPitstopView.as_view(), name="add-pitstop"), # Add pitstop to route
     path("routes/<int:trip_id>/update/", views.UpdateRouteView.as_view(), name="update-route"), # Update route details
+    path("routes/<int:trip_id>/pitstops/", views.PitstopOperationsView.as_view(), name="pitstop-operations"), # Add, remove or move pitstops atomically
+    path("routes/<int:trip_id>/places/", views.RoutePlacesView.as_view(), name="route-places"), # Suggested pitstops along the route
     path("user/profile/", views.UserProfileView.as_view(), name="user-profile"), # View or update profile 
     path("user/change-password/", views.ChangePasswordView.as_view(), name="change-password"), # Change user password
     path("user/delete/", views.DeleteAccountView.as_view(), name="delete-account"), # Delete user account
     path('trip/<int:trip_id>/collaborators/', views.TripCollaboratorsView.as_view(), name='trip-collaborators'), # Manage trip collaborators
     path('user/<int:pk>/', views.GetUserByIdView.as_view(), name='get-user-by-id'), # Get user by id
-]
\ No newline at end of file
+    path("vehicles/", views.VehicleSearchView.as_view(), name="vehicle-search"), # Prefix search over vehicle fuel economy
+    path("vehicles/manufacturers/", views.VehicleManufacturersView.as_view(), name="vehicle-manufacturers"), # Distinct vehicle manufacturers
+    path("petrol/estimate/", views.PetrolEstimateView.as_view(), name="petrol-estimate"), # Batch petrol cost estimates
+    path("directions/", views.DirectionsView.as_view(), name="directions"), # Cached directions lookup
+]
+
+# Under ASGI the read-heavy endpoints are served by async views. They come first so they take
+# precedence, and hand every method except GET and HEAD to the sync view they replace.
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path("trips/", async_views.TripListView.as_view(), name="trip-list"),
+        path("trips/<int:pk>/", async_views.TripDetailView.as_view(), name="trip-detail"),
+        path("trips/<int:pk>/events/", async_views.TripEventsView.as_view(), name="trip-events"),
+        path("api/routes/by-trip/<int:trip_id>/", async_views.RouteByTripIdView.as_view(), name="route-by-trip"),
+        path("user/profile/", async_views.UserProfileView.as_view(), name="user-profile"),
+        path('trip/<int:trip_id>/collaborators/', async_views.TripCollaboratorsView.as_view(), name='trip-collaborators'),
+    ] + urlpatterns
@@ -1,16 +1,43 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, serializers, permissions
-from .serializers import UserSerializer, TripSerializer, RouteSerializer
+from .serializers import UserSerializer, TripSerializer, TripFilterSerializer, RouteFilterSerializer, RouteSerializer, RouteUpdateSerializer, TripSummarySerializer, RouteSummarySerializer, VehicleSerializer, PetrolEstimateSerializer, PlaceSerializer, DirectionsResultSerializer, DirectionsInputSerializer
+from .pagination import KeysetPagination, TripPagination, VehiclePagination
+from .permissions import IsTripMember, has_trip_access
+from .conditional import ConditionalGetMixin
+from .replicas import ReplicaReadMixin
+from rest_framework.exceptions import PermissionDenied
+import hashlib
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Trip, RoadtripUser, Route
+from .models import Trip, TripCollaborator, RoadtripUser, Route, RouteGeometry, Vehicle
 from rest_framework.generics import RetrieveAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import LoginSerializerWithFeedback, CollaboratorSerializer
-import json
-from django.core.mail import send_mail
-from django.db import models
+from django.db import models, transaction
+import numpy as np
+from .pitstops import PitstopConflict, normalize_pitstops, update_pitstops
+from .spatial import index_route, routes_near, places_along_route, MAX_RADIUS_KM
+from .petrol import compute_costs, parse_distance_miles, to_pence, split_pence, format_pence, format_shares
+from .outbox import collaborator_invite, queue_email
+from .directions import cache_directions, lookup_directions
+from .events import publish_trip_event
+from .search import MAX_RESULTS, search_trips
+from .sync import changes_since, cursor_expired, decode_cursor, encode_cursor
+from .transfer import aexport_trips, export_trips, import_trips
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Listings accept ?fields=summary to return a slim representation.
+def wants_summary(request):
+    return request.method == "GET" and request.query_params.get("fields") == "summary"
+
+# Trips the user owns or collaborates on, narrowed by the TripFilterSerializer query parameters.
+def filtered_trips(request):
+    filters = TripFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+    return Trip.objects.visible_to(request.user).matching(**filters.validated_data)
 
 # Code adopted from 
 # Title: Django & React Web App Tutorial - Authentication, Databases, Deployments & More...
@@ -19,15 +46,25 @@ from django.db import models
 # Code specified below
 
 # Lists all trips the user owns or collaborates on, and allows the creation of a new trip.
+# Accepts the filters of TripFilterSerializer and the orderings of TripPagination.
 # Code inspired by Tech With Tim Video - Line 23 - 40
-class TripListCreate(generics.ListCreateAPIView):
+class TripListCreate(ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticated]  # Ensures only logged-in users can access
+    pagination_class = TripPagination
 
-    # Filters trips where the user is the author or a collaborator of a trip
+    # Filters trips where the user is the author or a collaborator of a trip.
+    # Route status, authors and collaborators are loaded up front to avoid per-trip queries.
     def get_queryset(self):
-        user = self.request.user
-        return Trip.objects.filter(models.Q(author=user) | models.Q(collaborators=user)).distinct()
+        trips = filtered_trips(self.request)
+        if wants_summary(self.request):
+            return trips.only(*TripSummarySerializer.Meta.fields)
+        return trips.with_listing_data()
+
+    def get_serializer_class(self):
+        if wants_summary(self.request):
+            return TripSummarySerializer
+        return TripSerializer
     
     # Automatically assigns logged-in user as author
     def perform_create(self, serializer):
@@ -42,11 +79,11 @@ class TripDelete(APIView):
             trip = get_object_or_404(Trip, pk=pk)
             user = request.user
 
-            if trip.author == user:
+            if trip.author_id == user.pk:
                 trip.delete()
                 return Response(status=204)
 
-            elif user in trip.collaborators.all():
+            elif has_trip_access(request, trip.pk, trip.author_id):
                 trip.collaborators.remove(user)
                 return Response({"message": "Trip removed from your dashboard."}, status=200)
 
@@ -56,18 +93,19 @@ class TripDelete(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
-# Allows anyone to register an account and sends a welcome email
+# Allows anyone to register an account and queues a welcome email
 # Code inspired by Tech With Tim Video - Line 61 - 64
 class CreateUserView(generics.CreateAPIView):
     queryset = RoadtripUser.objects.all()  # Creates a user using the custom RoadtripUser model
     serializer_class = UserSerializer
     permission_classes = [AllowAny]  # Anyone can register a new user
 
+    # The welcome email is queued in the same transaction and sent by the send_outbox worker.
+    @transaction.atomic
     def perform_create(self, serializer):
         user = serializer.save()
         
-        # Send welcome email
-        send_mail(
+        queue_email(
             subject="Welcome to Roadtrip Mate!",
             message=f"""
             Hi {user.first_name}, 
@@ -79,7 +117,6 @@ class CreateUserView(generics.CreateAPIView):
             – The Roadtrip Mate Team 🚐💨""",
             from_email=None, 
             recipient_list=[user.email],
-            fail_silently=False,
         )
 
 # Users can view or update their own profile information.
@@ -119,7 +156,7 @@ class ChangePasswordView(APIView):
             return Response({"error": "New password must be at least 8 characters long."}, status=status.HTTP_400_BAD_REQUEST)
 
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=["password"])
         return Response({"message": "Password updated successfully!"}, status=status.HTTP_200_OK)
     
 # Permenantly deletes the user's account.
@@ -131,39 +168,123 @@ class DeleteAccountView(APIView):
         user.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+# The ETag of a trip covers the trip, its route state and the author and collaborator details
+# it embeds. Collaborator changes and changes to members' names or emails also bump
+# Trip.updated_at (see api/signals.py), which keeps Last-Modified honest too.
+TRIP_VALIDATOR_FIELDS = ("updated_at", "author_id", "author__email", "author__first_name", "author__last_name", "route__updated_at")
+COLLABORATOR_VALIDATOR_FIELDS = ("roadtripuser_id", "roadtripuser__email", "roadtripuser__first_name", "roadtripuser__last_name")
+
+def trip_collaborator_rows(pk):
+    return TripCollaborator.objects.filter(trip_id=pk).order_by("roadtripuser_id").values_list(*COLLABORATOR_VALIDATOR_FIELDS)
+
+def trip_validators(pk, row, collaborators):
+    etag = hashlib.md5(repr((sorted(row.items()), list(collaborators))).encode()).hexdigest()
+    last_modified = max(filter(None, [row["updated_at"], row["route__updated_at"]]))
+    return f"trip-{pk}-{etag}", last_modified
+
 # Authenticated users can retrieve, update or delete a trip by Id.
-class TripDetailView(RetrieveUpdateDestroyAPIView):
-    queryset = Trip.objects.all()
+class TripDetailView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
+    queryset = Trip.objects.with_listing_data()
     serializer_class = TripSerializer
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    def get_validators(self, request, pk):
+        row = Trip.objects.filter(pk=pk).values(*TRIP_VALIDATOR_FIELDS).first()
+        if row is None:
+            return None
+        if not has_trip_access(request, pk, row["author_id"]):
+            raise PermissionDenied(IsTripMember.message)
+        return trip_validators(pk, row, trip_collaborator_rows(pk))
+
+# Everything a trip page renders in one request: the trip, its route, owner, collaborators and
+# what the caller may do. ?fields=trip,route limits the response to the parts a page uses.
+# The trip, author and route come from one joined query and the collaborators from one prefetch,
+# whichever parts are asked for.
+class TripBundleView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    BUNDLE_FIELDS = ("trip", "route", "owner", "collaborators", "permissions")
+
+    def get(self, request, pk):
+        fields = [name.strip() for name in request.query_params.get("fields", "").split(",") if name.strip()]
+        fields = fields or self.BUNDLE_FIELDS
+        unknown = sorted(set(fields) - set(self.BUNDLE_FIELDS))
+        if unknown:
+            return Response({"fields": [f"Unknown fields: {', '.join(unknown)}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        route_related = "route__geometry" if "route" in fields else "route"
+        trip = get_object_or_404(Trip.objects.select_related("author", route_related).prefetch_related("collaborators"), pk=pk)
+        collaborators = list(trip.collaborators.all())
+        is_owner = trip.author_id == request.user.pk
+        if not is_owner and request.user.pk not in {user.pk for user in collaborators}:
+            raise PermissionDenied(IsTripMember.message)
+
+        route = getattr(trip, "route", None)
+        trip.has_route = route is not None  # Stands in for the with_listing_data() annotations
+        trip.has_updated_route = bool(route and route.updated_at)
+
+        bundle = {}
+        if "trip" in fields:
+            bundle["trip"] = TripSerializer(trip).data
+        if "route" in fields:
+            bundle["route"] = RouteSerializer(route).data if route else None
+        if "owner" in fields:
+            bundle["owner"] = CollaboratorSerializer(trip.author).data
+        if "collaborators" in fields:
+            bundle["collaborators"] = CollaboratorSerializer(collaborators, many=True).data
+        if "permissions" in fields:
+            bundle["permissions"] = {
+                "is_owner": is_owner,
+                "can_edit": True,  # Members may edit the trip, its route and pitstops
+                "can_manage_collaborators": is_owner,
+                "can_delete": is_owner,  # Collaborators can only remove the trip from their dashboard
+            }
+        return Response(bundle, status=status.HTTP_200_OK)
 
 # Lists all the routes where the user is the trip author. Also allows creating or updating a route for a trip.
 class RouteListCreate(generics.ListCreateAPIView):
     serializer_class = RouteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
+    # Optionally filtered to a single trip with ?trip=<id>; other values are a 400.
     def get_queryset(self):
         user = self.request.user
-        return Route.objects.filter(trip__author=user)
+        routes = Route.objects.filter(trip__author=user)
+        filters = RouteFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        if "trip" in filters.validated_data:
+            routes = routes.filter(trip_id=filters.validated_data["trip"])
+        if wants_summary(self.request):
+            return routes.defer(*Route.SUMMARY_DEFERRED_FIELDS)
+        return routes.select_related("geometry")
+
+    def get_serializer_class(self):
+        if wants_summary(self.request):
+            return RouteSummarySerializer
+        return RouteSerializer
 
     def perform_create(self, serializer):
         trip_id = self.request.data.get("trip")
         try:
             trip = get_object_or_404(Trip, id=trip_id)
-            if not trip.is_user_allowed(self.request.user):
+            if not has_trip_access(self.request, trip.pk, trip.author_id):
                 raise serializers.ValidationError("You do not have permission to edit this trip's route.")
 
             # Use update_or_create to handle both creation and update
-            route, created = Route.objects.update_or_create(
-                trip=trip,
-                defaults={
-                    "start_location": self.request.data.get("start_location"),
-                    "destination": self.request.data.get("destination"),
-                    "distance": self.request.data.get("distance"),
-                    "duration": self.request.data.get("duration"),
-                    "route_path": self.request.data.get("route_path"),
-                },
-            )
+            with transaction.atomic():
+                route, created = Route.objects.update_or_create(
+                    trip=trip,
+                    defaults={
+                        "start_location": self.request.data.get("start_location"),
+                        "destination": self.request.data.get("destination"),
+                        "distance": self.request.data.get("distance"),
+                        "duration": self.request.data.get("duration"),
+                        "route_path": self.request.data.get("route_path"),
+                    },
+                )
+                index_route(route.pk, route.path_points) # Keep the spatial index in step with the geometry
+                cache_directions(self.request.user, route.start_location, route.destination, [], route.geometry, route.distance, route.duration)
+                publish_trip_event(trip.pk, "route", {"fields": ["start_location", "destination", "distance", "duration", "route_path"]})
             if created:
                 return Response({"message": "Route created successfully"}, status=status.HTTP_201_CREATED)
             else:
@@ -171,112 +292,205 @@ class RouteListCreate(generics.ListCreateAPIView):
         except Trip.DoesNotExist:
             raise serializers.ValidationError("Trip not found or not owned by the user.")
 
+ROUTE_VALIDATOR_FIELDS = ("updated_at", "trip__author_id")
+
+# Validators for a route from its primary key (the trip id) and updated_at,
+# checking access first so a 304 never leaks anything to non-members.
+def route_validators(request, trip_id):
+    row = Route.objects.filter(pk=trip_id).values(*ROUTE_VALIDATOR_FIELDS).first()
+    if row is None:
+        return None
+    if not has_trip_access(request, trip_id, row["trip__author_id"]):
+        raise PermissionDenied(IsTripMember.message)
+    return route_row_validators(trip_id, row)
+
+def route_row_validators(trip_id, row):
+    return f"route-{trip_id}-{row['updated_at'].timestamp()}", row["updated_at"]
+
 # Gets a route by its id
-class RouteDetailView(generics.RetrieveAPIView):
-    queryset = Route.objects.all()
+class RouteDetailView(ReplicaReadMixin, ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Route.objects.select_related("geometry")
     serializer_class = RouteSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    def get_validators(self, request, pk):
+        return route_validators(request, pk)
 
 # Gets a route that is associated with a given trip Id.
-class RouteByTripIdView(generics.RetrieveAPIView):
+class RouteByTripIdView(ReplicaReadMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = RouteSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    def get_validators(self, request, trip_id):
+        return route_validators(request, trip_id)
 
     def get_object(self):
         trip_id = self.kwargs.get('trip_id')
         try:
-            return Route.objects.get(trip_id=trip_id)
+            route = Route.objects.select_related("geometry").get(trip_id=trip_id)
         except Route.DoesNotExist:
             raise serializers.ValidationError("Route not found")
+        self.check_object_permissions(self.request, route)
+        return route
 
 # Add a pitstops to the route list of pitstops, if the user has access.
 class AddPitstopView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsTripMember]
 
     def post(self, request, trip_id):
+        # Fetch the route's key for the given trip ID or return 404 if not found
+        route = get_object_or_404(Route.objects.only("pk"), trip_id=trip_id)
+        self.check_object_permissions(request, route)
+
+        pitstop = request.data.get("pitstop")
+        if not pitstop:
+            return Response({"error": "Pitstop is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Appends the pitstop only if it's not already in the list, without rewriting the rest of the row
+        update_pitstops(trip_id, [{"op": "add", "pitstop": pitstop}])
+        return Response({"message": "Pitstop added successfully"}, status=status.HTTP_200_OK)
+
+# Applies a batch of add, remove and move operations to a route's pitstops atomically.
+# Clients can send the pitstops_version they last saw and get a 409 if someone else changed them since.
+class PitstopOperationsView(APIView):
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    def post(self, request, trip_id):
+        route = get_object_or_404(Route.objects.only("pk"), trip_id=trip_id)
+        self.check_object_permissions(request, route)
+
+        expected_version = request.data.get("version")
+        if expected_version is not None and (not isinstance(expected_version, int) or isinstance(expected_version, bool)):
+            return Response({"error": "'version' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            # Fetch the route object for the given trip ID or return 404 if not found
-            route = get_object_or_404(Route, trip_id=trip_id)
-            if not route.trip.is_user_allowed(request.user):
-                return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
-
-            pitstop = request.data.get("pitstop")
-            if not pitstop:
-                return Response({"error": "Pitstop is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Ensure pitstops is a list before appending
-            if not isinstance(route.pitstops, list):
-                try:
-                    # Convert the JSONB string to a Python list if necessary
-                    route.pitstops = json.loads(route.pitstops) if route.pitstops else []
-                except (TypeError, json.JSONDecodeError):
-                    # If parsing fails, initialize with an empty list
-                    route.pitstops = []
-
-            # Append the new pitstop only if it's not already in the list
-            if pitstop not in route.pitstops:
-                route.pitstops.append(pitstop)
-
-            # Save the updated pitstops as a list, not as a JSON string
-            route.pitstops = route.pitstops
-            route.save()
-
-            return Response({"message": "Pitstop added successfully"}, status=status.HTTP_200_OK)
+            pitstops, version = update_pitstops(trip_id, request.data.get("operations"), expected_version)
+        except PitstopConflict as e:
+            return Response(
+                {"detail": str(e), "pitstops": e.pitstops, "version": e.version},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            print(f"Error adding pitstop: {str(e)}")
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"pitstops": pitstops, "version": version}, status=status.HTTP_200_OK)
+
+
+# Suggests pitstops within ?buffer_km= (default 5) of a route's saved path in one call,
+# optionally limited to ?categories= (comma separated) and at most ?limit= places per category.
+# Places come from the local place table, so no requests are made to an external places service.
+class RoutePlacesView(APIView):
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    MAX_BUFFER_KM = 20
+    MAX_LIMIT = 50
+
+    def get(self, request, trip_id):
+        route = get_object_or_404(Route.objects.select_related("geometry"), trip_id=trip_id)
+        self.check_object_permissions(request, route)
+
+        try:
+            buffer_km = float(request.query_params.get("buffer_km", 5))
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"error": "buffer_km and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (0 < buffer_km <= self.MAX_BUFFER_KM) or not (1 <= limit <= self.MAX_LIMIT):
+            return Response(
+                {"error": f"buffer_km must be between 0 and {self.MAX_BUFFER_KM} and limit between 1 and {self.MAX_LIMIT}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        categories = [c.strip() for c in request.query_params.get("categories", "").split(",") if c.strip()]
+
+        matches = places_along_route(route.path_points, buffer_km, categories, limit)
+        places = PlaceSerializer([place for place, _, _ in matches], many=True).data
+        results = [
+            {**place, "distance_km": round(distance, 2), "along_km": round(along, 1)}
+            for place, (_, distance, along) in zip(places, matches)
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
 
 # Updates a route's details including distance, duration, path, pitstops, and petrol cost data.
+# Only the columns present in the request are written. Pitstop changes lock the row and
+# accept an optional pitstops_version to reject stale overwrites.
 class UpdateRouteView(generics.UpdateAPIView):
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsTripMember]
+
+    UPDATABLE_FIELDS = ["distance", "duration", "route_path", "pitstops", "petrol_cost", "passenger_shares"]
 
     def patch(self, request, trip_id):
-        try:
-            route = get_object_or_404(Route, trip_id=trip_id)
-            if not route.trip.is_user_allowed(request.user):
-                return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        route = get_object_or_404(Route.objects.only("pk"), trip_id=trip_id)
+        self.check_object_permissions(request, route)
+
+        # Invalid values, such as a route_path that does not parse or a pitstops_version that is
+        # not a count, are a 400 before anything is locked.
+        fields = [field for field in self.UPDATABLE_FIELDS if field in request.data]
+        data = {field: request.data[field] for field in [*fields, "pitstops_version"] if field in request.data}
+        serializer = RouteUpdateSerializer(data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data
+
+        with transaction.atomic():
+            route = Route.objects.select_for_update().defer("passenger_shares").get(pk=trip_id)
+            expected_version = values.get("pitstops_version")
+            if "pitstops" in request.data and expected_version is not None and expected_version != route.pitstops_version:
+                return Response(
+                    {"detail": "The pitstops were changed by someone else", "version": route.pitstops_version},
+                    status=status.HTTP_409_CONFLICT,
+                )
 
             # Update the route details
-            route.distance = request.data.get("distance", route.distance)
-            route.duration = request.data.get("duration", route.duration)
-            route.route_path = request.data.get("route_path", route.route_path)
-            route.pitstops = request.data.get("pitstops", route.pitstops)
-            route.petrol_cost = request.data.get("petrol_cost", route.petrol_cost)
-            route.passenger_shares = request.data.get("passenger_shares", route.passenger_shares)
-
-            route.save()
-
-            return Response({"message": "Route updated successfully"}, status=status.HTTP_200_OK)
+            update_fields = ["updated_at"]
+            for field in fields:
+                if field == "route_path":
+                    route.packed_geometry = values["packed_geometry"]  # Stored as shared geometry on save
+                    update_fields.append("geometry")
+                else:
+                    setattr(route, field, values[field])
+                    update_fields.append(field)
+            if "pitstops" in request.data:
+                version = route.pitstops_version + 1  # The row is locked, so this is the new version
+                route.pitstops_version = models.F("pitstops_version") + 1
+                update_fields.append("pitstops_version")
+
+            route.save(update_fields=update_fields)
+            # Subscribers get which fields changed and the new pitstops, not the whole route.
+            changed = [field for field in fields if field != "pitstops"]
+            if changed:
+                publish_trip_event(trip_id, "route", {"fields": changed})
+            if "pitstops" in request.data:
+                publish_trip_event(trip_id, "pitstops", {"pitstops": normalize_pitstops(route.pitstops), "version": version})
+            if "route_path" in request.data:
+                index_route(route.pk, route.path_points)
+                # The path was fetched for the current pitstops, so it answers that exact journey.
+                cache_directions(
+                    request.user, route.start_location, route.destination, normalize_pitstops(route.pitstops),
+                    route.geometry, route.distance, route.duration,
+                )
 
-        except Exception as e:
-            print(f"Error updating route: {str(e)}")
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"message": "Route updated successfully"}, status=status.HTTP_200_OK)
 
 # Customised Login view that Handles failed login attempts with error messages. 
 class LoginViewWithFeedback(TokenObtainPairView):
     serializer_class = LoginSerializerWithFeedback
 
 # Retrieves a user's profile by their Id.
-class GetUserByIdView(RetrieveAPIView):
+class GetUserByIdView(ReplicaReadMixin, RetrieveAPIView):
     queryset = RoadtripUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Manages collaboraotrs for a specific trip: lists, adds and removes collaborators.
-class TripCollaboratorsView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+class TripCollaboratorsView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTripMember]
 
     def get(self, request, trip_id):
-        try:
-            trip = get_object_or_404(Trip, id=trip_id)
-            
-            if not trip.is_user_allowed(request.user):
-                return Response({'detail': 'Not authorized'}, status=403)
+        trip = get_object_or_404(Trip.objects.select_related("author"), id=trip_id)
+        self.check_object_permissions(request, trip)
 
+        try:
             collaborators = trip.collaborators.all()
             
             return Response({
@@ -322,20 +536,10 @@ class TripCollaboratorsView(APIView):
                     status=400
                 )
             
-            trip.collaborators.add(user_to_add)
-            send_mail(
-                subject=f"You've been added to a trip on Roadtrip Mate!",
-                message=(
-                    f"Hi {user_to_add.first_name},\n\n"
-                    f"You’ve been added as a collaborator to the trip \"{trip.title}\" "
-                    f"by {trip.author.first_name} {trip.author.last_name}.\n\n"
-                    "Log in to view and help plan the route:\n"
-                    "Happy travels! 🚗💨"
-                    ),
-                    from_email=None,
-                    recipient_list=[user_to_add.email],
-                    fail_silently=False,
-            )
+            # Adding the collaborator and queueing the invite email commit together.
+            with transaction.atomic():
+                trip.collaborators.add(user_to_add)
+                collaborator_invite(trip, user_to_add).save()
             
             return Response(
                 {'status': 'success', 'message': 'Collaborator added and notified via email'},
@@ -364,3 +568,243 @@ class TripCollaboratorsView(APIView):
 
         trip.collaborators.remove(user_to_remove)
         return Response({'detail': 'Collaborator removed successfully'}, status=200)
+
+# Prefix search over the vehicle fuel economy table: ?manufacturer=, then ?model=, then ?fuel_type=.
+# Each filter is an indexed prefix match, and results are paginated alphabetically.
+class VehicleSearchView(generics.ListAPIView):
+    serializer_class = VehicleSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = VehiclePagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        vehicles = Vehicle.objects.all()
+        if params.get("manufacturer"):
+            vehicles = vehicles.filter(manufacturer_key__startswith=params["manufacturer"].strip().lower())
+        if params.get("model"):
+            vehicles = vehicles.filter(model_key__startswith=params["model"].strip().lower())
+        if params.get("fuel_type"):
+            vehicles = vehicles.filter(fuel_type__startswith=params["fuel_type"].strip().title())
+        return vehicles
+
+# Lists the distinct vehicle manufacturers, optionally filtered by a ?q= prefix.
+class VehicleManufacturersView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        manufacturers = Vehicle.objects.order_by("manufacturer").values_list("manufacturer", flat=True).distinct()
+        prefix = request.query_params.get("q", "").strip().lower()
+        if prefix:
+            manufacturers = manufacturers.filter(manufacturer_key__startswith=prefix)
+        return Response({"results": list(manufacturers)}, status=status.HTTP_200_OK)
+
+# Prices every given trip with every given vehicle in one request.
+# Trips come by id (distance from their route, passengers from the author plus collaborators) or inline,
+# and vehicles by id from the vehicle table or inline as an mpg figure. Costs for all combinations are
+# computed in one vectorised pass and rounded to pence, with per-passenger shares that add up exactly.
+class PetrolEstimateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PetrolEstimateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        trips = [
+            {"label": trip.get("label", ""), "distance_miles": trip["distance_miles"], "passengers": trip["passengers"]}
+            for trip in data["trips"]
+        ]
+        if data["trip_ids"]:
+            rows = {
+                row["id"]: row
+                for row in Trip.objects.visible_to(request.user).filter(id__in=data["trip_ids"])
+                .annotate(collaborator_count=models.Count("collaborators"))
+                .values("id", "title", "route__distance", "collaborator_count")
+            }
+            missing = [trip_id for trip_id in data["trip_ids"] if parse_distance_miles(rows.get(trip_id, {}).get("route__distance")) is None]
+            if missing:
+                return Response({"trip_ids": [f"No accessible trip with a saved route distance: {missing}"]}, status=status.HTTP_400_BAD_REQUEST)
+            trips = [
+                {
+                    "id": trip_id,
+                    "label": rows[trip_id]["title"],
+                    "distance_miles": parse_distance_miles(rows[trip_id]["route__distance"]),
+                    "passengers": 1 + rows[trip_id]["collaborator_count"],
+                }
+                for trip_id in data["trip_ids"]
+            ] + trips
+
+        vehicles = [{"label": vehicle.get("label", ""), "mpg": vehicle["mpg"]} for vehicle in data["vehicles"]]
+        if data["vehicle_ids"]:
+            rows = {row["id"]: row for row in Vehicle.objects.filter(id__in=data["vehicle_ids"]).values("id", "manufacturer", "model", "fuel_type", "mpg")}
+            missing = [vehicle_id for vehicle_id in data["vehicle_ids"] if vehicle_id not in rows]
+            if missing:
+                return Response({"vehicle_ids": [f"Unknown vehicles: {missing}"]}, status=status.HTTP_400_BAD_REQUEST)
+            vehicles = [
+                {
+                    "id": vehicle_id,
+                    "label": f"{rows[vehicle_id]['manufacturer']} {rows[vehicle_id]['model']} ({rows[vehicle_id]['fuel_type']})",
+                    "mpg": float(rows[vehicle_id]["mpg"]),
+                }
+                for vehicle_id in data["vehicle_ids"]
+            ] + vehicles
+
+        litres, costs = compute_costs(
+            [trip["distance_miles"] for trip in trips],
+            [vehicle["mpg"] for vehicle in vehicles],
+            data["fuel_price"],
+        )
+
+        # Rounding and splitting are vectorised too; exact decimal strings are only built for the response.
+        passengers = np.array([trip["passengers"] for trip in trips])
+        payers = passengers - 1 if data["exclude_driver"] else passengers
+        cost_pence = to_pence(costs)
+        base, extra = split_pence(cost_pence, payers[:, None])
+        litres_pence, cost_pence, base, extra = (array.tolist() for array in (to_pence(litres), cost_pence, base, extra))
+
+        results = []
+        for i, trip in enumerate(trips):
+            for j, vehicle in enumerate(vehicles):
+                results.append({
+                    "trip": trip,
+                    "vehicle": vehicle,
+                    "litres": format_pence(litres_pence[i][j]),
+                    "cost": format_pence(cost_pence[i][j]),
+                    "shares": format_shares(base[i][j], extra[i][j], trip["passengers"], data["exclude_driver"]),
+                })
+
+        return Response({"fuel_price": str(data["fuel_price"]), "results": results}, status=status.HTTP_200_OK)
+
+# Lists the user's trips whose routes pass within ?radius_km= (default 10) of ?lat= and ?lng=,
+# nearest first, using the grid index over route geometry.
+class TripsNearView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            lat = float(request.query_params["lat"])
+            lng = float(request.query_params["lng"])
+            radius_km = float(request.query_params.get("radius_km", 10))
+        except (KeyError, ValueError):
+            return Response({"error": "lat and lng are required numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not (0 < radius_km <= MAX_RADIUS_KM):
+            return Response({"error": f"lat/lng out of range or radius_km not between 0 and {MAX_RADIUS_KM}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = routes_near(Trip.objects.visible_to(request.user), lat, lng, radius_km)
+        trips = Trip.objects.only(*TripSummarySerializer.Meta.fields).in_bulk([trip_id for trip_id, _ in matches])
+        results = [
+            {**TripSummarySerializer(trips[trip_id]).data, "distance_km": round(distance, 2)}
+            for trip_id, distance in matches
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+# Searches the user's trips by title, start, destination and pitstop names with ?q=, best
+# matches first, at most ?limit= (default 20) of them. Uses the trigram index in api/search.py,
+# so partial words and small typos still match.
+class TripSearchView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            limit = 0
+        if not query or not 0 < limit <= MAX_RESULTS:
+            return Response({"error": f"q is required and limit must be between 1 and {MAX_RESULTS}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = search_trips(request.user, query, limit)
+        trips = Trip.objects.only(*TripSummarySerializer.Meta.fields).in_bulk([trip_id for trip_id, _ in matches])
+        results = [
+            {**TripSummarySerializer(trips[trip_id]).data, "score": score}
+            for trip_id, score in matches if trip_id in trips
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+# Looks up a cached directions result for ?origin=, ?destination= and ordered ?waypoints= (repeated),
+# so clients can reuse a route the user already fetched instead of calling the directions service.
+# POST stores a result the client fetched itself, for that user only.
+class DirectionsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        origin = request.query_params.get("origin", "").strip()
+        destination = request.query_params.get("destination", "").strip()
+        if not origin or not destination:
+            return Response({"error": "origin and destination are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = lookup_directions(request.user, origin, destination, request.query_params.getlist("waypoints"))
+        if result is None:
+            return Response({"detail": "No cached directions for this journey"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DirectionsResultSerializer(result).data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = DirectionsInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        geometry = RouteGeometry.objects.intern(data["route_path"])
+        if geometry is None:
+            return Response({"route_path": ["Route path is empty."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = cache_directions(request.user, data["origin"], data["destination"], data["waypoints"], geometry, data["distance"], data["duration"])
+        return Response(DirectionsResultSerializer(result).data, status=status.HTTP_201_CREATED)
+
+# Streams the user's trips as NDJSON, one trip per line with its route, pitstops and collaborators.
+class TripExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if isinstance(request._request, ASGIRequest):
+            lines = aexport_trips(request.user)
+        else:
+            lines = export_trips(request.user)
+        response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+        response["Content-Disposition"] = 'attachment; filename="trips.ndjson"'
+        return response
+
+# Everything about the user's trips that changed since ?since=, the cursor the previous sync
+# returned (see api/sync.py): changed trips and routes, and the ids of trips they no longer have.
+# Without a cursor, or with one older than the tombstones kept, everything is sent with
+# "reset": true and the client replaces what it holds. Reads the primary, since a lagging
+# replica could miss changes the new cursor already covers.
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        started = timezone.now()
+        since = request.query_params.get("since")
+        if since is not None:
+            since = decode_cursor(since)
+            if since is None:
+                return Response({"since": ["Not a cursor returned by this endpoint."]}, status=status.HTTP_400_BAD_REQUEST)
+            if cursor_expired(since):
+                since = None
+
+        trips, routes, deleted = changes_since(request.user, since)
+        return Response({
+            "cursor": encode_cursor(started),
+            "reset": since is None,
+            "trips": TripSerializer(trips.with_listing_data().order_by("pk"), many=True).data,
+            "routes": RouteSerializer(routes.select_related("geometry").order_by("pk"), many=True).data,
+            "deleted": deleted,
+        }, status=status.HTTP_200_OK)
+
+# Live changes to a trip as server-sent events, served by the async view of the same name in
+# api/async_views.py. A sync worker would be held for as long as the stream stays open, so
+# under WSGI this only says where to find it.
+class TripEventsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        return Response({"detail": "Live trip events are only served under ASGI (uvicorn)."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+# Imports trips from an NDJSON export as new trips owned by the user. The body is read line by
+# line, so large imports are never held in memory at once.
+class TripImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        summary = import_trips(request.user, request.stream or [])
+        if not summary["trips"] and summary["errors"]:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
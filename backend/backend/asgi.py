@@ -5,5 +5,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ROADTRIP_ASYNC_VIEWS', '1')  # Async read endpoints, see api/async_views.py
 
 application = get_asgi_application()
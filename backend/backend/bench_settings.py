@@ -0,0 +1,13 @@
+# Settings for the API benchmarks (python manage.py bench_api --settings=backend.bench_settings):
+# a local SQLite database and no replicas, so the suite runs anywhere without a server or network.
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
+
+METRICS_TOKEN = "bench-metrics-token"  # So the metrics scenario can scrape /metrics/
@@ -20,6 +20,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+import importlib.util
+import json
 import os
 
 load_dotenv()
@@ -41,14 +43,31 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",  # JWTAuthentication with the user lookup cached
         "rest_framework.authentication.SessionAuthentication",  # Restore session auth
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.JSONRenderer",  # Encoded with orjson and timed for the metrics in api/metrics.py
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.JSONParser",  # Decoded with orjson
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# MessagePack requests and responses ("application/msgpack"), when the msgpack package is installed.
+if importlib.util.find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].insert(1, "api.renderers.MessagePackRenderer")
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].insert(1, "api.parsers.MessagePackParser")
+
+# Responses smaller than this are not compressed by api.compression.CompressionMiddleware.
+COMPRESSION_MIN_BYTES = int(os.getenv("ROADTRIP_COMPRESSION_MIN_BYTES", "1024"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1), 
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -72,7 +91,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware", # Request metrics served at /metrics/, first so it times everything below
+    "api.compression.CompressionMiddleware", # Brotli or gzip for larger responses
     "corsheaders.middleware.CorsMiddleware", # Code from Tech With Tim Video - Line 75
+    "api.replicas.PrimaryStickinessMiddleware", # Keeps reads after a write on the primary database
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -112,9 +134,34 @@ DATABASES = {
         'PASSWORD': 'Yasiromar1',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': 60,  # Reuse connections across requests instead of reconnecting every time
+        'CONN_HEALTH_CHECKS': True,  # Check a reused connection still works before the request uses it
     }
 }
 
+# Optional read replicas, e.g. DATABASE_REPLICA_HOSTS=replica1.local,replica2.local, or with
+# any settings of their own as a JSON list, e.g.
+# DATABASE_REPLICAS='[{"HOST": "replica1.local", "PORT": "5433"}, {"NAME": "roadtrip_replica"}]'
+# Each becomes a "replica_N" alias with the primary's settings and its own; see api/replicas.py
+# for routing.
+DATABASE_REPLICAS = [{'HOST': host.strip()} for host in filter(None, os.getenv("DATABASE_REPLICA_HOSTS", "").split(","))]
+DATABASE_REPLICAS += json.loads(os.getenv("DATABASE_REPLICAS", "[]"))
+for index, replica in enumerate(DATABASE_REPLICAS, start=1):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}, **replica}
+
+DATABASE_ROUTERS = ['api.replicas.PrimaryReplicaRouter']
+
+# Serve the read-heavy endpoints with the async views in api/async_views.py.
+# backend/asgi.py turns this on, so WSGI deployments keep the sync views.
+ASYNC_READ_VIEWS = os.getenv("ROADTRIP_ASYNC_VIEWS") == "1"
+
+# Hub fanning out live trip events to subscribers, see api/events.py.
+TRIP_EVENTS_BACKEND = "api.events.InProcessBackend"
+
+# How long deleted trips and collaborator removals are remembered for /api/sync/. Clients
+# whose cursor is older get a full sync. Pruned by the prune_tombstones command.
+SYNC_TOMBSTONE_DAYS = int(os.getenv("ROADTRIP_SYNC_TOMBSTONE_DAYS", "30"))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -169,7 +216,26 @@ DEFAULT_FROM_EMAIL = 'Roadtrip Planner <roadtripwebapp@gmail.com>'
 
 APPEND_SLASH = False
 
-# Shows errors and debug messages in the terminal while developing.
+# Local memory cache, one per process. Used to cache the user of JWT-authenticated requests.
+# With several server processes, point this at a shared cache (e.g. Redis) so changes to a
+# user are seen by every process straight away.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Requests slower than this are logged by api.metrics with their queries.
+SLOW_REQUEST_MS = int(os.getenv("ROADTRIP_SLOW_REQUEST_MS", "500"))
+
+# /metrics/ is only served to scrapers sending "Authorization: Bearer <token>", and not at all
+# while no token is set.
+METRICS_TOKEN = os.getenv("ROADTRIP_METRICS_TOKEN")
+
+# Shows errors, warnings and slow requests in the terminal.
+# INFO rather than DEBUG: with DEBUG on, django.db.backends logs every SQL statement, which
+# floods the output and slows every request down. Set DJANGO_LOG_LEVEL=DEBUG to see them.
 # Reference Doc: https://docs.djangoproject.com/en/stable/topics/logging/
 LOGGING = {
     'version': 1,
@@ -181,6 +247,6 @@ LOGGING = {
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
     },
 }
@@ -0,0 +1,10 @@
+# Settings for the tests (python manage.py test api --settings=backend.test_settings): the
+# benchmark SQLite database plus a replica of it, so replica routing runs in the tests too.
+# The test runner points the replica at the primary's in-memory test database. Reading
+# uncommitted rows lets the replica's connection see what a test wrote in its transaction,
+# as a replica sees the primary's writes, instead of failing on SQLite's table locks.
+
+from .bench_settings import *  # noqa: F401,F403
+
+DATABASES['default']['OPTIONS'] = {'init_command': 'PRAGMA read_uncommitted = 1'}
+DATABASES['replica_1'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'bench-replica.sqlite3', 'TEST': {'MIRROR': 'default'}}
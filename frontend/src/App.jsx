@@ -36,10 +36,20 @@ function App() {
 
   const [trips, setTrips] = useState([]);
 
-  const getTrips = () => {
-    api.get("/api/trips/")
-      .then((res) => setTrips(res.data))
-      .catch((err) => alert(err));
+  // Trip listings are paginated, so follow the next links until every page is loaded.
+  const getTrips = async () => {
+    try {
+      let url = "/api/trips/";
+      let allTrips = [];
+      while (url) {
+        const res = await api.get(url);
+        allTrips = allTrips.concat(res.data.results);
+        url = res.data.next;
+      }
+      setTrips(allTrips);
+    } catch (err) {
+      alert(err);
+    }
   };
 
   const addTrip = (trip) => {
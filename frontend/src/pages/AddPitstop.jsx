@@ -54,11 +54,29 @@ function AddPitstop() {
         );
     };
     
-    // Fetches trip data on load
+    // Fetches the trip and its previously saved pitstops in one request on load
     useEffect(() => {
-        api.get(`/api/trips/${id}/`)
-            .then((res) => setTrip(res.data))
-            .catch((err) => console.error("Error fetching trip:", err));
+        async function fetchTripBundle() {
+            try {
+                const response = await api.get(`/api/trips/${id}/bundle/`, { params: { fields: "trip,route" } });
+                setTrip(response.data.trip);
+                let pitstopsData = response.data.route?.pitstops ?? [];
+    
+                if (typeof pitstopsData === "string") {
+                    try {
+                        pitstopsData = JSON.parse(pitstopsData);
+                    } catch (err) {
+                        console.error("Error parsing pitstops:", err);
+                        pitstopsData = [];
+                    }
+                }
+    
+                setSelectedPitstops(Array.isArray(pitstopsData) ? pitstopsData : []);
+            } catch (error) {
+                console.error("Error fetching trip:", error);
+            }
+        }
+        fetchTripBundle();
     }, [id]);
 
     // Claculates the basic route between start location and destination
@@ -80,30 +98,6 @@ function AddPitstop() {
         }
     }, [trip, isLoaded]);
 
-    // Loads previously saved pitstops from backend
-    useEffect(() => {
-        async function fetchPitstops() {
-            try {
-                const response = await api.get(`/api/routes/${id}/`);
-                let pitstopsData = response.data.pitstops;
-    
-                if (typeof pitstopsData === "string") {
-                    try {
-                        pitstopsData = JSON.parse(pitstopsData);
-                    } catch (err) {
-                        console.error("Error parsing pitstops:", err);
-                        pitstopsData = [];
-                    }
-                }
-    
-                setSelectedPitstops(Array.isArray(pitstopsData) ? pitstopsData : []);
-            } catch (error) {
-                console.error("Error fetching existing pitstops:", error);
-            }
-        }
-        fetchPitstops();
-    }, [id]);
-
     // Add a custom pitstop from autocomplete input
     const addPitstop = async () => {
 
@@ -116,17 +110,13 @@ function AddPitstop() {
             return;
           }          
         try {
-            // Add the new pitstop to the existing ones
-            const updatedPitstops = [...selectedPitstops, pitstop];
-    
-            const response = await api.patch(`/api/routes/${id}/update/`, {
-                pitstops: updatedPitstops,
-            }, {
-                headers: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+            // Add the new pitstop without overwriting pitstops other collaborators added meanwhile
+            const response = await api.post(`/api/routes/${id}/pitstops/`, {
+                operations: [{ op: "add", pitstop }],
             });
     
             if (response.status === 200) {
-                setSelectedPitstops(updatedPitstops);
+                setSelectedPitstops(response.data.pitstops);
                 setPitstop("");
             }
         } catch (error) {
@@ -157,16 +147,12 @@ function AddPitstop() {
           }
 
         try {
-            const updatedPitstops = [...selectedPitstops, fullName];
-    
-            const response = await api.patch(`/api/routes/${id}/update/`, {
-                pitstops: updatedPitstops,
-            }, {
-                headers: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+            const response = await api.post(`/api/routes/${id}/pitstops/`, {
+                operations: [{ op: "add", pitstop: fullName }],
             });
     
             if (response.status === 200) {
-                setSelectedPitstops(updatedPitstops);
+                setSelectedPitstops(response.data.pitstops);
             }
         } catch (error) {
             console.error("Error adding suggested pitstop:", error);
@@ -177,18 +163,21 @@ function AddPitstop() {
     // Removes a selected pitstop
     const removePitstop = async (pitstop) => {
         try {
-            const response = await api.patch(`/api/routes/${id}/update/`, {
-                pitstops: selectedPitstops.filter(p => p !== pitstop),
-            }, {
-                headers: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+            const response = await api.post(`/api/routes/${id}/pitstops/`, {
+                operations: [{ op: "remove", pitstop }],
             });
     
             if (response.status === 200) {
-                setSelectedPitstops(selectedPitstops.filter(p => p !== pitstop));
+                setSelectedPitstops(response.data.pitstops);
             } else {
                 setErrorMessage("Failed to remove pitstop.");
             }
         } catch (error) {
+            // Someone else already removed it, so show the latest list
+            if (error.response?.status === 409) {
+                setSelectedPitstops(error.response.data.pitstops);
+                return;
+            }
             console.error("Error removing pitstop:", error);
             setErrorMessage("Error removing pitstop.");
         }
@@ -261,64 +250,32 @@ function AddPitstop() {
         );
     };
     
-    // Uses Google Places API to find suggested pitstops near route 
-    const searchNearbyPlaces = () => {
-        if (!directions || !categoryFilters.length) return;
+    // Finds suggested pitstops near the saved route in one request to the backend place index
+    const searchNearbyPlaces = async () => {
+        if (!categoryFilters.length) return;
 
         setSuggestedPlaces([]);
-    
-        const path = directions.routes[0].overview_path;
-        const sampledPoints = path.filter((_, index) => index % 20 === 0); // Every 20th point
-    
-        const service = new window.google.maps.places.PlacesService(document.createElement("div"));
-        const allResults = [];
-    
-        let completedRequests = 0;
-    
-        sampledPoints.forEach((point) => {
-            categoryFilters.forEach((type) => {
-                const request = {
-                    location: point,
-                    radius: maxDistanceKm * 1000,
-                    type: type,
-                    rankBy: window.google.maps.places.RankBy.PROMINENCE // Prioritise popular places
-                };
-    
-                service.nearbySearch(request, (results, status) => {
-                    completedRequests++;
-    
-                    if (status === "OK" && results.length) {
-                        const topResults = results
-                        .filter(result => result.business_status === "OPERATIONAL")
-                        .slice(0, 3)
-                        .map(result => ({
-                            ...result,
-                            _category: type,
-                        }));
-
-                        allResults.push(...topResults);
-                    }
-                                         
-                    // Once requests are finished group and update
-                    if (completedRequests === sampledPoints.length * categoryFilters.length) {
-                        const groupedByCategory = {};
-                        allResults.forEach((result) => {
-                            if (!groupedByCategory[result._category]) {
-                                groupedByCategory[result._category] = [];
-                            }
-                            // avoid duplicates per category
-                            if (!groupedByCategory[result._category].some(p => p.place_id === result.place_id)) {
-                                groupedByCategory[result._category].push(result);
-                            }
-                        });
-                        // Flatten into one array
-                        const combined = Object.values(groupedByCategory).flat();
-                        setSuggestedPlaces(combined);
 
-                    }
-                });
+        try {
+            const response = await api.get(`/api/routes/${id}/places/`, {
+                params: {
+                    categories: categoryFilters.join(","),
+                    buffer_km: maxDistanceKm,
+                    limit: 10,
+                },
             });
-        });
+            // Shape results like Places API results so the map markers can use them as before
+            setSuggestedPlaces(response.data.results.map(place => ({
+                place_id: `place-${place.id}`,
+                name: place.name,
+                vicinity: place.address,
+                geometry: { location: { lat: place.lat, lng: place.lng } },
+                _category: place.category,
+            })));
+        } catch (error) {
+            console.error("Error finding nearby pitstops:", error);
+            setErrorMessage("Error finding nearby pitstops.");
+        }
     };
 
     // Clear messages after 3 seconnds
@@ -38,9 +38,9 @@ function MapRoute() {
     useEffect(() => {
         if (!trip) return;
 
-        api.get(`/api/routes/?trip=${trip.id}`)
+        api.get(`/api/routes/?trip=${trip.id}&fields=summary`)
             .then(res => {
-                if (res.data?.length > 0) {
+                if (res.data?.results?.length > 0) {
                     setHasRoute(true);
                     setSuccessMessage("Route already saved.");
                 }
@@ -2,7 +2,6 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import { kmToMiles, metersToMiles } from "../utils/convert";
 import api from "../api";
-import fuelData from '../data/fuelData.json';
 import Layout from "../components/Layout";
 import '../styles/PetrolCalculator.css';
 
@@ -26,6 +25,8 @@ function PetrolCalculator() {
     const [selectedFuelType, setSelectedFuelType] = useState('');
     const [selectedModel, setSelectedModel] = useState('');
     const [manualEntry, setManualEntry] = useState(false);
+    const [makes, setMakes] = useState([]);
+    const [makeVehicles, setMakeVehicles] = useState([]);
 
     const [numPassengers, setNumPassengers] = useState(1);
     const [selectedDriverEmail, setSelectedDriverEmail] = useState("");
@@ -35,11 +36,13 @@ function PetrolCalculator() {
 
     // Load trip data
     useEffect(() => {
-        api.get(`/api/trips/${id}/`)
+        api.get(`/api/trips/${id}/bundle/`, { params: { fields: "trip,route" } })
             .then((res) => {
-                const tripData = res.data;
+                const tripData = { ...res.data.trip, route: res.data.route };
                 setTrip(tripData);
-                setDistance(parseFloat(location.state?.distance || tripData.route?.distance || 0));
+                // The route's distance_m is parsed by the server, the display string may be in km or mi
+                const routeMiles = tripData.route?.distance_m != null ? parseFloat(metersToMiles(tripData.route.distance_m)) : 0;
+                setDistance(location.state?.distance ? parseFloat(location.state.distance) : routeMiles);
                 setNumPassengers(1 + (tripData.collaborators?.length || 0));
                 setSelectedDriverEmail(tripData.author?.email || '');
                 setLoading(false);
@@ -50,27 +53,27 @@ function PetrolCalculator() {
             });
     }, [id]);
 
-    // Normalise fuel type names
-    const normaliseFuelType = (type) => {
-        const lower = type.toLowerCase();
-        if (lower.includes('electric') && lower.includes('petrol')) return 'Hybrid';
-        if (lower.includes('electricity') && lower.includes('petrol')) return 'Hybrid';
-        if (lower.includes('electric')) return 'Electric';
-        if (lower.includes('diesel')) return 'Diesel';
-        if (lower.includes('petrol')) return 'Petrol';
-        return type;
-    };
+    // Load the list of car makes
+    useEffect(() => {
+        api.get("/api/vehicles/manufacturers/")
+            .then((res) => setMakes(res.data.results))
+            .catch((err) => console.error("Failed to load car makes:", err));
+    }, []);
 
-    // Filter cars with valid MPG and normalise fuel types
-    const validCars = fuelData.filter(car => car["WLTP Imperial Combined"] > 0).map(car => ({
-        ...car,
-        normalizedFuel: normaliseFuelType(car["Fuel Type"])
-    }));
+    // Load the models and fuel economy figures for the selected make
+    useEffect(() => {
+        if (!selectedMake || manualEntry) {
+            setMakeVehicles([]);
+            return;
+        }
+        api.get("/api/vehicles/", { params: { manufacturer: selectedMake, page_size: 200 } })
+            .then((res) => setMakeVehicles(res.data.results.filter(car => car.manufacturer === selectedMake)))
+            .catch((err) => console.error("Failed to load car models:", err));
+    }, [selectedMake, manualEntry]);
 
     // Dropdwon options
-    const makes = [...new Set(validCars.map(car => car.Manufacturer))];
-    const fuelTypes = [...new Set(validCars.filter(car => car.Manufacturer === selectedMake).map(car => car.normalizedFuel))];
-    const models = validCars.filter(car => car.Manufacturer === selectedMake && car.normalizedFuel === selectedFuelType);
+    const fuelTypes = [...new Set(makeVehicles.map(car => car.fuel_type))];
+    const models = makeVehicles.filter(car => car.fuel_type === selectedFuelType);
 
     // Estimate petrol cost from inputs
     const calculateCost = () => {
@@ -237,14 +240,14 @@ function PetrolCalculator() {
                                         value={selectedModel}
                                         onChange={(e) => {
                                             setSelectedModel(e.target.value);
-                                            const match = models.find(car => car.Model === e.target.value);
+                                            const match = models.find(car => car.model === e.target.value);
                                             if (match) {
-                                                setFuelEfficiency(match["WLTP Imperial Combined"]);
+                                                setFuelEfficiency(match.mpg);
                                             }
                                         }}
                                     >
                                         <option value="">Select Model</option>
-                                        {[...new Set(models.map(car => car.Model))].map((model, index) => (
+                                        {models.map(car => car.model).map((model, index) => (
                                             <option key={index} value={model}>{model}</option>
                                         ))}
                                     </select>
@@ -12,18 +12,16 @@ function TripSummary() {
     const [route, setRoute] = useState(null);
     const [collaborators, setCollaborators] = useState([]);
 
-    // Fetch trip, route and collaborator data when the page loads
+    // Fetch trip, route and collaborator data in one request when the page loads
     useEffect(() => {
         const fetchTripData = async () => {
             try {
-                const tripRes = await api.get(`/api/trips/${id}/`);
-                setTrip(tripRes.data);
-
-                const routeRes = await api.get(`/api/routes/${id}/`);
-                setRoute(routeRes.data);
-
-                const collabRes = await api.get(`/api/trip/${id}/collaborators/`);
-                setCollaborators(collabRes.data.data.collaborators || []);
+                const bundleRes = await api.get(`/api/trips/${id}/bundle/`, {
+                    params: { fields: "trip,route,collaborators" },
+                });
+                setTrip(bundleRes.data.trip);
+                setRoute(bundleRes.data.route);
+                setCollaborators(bundleRes.data.collaborators || []);
             } catch (err) {
                 console.error("Error loading trip summary:", err);
             }
@@ -46,12 +46,13 @@ function UpdateRoute() {
     useEffect(() => {
         async function fetchData() {
             try {
-                const tripRes = await api.get(`/api/trips/${id}/`);
-                const routeRes = await api.get(`/api/routes/${id}/`);
-                let pitstopsData = routeRes.data.pitstops;
+                const bundleRes = await api.get(`/api/trips/${id}/bundle/`, { params: { fields: "trip,route" } });
+                const tripData = bundleRes.data.trip;
+                const routeData = bundleRes.data.route || {};
+                let pitstopsData = routeData.pitstops;
                 setTrip({
-                    ...tripRes.data,
-                    route: routeRes.data, // attach route info (includes petrol_cost and passenger_shares)
+                    ...tripData,
+                    route: routeData, // attach route info (includes petrol_cost and passenger_shares)
                   });
 
                 // Parse pitstops if stored as string
@@ -72,13 +73,13 @@ function UpdateRoute() {
                 }
     
                 // If a saved route path exists, use it
-                if (routeRes.data.route_path) {
-                    const decodedPath = JSON.parse(routeRes.data.route_path);
+                if (routeData.route_path) {
+                    const decodedPath = JSON.parse(routeData.route_path);
                     const directionsService = new window.google.maps.DirectionsService();
                     directionsService.route(
                         {
-                            origin: tripRes.data.start_location,
-                            destination: tripRes.data.destination,
+                            origin: tripData.start_location,
+                            destination: tripData.destination,
                             waypoints: pitstopsData.map((stop) => ({
                                 location: stop,
                                 stopover: true,